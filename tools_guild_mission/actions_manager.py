@@ -5,14 +5,22 @@ from pathlib import Path
 
 @dataclass
 class GameAction:
-    action_type: str  # "coordinate" hoặc "image"
-    x: str            # Tọa độ X hoặc đường dẫn ảnh
-    y: str            # Tọa độ Y hoặc khu vực tìm kiếm
+    action_type: str  # "coordinate", "image", "image_all" (click mọi vị trí tìm thấy), "wait_image" (chờ ảnh xuất hiện)
+                      # hoặc "pixel" (click khi các điểm ảnh đúng màu, xem pixel_probe.py)
+                      # Điều khiển luồng: "if_image", "else", "end_if", "loop_until", "end_loop",
+                      # "label", "goto", "call" (xem FLOW_ACTION_TYPES)
+                      # "interrupt": ảnh popup theo dõi song song, thấy thì chạy `handler` (xem interrupts.py)
+    x: str            # Tọa độ X, đường dẫn ảnh, điều kiện màu, tên nhãn hoặc file kịch bản con
+    y: str            # Tọa độ Y, khu vực tìm kiếm hoặc vị trí click "x,y" của "pixel" (trống: điểm đầu tiên)
     click_type: str
     repeat: int
     delay: float
     move_back: bool
     comment: str = ""
+    enabled: bool = True       # Ảnh có được dùng khi tìm kiếm hay không
+    match_mode: str = "color"  # Kiểu so khớp ảnh: color / gray / edge / mask (xem MATCH_MODES)
+    timeout: float = 10.0      # Thời gian chờ tối đa của "wait_image" (giây)
+    handler: str = ""          # Kịch bản xử lý của "interrupt" (trống: click vào ảnh popup)
 
 class ActionsManager:
     def exit(self):
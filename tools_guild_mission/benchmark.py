@@ -0,0 +1,434 @@
+"""
+benchmark.py - Đo hiệu năng so khớp ảnh trên bộ ảnh chụp màn hình đã ghi lại.
+
+Ví dụ:
+    python benchmark.py pyramid --screenshots shots/ --templates assets/ --levels 2
+    python benchmark.py parallel --screenshots shots/ --templates assets/ --workers 8
+    python benchmark.py corpus bench_corpus/ --seed 0
+    python benchmark.py pipeline --corpus bench_corpus/ --json ket_qua.json
+    python benchmark.py compare main.json nhanh_moi.json
+
+Bộ dữ liệu của lệnh `pipeline` (--corpus):
+    screenshots/    ảnh chụp màn hình
+    templates/      ảnh mẫu
+    expected.json   {"ảnh_chụp.png": {"ảnh_mẫu.png": [x, y] hoặc null}}
+                    tạo/cập nhật bằng `pipeline --record` rồi kiểm tra lại bằng mắt
+Lệnh `corpus` sinh bộ dữ liệu tổng hợp từ một seed (cùng seed -> cùng ảnh, cùng đáp án)
+để đo lại được ở bất kỳ máy nào mà không cần lưu ảnh chụp vào repo.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import DEFAULT_MATCH_MODE
+from image_click import ImageClicker, ScreenViews
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp"}
+
+
+def load_images(folder):
+    """Đọc tất cả ảnh trong thư mục, trả về danh sách (đường dẫn, ảnh BGR)"""
+    images = []
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if image is not None:
+            images.append((str(path), image))
+    return images
+
+
+def list_templates(folder):
+    return [str(p) for p in sorted(Path(folder).iterdir()) if p.suffix.lower() in IMAGE_SUFFIXES]
+
+
+def time_match(clicker, screen, template_path, repeat):
+    """Chạy match_template `repeat` lần, trả về (kết quả, thời gian trung bình ms)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        match = clicker.match_template(screen, template_path)
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+    return match, elapsed
+
+
+def same_hit(a, b, tolerance=2):
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a.x - b.x) <= tolerance and abs(a.y - b.y) <= tolerance
+
+
+def bench_pyramid(args):
+    """So sánh pyramid với quét toàn bộ: độ trễ và tỉ lệ cho kết quả giống nhau"""
+    screenshots = load_images(args.screenshots)
+    templates = list_templates(args.templates)
+    if not screenshots or not templates:
+        print("Không có ảnh chụp màn hình hoặc ảnh mẫu để đo")
+        return 1
+
+    exhaustive = ImageClicker(args.confidence, search_mode="exhaustive", multi_scale=False)
+    pyramid = ImageClicker(args.confidence, template_cache=exhaustive.templates,
+                           search_mode="pyramid", pyramid_levels=args.levels,
+                           multi_scale=False)
+
+    total_exhaustive = total_pyramid = 0.0
+    agree = hits = pairs = 0
+    for shot_path, screen in screenshots:
+        for template_path in templates:
+            try:
+                ref, t_ref = time_match(exhaustive, screen, template_path, args.repeat)
+                got, t_got = time_match(pyramid, screen, template_path, args.repeat)
+            except ValueError as e:
+                print(f"Bỏ qua {Path(shot_path).name} / {Path(template_path).name}: {e}")
+                continue
+            pairs += 1
+            hits += ref is not None
+            agree += same_hit(ref, got)
+            total_exhaustive += t_ref
+            total_pyramid += t_got
+            if args.verbose:
+                print(f"{Path(shot_path).name:30} {Path(template_path).name:30} "
+                      f"exhaustive={t_ref:7.2f}ms pyramid={t_got:7.2f}ms "
+                      f"{'OK' if same_hit(ref, got) else 'KHÁC'}")
+
+    if not pairs:
+        return 1
+    print(f"Số cặp ảnh: {pairs} (tìm thấy bởi exhaustive: {hits})")
+    print(f"Exhaustive trung bình: {total_exhaustive / pairs:.2f} ms")
+    print(f"Pyramid ({args.levels} tầng) trung bình: {total_pyramid / pairs:.2f} ms")
+    if total_pyramid:
+        print(f"Tăng tốc: x{total_exhaustive / total_pyramid:.2f}")
+    print(f"Độ chính xác so với exhaustive: {agree / pairs:.1%}")
+    return 0
+
+
+def bench_parallel(args):
+    """So sánh so khớp tuần tự với so khớp song song trên pool luồng (match_all)"""
+    screenshots = load_images(args.screenshots)
+    templates = list_templates(args.templates)
+    if not screenshots or not templates:
+        print("Không có ảnh chụp màn hình hoặc ảnh mẫu để đo")
+        return 1
+
+    workers = args.workers or os.cpu_count() or 1
+    serial = ImageClicker(args.confidence, track_last_hit=False, workers=1,
+                          multi_scale=False)
+    pooled = ImageClicker(args.confidence, template_cache=serial.templates,
+                          track_last_hit=False, workers=workers, multi_scale=False)
+    # Nạp trước ảnh mẫu để không tính thời gian đọc đĩa
+    serial.match_all(screenshots[0][1], templates)
+
+    results = {}
+    for name, clicker in (("tuần tự", serial), (f"song song ({workers} luồng)", pooled)):
+        latencies = []
+        hits = []
+        for _, screen in screenshots:
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                matches = clicker.match_all(screen, templates)
+                latencies.append((time.perf_counter() - start) * 1000)
+            hits.append([(m.template_path, m.x, m.y) for m in matches])
+        latencies.sort()
+        results[name] = (latencies, hits)
+        print(f"{name:24} p50={latencies[len(latencies) // 2]:8.2f}ms "
+              f"max={latencies[-1]:8.2f}ms ({len(templates)} ảnh mẫu/khung hình)")
+
+    (_, (lat_a, hits_a)), (_, (lat_b, hits_b)) = results.items()
+    print(f"Tăng tốc p50: x{lat_a[len(lat_a) // 2] / lat_b[len(lat_b) // 2]:.2f}")
+    print("Kết quả giống nhau" if hits_a == hits_b else "CẢNH BÁO: kết quả khác nhau")
+    pooled.shutdown()
+    return 0
+
+
+# "capture": chụp thật (--live); "decode": đọc ảnh chụp từ bộ dữ liệu
+STAGES = ("capture", "decode", "convert", "match")
+
+
+def make_corpus(folder, seed=0, screenshots=3, templates=8, size=(1280, 720)):
+    """
+    Sinh bộ dữ liệu tổng hợp: các ảnh mẫu có hoa văn ngẫu nhiên được dán lên nền nhiễu
+    ở vị trí ngẫu nhiên (mỗi ảnh chụp thiếu vài ảnh mẫu), expected.json lấy từ chính
+    vị trí đã dán. Cùng `seed` luôn cho cùng bộ dữ liệu.
+    """
+    rng = np.random.default_rng(seed)
+    folder = Path(folder)
+    (folder / "screenshots").mkdir(parents=True, exist_ok=True)
+    (folder / "templates").mkdir(parents=True, exist_ok=True)
+    width, height = size
+
+    sprites = []
+    for i in range(templates):
+        h, w = (int(v) for v in rng.integers(32, 80, size=2))
+        # Ô màu lớn + nhiễu: có đường viền, có biến thiên ở mọi kênh
+        blocks = rng.integers(0, 256, size=(4, 4, 3), dtype=np.uint8)
+        sprite = cv2.resize(blocks, (w, h), interpolation=cv2.INTER_NEAREST)
+        sprite = cv2.add(sprite, rng.integers(0, 40, size=(h, w, 3), dtype=np.uint8))
+        name = f"t{i}.png"
+        cv2.imwrite(str(folder / "templates" / name), sprite)
+        sprites.append((name, sprite))
+
+    expected = {}
+    for s in range(screenshots):
+        screen = cv2.GaussianBlur(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8), (0, 0), 3)
+        labels = {}
+        taken = []
+        for name, sprite in sprites:
+            h, w = sprite.shape[:2]
+            labels[name] = None
+            if rng.random() < 0.25:
+                continue
+            for _ in range(50):
+                x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+                box = (x, y, x + w, y + h)
+                if not any(box[0] < b[2] and b[0] < box[2] and box[1] < b[3] and b[1] < box[3] for b in taken):
+                    break
+            else:
+                continue
+            taken.append(box)
+            screen[y:y + h, x:x + w] = sprite
+            labels[name] = [x + w // 2, y + h // 2]
+        shot = f"s{s}.png"
+        cv2.imwrite(str(folder / "screenshots" / shot), screen)
+        expected[shot] = labels
+
+    with open(folder / "expected.json", 'w', encoding='utf-8') as f:
+        json.dump(expected, f, indent=2, ensure_ascii=False)
+    return expected
+
+
+def bench_corpus(args):
+    expected = make_corpus(args.folder, args.seed, args.screenshots, args.templates,
+                           (args.width, args.height))
+    print(f"Đã sinh {len(expected)} ảnh chụp, {args.templates} ảnh mẫu vào {args.folder}")
+    return 0
+
+
+def summarize(latencies):
+    """p50/p95/trung bình (ms) của một danh sách độ trễ"""
+    if not latencies:
+        return {"count": 0}
+    values = np.array(latencies)
+    return {
+        "count": len(latencies),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "mean": round(float(values.mean()), 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """(kết quả, thời gian ms)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def bench_pipeline(args):
+    """
+    Đo từng bước của quy trình tìm ảnh (find_image) trên bộ dữ liệu cố định:
+    decode (đọc ảnh chụp từ đĩa; với --live là capture, chụp thật), convert (BGRA -> BGR
+    và ảnh xám/đường viền) và match (ImageClicker.match_template, gồm cả lọc kết quả).
+    Độ chính xác so với expected.json.
+    """
+    corpus = Path(args.corpus)
+    screenshots = sorted(p for p in (corpus / "screenshots").iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    templates = list_templates(corpus / "templates")
+    if not screenshots or not templates:
+        print("Không có ảnh chụp màn hình hoặc ảnh mẫu để đo")
+        return 1
+    expected_path = corpus / "expected.json"
+    expected = {}
+    if expected_path.exists() and not args.record:
+        with open(expected_path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+
+    clicker = ImageClicker(args.confidence, search_mode=args.search_mode,
+                           track_last_hit=False, multi_scale=False)
+    mode = args.match_mode
+    # Nạp trước ảnh mẫu để không tính thời gian đọc đĩa
+    for template_path in templates:
+        clicker.templates.get(template_path)
+
+    stages = {name: [] for name in STAGES}
+    frame_latencies = []
+    accuracy = {"correct": 0, "wrong": 0, "missed": 0, "false_positive": 0, "unlabelled": 0}
+    recorded = {}
+    for _ in range(args.repeat):
+        for shot in screenshots:
+            if args.live:
+                bgra, t_capture = timed(clicker.capture.grab)
+            else:
+                # Giải mã PNG, không phải chụp màn hình: báo riêng là "decode"
+                bgra, t_capture = timed(cv2.imread, str(shot), cv2.IMREAD_COLOR)
+                bgra = cv2.cvtColor(bgra, cv2.COLOR_BGR2BGRA)
+
+            start = time.perf_counter()
+            screen = cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR)
+            views = ScreenViews(screen)
+            views.get(mode)
+            t_convert = (time.perf_counter() - start) * 1000
+
+            t_frame = t_capture + t_convert
+            labels = expected.get(shot.name, {})
+            for template_path in templates:
+                name = Path(template_path).name
+                try:
+                    match, t_match = timed(clicker.match_template, screen, template_path,
+                                           views=views, match_mode=mode)
+                except ValueError:
+                    continue
+                stages["match"].append(t_match)
+                t_frame += t_match
+
+                if args.live:
+                    continue
+                got = [match.x, match.y] if match else None
+                recorded.setdefault(shot.name, {})[name] = got
+                if name not in labels:
+                    accuracy["unlabelled"] += 1
+                    continue
+                want = labels[name]
+                if want is None:
+                    accuracy["correct" if got is None else "false_positive"] += 1
+                elif got is None:
+                    accuracy["missed"] += 1
+                else:
+                    near = abs(got[0] - want[0]) <= args.tolerance and abs(got[1] - want[1]) <= args.tolerance
+                    accuracy["correct" if near else "wrong"] += 1
+            stages["capture" if args.live else "decode"].append(t_capture)
+            stages["convert"].append(t_convert)
+            frame_latencies.append(t_frame)
+
+    if args.record:
+        with open(expected_path, 'w', encoding='utf-8') as f:
+            json.dump(recorded, f, indent=2, ensure_ascii=False)
+        print(f"Đã ghi kết quả hiện tại vào {expected_path}")
+
+    labelled = sum(v for k, v in accuracy.items() if k != "unlabelled")
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "settings": {
+            "corpus": str(corpus),
+            "screenshots": len(screenshots),
+            "templates": len(templates),
+            "repeat": args.repeat,
+            "search_mode": args.search_mode,
+            "match_mode": mode,
+            "confidence": args.confidence,
+            "capture": "live" if args.live else "corpus",
+        },
+        "stages": {name: summarize(values) for name, values in stages.items()},
+        "frame": summarize(frame_latencies),
+        # Số khung hình xử lý được mỗi giây (chụp + chuyển đổi + so khớp mọi ảnh mẫu)
+        "throughput_fps": round(1000 / float(np.mean(frame_latencies)), 2) if frame_latencies else 0.0,
+        "accuracy": dict(accuracy, rate=round(accuracy["correct"] / labelled, 4) if labelled else None),
+    }
+
+    for name in STAGES + ("frame",):
+        stats = report["frame"] if name == "frame" else report["stages"][name]
+        if stats["count"]:
+            print(f"{name:12} p50={stats['p50']:8.2f}ms p95={stats['p95']:8.2f}ms n={stats['count']}")
+    print(f"Thông lượng: {report['throughput_fps']} khung hình/giây")
+    if labelled:
+        print(f"Độ chính xác: {report['accuracy']['rate']:.1%} "
+              f"(sai vị trí {accuracy['wrong']}, bỏ sót {accuracy['missed']}, "
+              f"nhận nhầm {accuracy['false_positive']})")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+def bench_compare(args):
+    """So sánh hai file kết quả của `pipeline --json` (vd. nhánh chính và nhánh mới)"""
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    regressed = False
+    rows = [(name, base["stages"].get(name), new["stages"].get(name)) for name in STAGES]
+    rows.append(("frame", base["frame"], new["frame"]))
+    for name, old, cur in rows:
+        if not old or not cur or not old.get("count") or not cur.get("count"):
+            continue
+        change = cur["p50"] / old["p50"] - 1 if old["p50"] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  CHẬM HƠN"
+            regressed = True
+        print(f"{name:12} p50 {old['p50']:8.2f} -> {cur['p50']:8.2f}ms ({change:+.1%}) "
+              f"p95 {old['p95']:8.2f} -> {cur['p95']:8.2f}ms{flag}")
+    old_rate, new_rate = base["accuracy"].get("rate"), new["accuracy"].get("rate")
+    if old_rate is not None and new_rate is not None:
+        print(f"Độ chính xác {old_rate:.1%} -> {new_rate:.1%}")
+        regressed |= new_rate < old_rate
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo hiệu năng so khớp ảnh")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("pyramid", help="So sánh pyramid với quét toàn bộ")
+    p.add_argument("--screenshots", required=True, help="Thư mục ảnh chụp màn hình")
+    p.add_argument("--templates", required=True, help="Thư mục ảnh mẫu")
+    p.add_argument("--levels", type=int, default=2)
+    p.add_argument("--confidence", type=float, default=0.7)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=bench_pyramid)
+
+    p = sub.add_parser("parallel", help="So sánh so khớp tuần tự và song song")
+    p.add_argument("--screenshots", required=True, help="Thư mục ảnh chụp màn hình")
+    p.add_argument("--templates", required=True, help="Thư mục ảnh mẫu")
+    p.add_argument("--workers", type=int, default=0, help="0 = theo số lõi CPU")
+    p.add_argument("--confidence", type=float, default=0.7)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_parallel)
+
+    p = sub.add_parser("pipeline", help="Đo từng bước đọc ảnh/chuyển đổi/so khớp")
+    p.add_argument("--corpus", required=True, help="Thư mục bộ dữ liệu (screenshots/, templates/, expected.json)")
+    p.add_argument("--search-mode", default="exhaustive", choices=["exhaustive", "pyramid"])
+    p.add_argument("--match-mode", default=DEFAULT_MATCH_MODE)
+    p.add_argument("--confidence", type=float, default=0.7)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--tolerance", type=int, default=3, help="Sai lệch vị trí cho phép (px)")
+    p.add_argument("--live", action="store_true", help="Chụp màn hình thật thay vì đọc ảnh chụp")
+    p.add_argument("--record", action="store_true", help="Ghi kết quả hiện tại vào expected.json")
+    p.add_argument("--json", help="Ghi kết quả dạng JSON ra file")
+    p.set_defaults(func=bench_pipeline)
+
+    p = sub.add_parser("corpus", help="Sinh bộ dữ liệu tổng hợp cho lệnh pipeline")
+    p.add_argument("folder")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--screenshots", type=int, default=3)
+    p.add_argument("--templates", type=int, default=8)
+    p.add_argument("--width", type=int, default=1280)
+    p.add_argument("--height", type=int, default=720)
+    p.set_defaults(func=bench_corpus)
+
+    p = sub.add_parser("compare", help="So sánh hai file kết quả JSON của pipeline")
+    p.add_argument("base")
+    p.add_argument("new")
+    p.add_argument("--threshold", type=float, default=0.1, help="Chậm hơn quá tỉ lệ này thì báo lỗi")
+    p.set_defaults(func=bench_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+change_detector.py - Phát hiện ô (tile) màn hình nào đã thay đổi giữa hai khung hình.
+
+Mỗi khung hình được rút gọn thành một "chữ ký": ảnh BGR thu nhỏ sao cho mỗi ô
+TILE x TILE pixel còn lại SAMPLES x SAMPLES điểm. So sánh hai chữ ký chỉ tốn
+vài micro giây, đủ rẻ để làm trên mọi khung hình. Chữ ký giữ đủ ba kênh màu: đổi
+màu mà độ sáng gần như giữ nguyên (xám -> xanh lá) vẫn được tính là thay đổi.
+"""
+
+import cv2
+import numpy as np
+
+from config import CHANGE_TILE_SIZE, CHANGE_TILE_SAMPLES, CHANGE_THRESHOLD
+
+
+class ChangeDetector:
+    def __init__(self, tile_size=CHANGE_TILE_SIZE, samples=CHANGE_TILE_SAMPLES,
+                 threshold=CHANGE_THRESHOLD):
+        self.tile_size = tile_size
+        self.samples = samples
+        self.threshold = threshold
+
+    def signature(self, image):
+        """Chữ ký của ảnh BGR: ảnh BGR (rows*SAMPLES, cols*SAMPLES, 3), ảnh xám thì 2 chiều"""
+        if image.ndim == 3:
+            image = image[:, :, :3]
+        h, w = image.shape[:2]
+        rows = -(-h // self.tile_size)
+        cols = -(-w // self.tile_size)
+        # Đệm cho tròn ô để mỗi điểm chữ ký ứng đúng một ô
+        image = cv2.copyMakeBorder(image, 0, rows * self.tile_size - h,
+                                   0, cols * self.tile_size - w, cv2.BORDER_REPLICATE)
+        return cv2.resize(image, (cols * self.samples, rows * self.samples),
+                          interpolation=cv2.INTER_AREA)
+
+    def changed_tiles(self, old, new):
+        """Mảng bool (rows, cols): True ở ô đã thay đổi. Không có chữ ký cũ thì coi như đổi hết"""
+        s = self.samples
+        rows, cols = new.shape[0] // s, new.shape[1] // s
+        if old is None or old.shape != new.shape:
+            return np.ones((rows, cols), dtype=bool)
+        diff = cv2.absdiff(old, new)
+        if diff.ndim == 3:
+            # Kênh lệch nhiều nhất quyết định
+            diff = diff.max(axis=2)
+        diff = diff > self.threshold
+        return diff.reshape(rows, s, cols, s).any(axis=(1, 3))
+
+    def dirty_boxes(self, mask):
+        """Gom các ô đã đổi liền nhau thành hình chữ nhật (x1, y1, x2, y2) theo pixel"""
+        if not mask.any():
+            return []
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask.astype(np.uint8), connectivity=8)
+        t = self.tile_size
+        boxes = []
+        for i in range(1, count):
+            c, r, w, h = (int(v) for v in stats[i][:4])
+            boxes.append((c * t, r * t, (c + w) * t, (r + h) * t))
+        return boxes
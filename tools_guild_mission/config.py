@@ -7,4 +7,104 @@ ASSETS_DIR = BASE_DIR / "assets"
 DEFAULT_DELAY = 1.0  # Đổi thành giây
 DEFAULT_REPEAT = 1
 CLICK_TYPES = ["Click Trái", "Click Phải", "Double Click"]
-SEARCH_REGIONS = ["Toàn màn hình", "Nửa trái", "Nửa phải", "Tùy chỉnh"]
\ No newline at end of file
+SEARCH_REGIONS = ["Toàn màn hình", "Nửa trái", "Nửa phải", "Tùy chỉnh"]
+
+# Bộ nhớ đệm ảnh mẫu (byte)
+TEMPLATE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Backend chụp màn hình: "auto" (mss nếu có, không thì ImageGrab), "mss", "imagegrab"
+CAPTURE_BACKEND = "auto"
+
+# Cách quét ảnh: "exhaustive" (quét toàn bộ) hoặc "pyramid" (thô đến mịn)
+SEARCH_MODES = ["exhaustive", "pyramid"]
+DEFAULT_SEARCH_MODE = "exhaustive"
+PYRAMID_LEVELS = 2              # Số tầng thu nhỏ 1/2 cho lượt tìm thô
+PYRAMID_MIN_TEMPLATE_SIZE = 8   # Ảnh mẫu ở tầng thô không nhỏ hơn (px)
+PYRAMID_CANDIDATES = 3          # Số ứng viên thô được tinh chỉnh ở độ phân giải gốc
+PYRAMID_COARSE_MARGIN = 0.2     # Ngưỡng tầng thô = confidence - margin
+
+# Theo dõi vị trí tìm thấy gần nhất của mỗi ảnh mẫu
+ROI_TRACKING = True
+ROI_MARGINS = (16, 64)          # Các cửa sổ mở rộng quanh vị trí cũ (px), thử lần lượt
+
+# Luồng chụp màn hình nền dùng chung cho mọi lần tìm ảnh
+FRAME_PRODUCER_FPS = 10
+FRAME_BUFFER_SIZE = 4           # Số khung hình giữ trong bộ đệm vòng
+FRAME_WAIT_TIMEOUT = 1.0        # Thời gian chờ khung hình đầu tiên (giây)
+
+# Bỏ qua so khớp khi màn hình không đổi (so sánh theo ô)
+FRAME_GATING = True
+CHANGE_TILE_SIZE = 64           # Kích thước ô (px)
+CHANGE_TILE_SAMPLES = 4         # Số điểm lấy mẫu mỗi cạnh ô
+CHANGE_THRESHOLD = 12           # Chênh lệch mức xám tối thiểu để coi là đổi
+
+# Kiểu so khớp theo từng ảnh mẫu (lưu trong GameAction.match_mode)
+MATCH_MODES = {
+    "color": "Màu (BGR)",
+    "gray": "Xám",
+    "edge": "Đường viền (Canny)",
+    "mask": "Mặt nạ alpha",
+}
+DEFAULT_MATCH_MODE = "color"
+EDGE_CANNY_LOW = 50
+EDGE_CANNY_HIGH = 150
+
+# Số luồng so khớp song song (0 = theo số lõi CPU, 1 = tuần tự)
+MATCH_WORKERS = 0
+
+# So khớp nhiều tỉ lệ (máy khác độ phân giải / DPI): dò một lần rồi lưu tỉ lệ theo màn hình
+MULTI_SCALE = True
+SCALE_CANDIDATES = (0.5, 0.67, 0.75, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5, 1.75, 2.0)
+SCALE_CACHE_FILE = BASE_DIR / "display_scale.json"
+SCALE_RETRY_DELAY = 5.0         # Dò tỉ lệ thất bại: chờ bấy nhiêu giây mới dò lại (gấp đôi mỗi lần)
+SCALE_RETRY_MAX = 120.0         # Khoảng chờ dò lại tối đa (giây)
+
+# Tìm tất cả vị trí của một ảnh mẫu (action "image_all")
+FIND_ALL_MAX_RESULTS = 50
+FIND_ALL_MIN_DISTANCE = 0.5     # Hai kết quả cách nhau tối thiểu (tỉ lệ kích thước ảnh mẫu)
+
+# File atlas gói sẵn ảnh mẫu (template_atlas.py), đặt cạnh kịch bản hoặc thư mục assets
+ATLAS_SUFFIX = ".atlas"
+# Ghi nhớ kết quả so khớp theo khung hình: cùng ảnh mẫu/vùng trên cùng khung hình chỉ so khớp một lần
+MEMO_FRAMES = 2                 # Số khung hình gần nhất được giữ kết quả
+
+# Action "wait_image": chờ ảnh mẫu xuất hiện, kiểm tra dày lúc đầu rồi thưa dần
+WAIT_IMAGE_TIMEOUT = 10.0       # Thời gian chờ tối đa mặc định (giây)
+WAIT_POLL_MIN = 0.05            # Khoảng cách giữa hai lần kiểm tra đầu tiên (giây)
+WAIT_POLL_MAX = 1.0             # Khoảng cách tối đa (giây)
+WAIT_POLL_BACKOFF = 1.5         # Hệ số tăng khoảng cách sau mỗi lần không thấy
+
+# Các loại action dùng ảnh mẫu
+IMAGE_ACTION_TYPES = ("image", "image_all", "wait_image", "if_image", "loop_until", "interrupt")
+
+# Action điều khiển luồng (xem plan.compile_program); kịch bản có các action này
+# được chạy tuần tự từ trên xuống thay vì gom nhóm toạ độ/ảnh
+FLOW_ACTION_TYPES = {
+    "if_image": "Nếu thấy ảnh",
+    "else": "Ngược lại",
+    "end_if": "Hết nếu",
+    "loop_until": "Lặp đến khi thấy ảnh",
+    "end_loop": "Hết lặp",
+    "label": "Nhãn",
+    "goto": "Nhảy tới nhãn",
+    "call": "Gọi kịch bản con",
+}
+
+# Action "interrupt": popup được theo dõi song song với kịch bản chính (interrupts.py)
+INTERRUPT_COOLDOWN = 3.0        # Sau khi xử lý, bỏ qua cùng popup trong bấy nhiêu giây
+INTERRUPT_POLL = 0.5            # Khoảng cách giữa hai lần kiểm tra khi không có luồng chụp nền (giây)
+
+# Lịch chạy định kỳ của "Auto Click & Tìm ảnh" (scheduler.py)
+WHEEL_TICK = 0.1                # Độ phân giải của bánh xe hẹn giờ (giây)
+WHEEL_SLOTS = 512               # Số ô của bánh xe (một vòng = WHEEL_TICK * WHEEL_SLOTS giây)
+WATCH_JITTER = 0.1              # Dao động ngẫu nhiên của khoảng chờ giữa hai lần tìm (0.1 = ±10%)
+
+# Action "pixel": so màu điểm ảnh thay vì so khớp ảnh mẫu
+PIXEL_TOLERANCE = 16            # Sai số mặc định trên mỗi kênh màu (0-255)
+
+# Lịch thời gian của engine: mỗi lần chờ tính theo mốc đã lên lịch, không theo lúc chờ xong
+TIMING_MAX_LAG = 0.5            # Trễ hơn mốc quá mức này (giây) thì lấy lại mốc từ hiện tại, không đuổi theo
+TIMING_HISTORY = 10000          # Số bản ghi thời gian giữ lại để thống kê
+
+# Hàng đợi thao tác chuột dùng chung khi nhiều kịch bản chạy trên cùng màn hình
+INPUT_MAX_WAIT = 0.25           # Thao tác chờ quá lâu (giây) được chạy trước, không xét quãng đường
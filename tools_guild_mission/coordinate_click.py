@@ -8,8 +8,22 @@ class CoordinateClicker:
     
     def set_delay(self, delay):
         self.delay = delay
+
+    @staticmethod
+    def press_function(click_type):
+        """Hàm pyautogui ứng với loại click (loại không biết: chỉ di chuột, không click)"""
+        if click_type == "Click Trái":
+            return pyautogui.click
+        elif click_type == "Click Phải":
+            return pyautogui.rightClick
+        elif click_type == "Double Click":
+            return pyautogui.doubleClick
+        return lambda: None
     
-    def click(self, x, y, click_type="Click Trái", repeat=1, move_back=False):
+    def click(self, x, y, click_type="Click Trái", repeat=1, move_back=False, sleep=time.sleep):
+        # `click_type`: tên loại click hoặc hàm đã lấy sẵn bằng press_function()
+        # `sleep`: hàm chờ giữa các lần click (engine truyền vào hàm chờ dừng được)
+        press = click_type if callable(click_type) else self.press_function(click_type)
         original_pos = pyautogui.position()
         
         for _ in range(repeat):
@@ -17,16 +31,18 @@ class CoordinateClicker:
             target_x = x + random.randint(-2, 2)
             target_y = y + random.randint(-2, 2)
             
-            pyautogui.moveTo(target_x, target_y, duration=0.1)
-            
-            if click_type == "Click Trái":
-                pyautogui.click()
-            elif click_type == "Click Phải":
-                pyautogui.rightClick()
-            elif click_type == "Double Click":
-                pyautogui.doubleClick()
+            self.press_at(target_x, target_y, press)
             
-            time.sleep(self.delay)  # Sử dụng delay trực tiếp
+            sleep(self.delay)  # Sử dụng delay trực tiếp
         
         if move_back:
-            pyautogui.moveTo(original_pos, duration=0.1)
\ No newline at end of file
+            self.move_to(*original_pos)
+
+    def press_at(self, x, y, press):
+        """Di chuột tới (x, y) rồi click"""
+        pyautogui.moveTo(x, y, duration=0.1)
+        press()
+
+    def move_to(self, x, y):
+        pyautogui.moveTo(x, y, duration=0.1)
+
@@ -0,0 +1,76 @@
+"""
+display_scale.py - Lưu tỉ lệ ảnh mẫu / màn hình đã dò được cho từng màn hình.
+
+Ảnh mẫu chụp trên máy này có thể lớn/nhỏ hơn trên máy khác (độ phân giải,
+DPI scaling). Tỉ lệ đúng chỉ cần dò một lần cho mỗi màn hình rồi ghi vào file.
+"""
+
+import json
+import platform
+import threading
+import time
+
+from config import SCALE_CACHE_FILE, SCALE_RETRY_DELAY, SCALE_RETRY_MAX
+
+
+class ScaleStore:
+    def __init__(self, path=SCALE_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._scales = self._load()
+        # Lần dò thất bại (chỉ trong bộ nhớ): khoá -> (số lần thất bại, thời điểm được dò lại)
+        self._misses = {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {k: float(v) for k, v in data.items()}
+        except (FileNotFoundError, json.JSONDecodeError, ValueError, AttributeError):
+            return {}
+
+    @staticmethod
+    def display_key(width, height):
+        """Khoá theo tên máy + kích thước màn hình"""
+        return f"{platform.node()}:{width}x{height}"
+
+    def get(self, key):
+        return self._scales.get(key)
+
+    def _save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self._scales, f, indent=2)
+        except OSError as e:
+            print(f"Không lưu được tỉ lệ màn hình: {str(e)}")
+
+    def set(self, key, scale):
+        with self._lock:
+            self._scales[key] = scale
+            self._misses.clear()
+            self._save()
+
+    def can_calibrate(self, miss_key, now=None):
+        """False nếu lần dò gần nhất với `miss_key` thất bại và chưa hết thời gian chờ"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            miss = self._misses.get(miss_key)
+        return miss is None or now >= miss[1]
+
+    def record_miss(self, miss_key, now=None):
+        """Ghi nhận một lần dò thất bại, lần dò lại được lùi xa dần (SCALE_RETRY_DELAY x 2^n)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            failures = self._misses.get(miss_key, (0, 0.0))[0] + 1
+            delay = min(SCALE_RETRY_DELAY * 2 ** (failures - 1), SCALE_RETRY_MAX)
+            self._misses[miss_key] = (failures, now + delay)
+
+    def forget(self, key=None):
+        """Quên tỉ lệ của một màn hình (hoặc tất cả) để lần sau dò lại"""
+        with self._lock:
+            if key is None:
+                self._scales.clear()
+            else:
+                self._scales.pop(key, None)
+            self._misses.clear()
+            self._save()
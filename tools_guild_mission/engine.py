@@ -0,0 +1,411 @@
+"""
+engine.py - Bộ thực thi kịch bản độc lập với giao diện.
+
+ActionEngine biên dịch danh sách GameAction thành ExecutionPlan (plan.py) rồi chạy theo vòng lặp, có trạng thái rõ ràng
+(RunState), tính giờ bằng đồng hồ monotonic và dừng hợp tác: mọi lần chờ đều
+dùng `sleep()` của engine nên yêu cầu dừng có hiệu lực ngay (vài ms) thay vì
+phải đợi hết `time.sleep` đang chạy. Delay giữa các click và giữa các vòng được
+xếp theo mốc tuyệt đối (timing.Timeline) nên không bị trôi dần. Kịch bản có action
+điều khiển luồng (if_image, loop_until, goto, call...) được chạy tuần tự theo
+ExecutionPlan.program (run_program). Action "interrupt" được theo dõi song song
+(interrupts.py): khi popup xuất hiện, luồng chính dừng ở điểm an toàn tiếp theo
+(checkpoint/sleep), chạy kịch bản xử lý rồi tiếp tục.
+
+Dùng trực tiếp (không cần Qt):
+    engine = ActionEngine(ImageClicker(), CoordinateClicker(), listener=print_event)
+    engine.start(actions, total_loops=10, loop_delay=2.0)
+    ...
+    engine.stop()
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from enum import Enum
+
+import pyautogui
+
+from coordinate_click import CoordinateClicker
+from interrupts import InterruptWatcher
+from plan import ExecutionPlan, compile_plan, compile_step
+from timing import Timeline
+
+
+class RunState(Enum):
+    IDLE = "idle"
+    RUNNING = "running"
+    STOPPING = "stopping"
+    STOPPED = "stopped"      # Dừng theo yêu cầu
+    FINISHED = "finished"    # Chạy hết số vòng hoặc đã tìm thấy ảnh
+    FAILED = "failed"
+
+
+class Cancelled(Exception):
+    """Ném ra từ các lần chờ của engine khi có yêu cầu dừng"""
+
+
+class ActionEngine:
+    def __init__(self, image_clicker, coord_clicker=None, listener=None, window=None):
+        self.image_clicker = image_clicker
+        self.coord_clicker = coord_clicker or CoordinateClicker()
+        # listener(event, info): "state", "loop", "action", "found", "interrupt", "error"
+        self.listener = listener
+        # (left, top, width, height): toạ độ trong kịch bản là toạ độ trong cửa sổ này
+        self.window = window
+        self._state = RunState.IDLE
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+        # Đánh thức sleep() khi có yêu cầu dừng hoặc popup cần xử lý
+        self._wake = threading.Event()
+        self._thread = None
+        # (Interrupt, MatchResult) chờ xử lý; quy tắc đang xử lý không được xếp lại
+        self._interrupts = deque()
+        self._interrupt_lock = threading.Lock()
+        self._active_interrupt = None
+        self._handling = False
+        self.interrupt_clicker = None
+        self.timeline = Timeline(sleep=self.sleep)
+        self._screen_size = None
+
+    # ----- Trạng thái -----
+
+    @property
+    def state(self):
+        return self._state
+
+    def is_running(self):
+        return self._state in (RunState.RUNNING, RunState.STOPPING)
+
+    def _set_state(self, state):
+        with self._state_lock:
+            self._state = state
+        self._emit("state", state=state)
+
+    def _emit(self, event, **info):
+        if self.listener is not None:
+            try:
+                self.listener(event, info)
+            except Exception as e:
+                print(f"Lỗi listener {event}: {str(e)}")
+
+    # ----- Điều khiển -----
+
+    def start(self, actions, total_loops=1, loop_delay=0.0):
+        """Chạy kịch bản trên luồng nền, trả về ngay"""
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Engine đang chạy")
+        # Xoá cờ dừng ngay tại đây: stop() gọi trước khi luồng mới kịp chạy vẫn có hiệu lực
+        self.reset_stop()
+        self._thread = threading.Thread(
+            target=self.run, args=(actions, total_loops, loop_delay, False), daemon=True,
+            name="action-engine")
+        self._thread.start()
+        return self._thread
+
+    def reset_stop(self):
+        """Xoá yêu cầu dừng của lần chạy trước (gọi trên luồng khởi động, trước khi chạy)"""
+        self._stop.clear()
+
+    def stop(self):
+        """Yêu cầu dừng; lần chờ đang diễn ra kết thúc ngay"""
+        if self.is_running():
+            self._set_state(RunState.STOPPING)
+        self._stop.set()
+        self._wake.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def stop_requested(self):
+        return self._stop.is_set()
+
+    def check_cancelled(self):
+        if self._stop.is_set():
+            raise Cancelled()
+
+    def checkpoint(self):
+        """Điểm an toàn giữa các bước: ném Cancelled nếu bị dừng, xử lý popup đang chờ"""
+        self.check_cancelled()
+        if self._interrupt_due():
+            self.service_interrupts()
+
+    def sleep(self, seconds):
+        """Chờ `seconds` giây, ném Cancelled nếu có yêu cầu dừng; popup xuất hiện lúc chờ được xử lý ngay"""
+        deadline = time.monotonic() + seconds
+        while True:
+            self._wake.clear()
+            self.checkpoint()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._wake.wait(remaining)
+
+    def sleep_until(self, deadline):
+        """Chờ đến mốc `deadline` (time.monotonic())"""
+        self.sleep(deadline - time.monotonic())
+
+    # ----- Popup -----
+
+    def request_interrupt(self, interrupt, match):
+        """
+        Gọi từ luồng theo dõi: xếp kịch bản xử lý popup để chạy ở điểm an toàn tiếp theo.
+        Trả về False nếu popup này đang chờ hoặc đang được xử lý.
+        """
+        with self._interrupt_lock:
+            if interrupt is self._active_interrupt or any(i is interrupt for i, _ in self._interrupts):
+                return False
+            self._interrupts.append((interrupt, match))
+        self._wake.set()
+        return True
+
+    def _interrupt_due(self):
+        return bool(self._interrupts) and not self._handling
+
+    def service_interrupts(self):
+        """Chạy kịch bản xử lý của các popup đang chờ, trả về thời gian đã dùng (giây)"""
+        started = time.monotonic()
+        self._handling = True
+        try:
+            while True:
+                with self._interrupt_lock:
+                    if not self._interrupts:
+                        break
+                    interrupt, match = self._interrupts.popleft()
+                    self._active_interrupt = interrupt
+                self._emit("interrupt", step=interrupt.step, match=match)
+                # Delay của kịch bản xử lý tính từ lúc popup được xử lý, không theo lịch của luồng chính
+                self.timeline.rebase()
+                if interrupt.program is not None:
+                    self.run_program(interrupt.program)
+                else:
+                    self.execute_image(interrupt.step, pos=(match.x, match.y))
+                with self._interrupt_lock:
+                    self._active_interrupt = None
+        finally:
+            with self._interrupt_lock:
+                self._active_interrupt = None
+            self._handling = False
+        self.timeline.rebase()
+        return time.monotonic() - started
+
+    def watch_interrupts(self, plan):
+        """Bắt đầu theo dõi các popup của `plan` trên luồng riêng, trả về InterruptWatcher hoặc None"""
+        if not plan.interrupts:
+            return None
+        if self.interrupt_clicker is None:
+            self.interrupt_clicker = self.image_clicker.spawn()
+        watcher = InterruptWatcher(self.interrupt_clicker, plan.interrupts, self.request_interrupt)
+        watcher.start()
+        return watcher
+
+    # ----- Vòng chạy -----
+
+    @property
+    def screen_size(self):
+        """Kích thước màn hình, chỉ hỏi pyautogui một lần"""
+        if self._screen_size is None:
+            self._screen_size = tuple(pyautogui.size())
+        return self._screen_size
+
+    def compile(self, actions):
+        """Biên dịch danh sách GameAction thành ExecutionPlan (xem plan.py)"""
+        return compile_plan(actions, self.screen_size, self.image_clicker.templates, self.window)
+
+    def compile_step(self, action):
+        return compile_step(action, self.screen_size, self.image_clicker.templates, self.window)
+
+    def run(self, actions, total_loops=1, loop_delay=0.0, reset_stop=True):
+        """
+        Chạy kịch bản (danh sách GameAction hoặc ExecutionPlan đã biên dịch) trên luồng
+        hiện tại, trả về trạng thái kết thúc (total_loops=None: lặp mãi).
+        `reset_stop=False`: cờ dừng đã được xoá bởi nơi khởi động (start, Worker.start).
+        """
+        if reset_stop:
+            self.reset_stop()
+        self._interrupts.clear()
+        self.timeline.start()
+        self._set_state(RunState.RUNNING)
+        final = RunState.FINISHED
+        watcher = None
+        try:
+            plan = actions if isinstance(actions, ExecutionPlan) else self.compile(actions)
+            watcher = self.watch_interrupts(plan)
+            loops = itertools.count() if total_loops is None else range(total_loops)
+            for loop in loops:
+                self._emit("loop", loop=loop, total=total_loops)
+                if self.run_once(plan):
+                    break
+                if total_loops is None or loop < total_loops - 1:
+                    self.timeline.wait(loop_delay, "loop")
+        except Cancelled:
+            final = RunState.STOPPED
+        except Exception as e:
+            print(f"Lỗi thực thi kịch bản: {str(e)}")
+            self._emit("error", error=e)
+            final = RunState.FAILED
+        finally:
+            if watcher is not None:
+                watcher.stop()
+        if final is RunState.FINISHED and self._stop.is_set():
+            final = RunState.STOPPED
+        self._set_state(final)
+        return final
+
+    def run_once(self, plan):
+        """
+        Một vòng kịch bản: click toạ độ/kiểm tra màu/chờ ảnh theo thứ tự, click mọi vị trí
+        của các action "image_all", rồi tìm các action "image" trên một lần chụp.
+        Trả về True nếu đã tìm thấy và click ảnh (kết thúc kịch bản).
+        Kịch bản có điều khiển luồng thì chạy chương trình một lượt, không kết thúc sớm.
+        """
+        if plan.program is not None:
+            self.run_program(plan.program)
+            return False
+        for step in plan.steps:
+            self.checkpoint()
+            self._emit("action", step=step)
+            self.execute_step(step)
+        for step in plan.image_all:
+            self.checkpoint()
+            self._emit("action", step=step)
+            self.execute_image_all(step)
+
+        if plan.images:
+            self.checkpoint()
+            matches = self.image_clicker.find_any(
+                plan.image_paths, match_modes=plan.match_modes, first_only=True,
+                regions=plan.regions)
+            if matches:
+                # Ưu tiên ảnh đứng trước trong danh sách
+                step = plan.image_by_path[matches[0].template_path]
+                self._emit("found", step=step, match=matches[0])
+                self.execute_image(step, pos=(matches[0].x, matches[0].y))
+                return True
+        return False
+
+    def run_program(self, program):
+        """Chạy tuần tự dãy Instruction (plan.compile_program) từ lệnh đầu đến hết"""
+        pc = 0
+        # Số lần đã chạy thân của từng vòng loop_until đang mở
+        iterations = {}
+        looping_back = False
+        while pc < len(program):
+            self.checkpoint()
+            ins = program[pc]
+            if ins.op == "step":
+                self._emit("action", step=ins.step)
+                self.execute_step(ins.step)
+            elif ins.op == "branch":
+                self._emit("action", step=ins.step)
+                if not self.image_found(ins.step):
+                    pc = ins.target
+                    continue
+            elif ins.op == "loop":
+                self._emit("action", step=ins.step)
+                count = iterations.get(pc, 0) if looping_back else 0
+                looping_back = False
+                if self.image_found(ins.step) or (ins.limit and count >= ins.limit):
+                    iterations.pop(pc, None)
+                    pc = ins.target
+                    continue
+                iterations[pc] = count + 1
+            elif ins.op == "repeat":
+                looping_back = True
+                pc = ins.target
+                continue
+            elif ins.op == "jump":
+                pc = ins.target
+                continue
+            elif ins.op == "call":
+                self.run_program(ins.program)
+            pc += 1
+
+    # ----- Thực thi từng bước -----
+
+    def execute_step(self, step):
+        """Thực thi một Step theo loại action"""
+        if step.kind == "wait_image":
+            return self.execute_wait_image(step)
+        if step.kind == "pixel":
+            return self.execute_pixel(step)
+        if step.kind == "image":
+            return self.execute_image(step)
+        if step.kind == "image_all":
+            return self.execute_image_all(step)
+        return self.execute_coordinate(step)
+
+    def image_found(self, step):
+        """Điều kiện của if_image/loop_until: ảnh mẫu có trên màn hình không"""
+        return bool(self.image_clicker.find_image(step.template, step.region, match_mode=step.match_mode,
+                                                  screen_size=self.screen_size))
+
+    def timing_stats(self):
+        """Độ trễ thực tế so với lịch của các lần chờ (xem timing.Timeline.stats)"""
+        return self.timeline.stats()
+
+    def click(self, x, y, step, move_back=False):
+        self.coord_clicker.set_delay(step.delay)
+        self.coord_clicker.click(
+            x=x,
+            y=y,
+            click_type=step.press,
+            repeat=step.repeat,
+            move_back=move_back,
+            sleep=lambda seconds: self.timeline.wait(seconds, step.label),
+        )
+
+    def execute_coordinate(self, step):
+        self.click(*step.point, step, move_back=step.move_back)
+
+    def execute_image(self, step, pos=None):
+        """Click theo ảnh. Nếu đã có `pos` thì không tìm lại."""
+        if pos is None:
+            pos = self.image_clicker.find_image(step.template, step.region, match_mode=step.match_mode,
+                                                screen_size=self.screen_size)
+        if not pos:
+            print(f"Không tìm thấy ảnh: {step.template}")
+            return False
+        self.click(pos[0], pos[1], step)
+        return True
+
+    def execute_image_all(self, step):
+        """Click lần lượt mọi vị trí tìm thấy ảnh mẫu, chỉ chụp màn hình một lần"""
+        hits = self.image_clicker.find_all(step.template, step.region, match_mode=step.match_mode)
+        if not hits:
+            print(f"Không tìm thấy ảnh: {step.template}")
+            return 0
+        for hit in hits:
+            self.checkpoint()
+            self.click(hit.x, hit.y, step)
+        return len(hits)
+
+    def execute_wait_image(self, step):
+        """Chờ ảnh mẫu xuất hiện (tối đa step.timeout giây), trả về vị trí hoặc None"""
+        deadline = time.monotonic() + step.timeout
+        while True:
+            pos = self.image_clicker.wait_for_image(
+                step.template, step.region, match_mode=step.match_mode,
+                timeout=max(0.0, deadline - time.monotonic()),
+                should_stop=lambda: self._stop.is_set() or self._interrupt_due(),
+                screen_size=self.screen_size)
+            self.check_cancelled()
+            if pos is not None or not self._interrupt_due():
+                break
+            # Popup che mất ảnh đang chờ: xử lý xong thì chờ tiếp, không tính thời gian xử lý
+            deadline += self.service_interrupts()
+        # Thời gian chờ ảnh không biết trước: lịch tính lại từ lúc này
+        self.timeline.rebase()
+        if pos is None:
+            print(f"Hết thời gian chờ ảnh: {step.template}")
+        return pos
+
+    def execute_pixel(self, step):
+        """Kiểm tra màu các điểm ảnh (một lần chụp), click nếu tất cả đều đúng"""
+        result = self.image_clicker.probe_pixels(step.probe)
+        if result is None or not result.all():
+            return False
+        self.click(*step.point, step, move_back=step.move_back)
+        return True
@@ -0,0 +1,141 @@
+"""
+frame_producer.py - Luồng nền chụp màn hình liên tục vào bộ đệm vòng.
+
+Mọi nơi cần ảnh màn hình (Worker, Kiểm tra ảnh, vòng chờ nhiệm vụ hội) đọc
+khung hình mới nhất thay vì tự chụp, nên so khớp không phải chờ chụp và
+nhiều lần tìm trong cùng một khung hình dùng chung một ảnh.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from change_detector import ChangeDetector
+from config import FRAME_PRODUCER_FPS, FRAME_BUFFER_SIZE
+from screen_capture import create_capture
+
+
+@dataclass
+class Frame:
+    frame_id: int
+    timestamp: float      # time.monotonic() lúc chụp xong
+    image: np.ndarray     # Ảnh BGR toàn màn hình chính
+    signature: np.ndarray = None      # Chữ ký theo ô (ChangeDetector.signature)
+    changed_tiles: np.ndarray = None  # Ô đã đổi so với khung hình trước
+
+
+class FrameProducer:
+    def __init__(self, fps=FRAME_PRODUCER_FPS, buffer_size=FRAME_BUFFER_SIZE, capture=None):
+        self.fps = fps
+        self.capture = capture
+        self._frames = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._next_id = 0
+        self.errors = 0
+        self.detector = ChangeDetector()
+        # Số lần chụp mà màn hình không đổi (không sinh khung hình mới)
+        self.unchanged = 0
+        # Số nơi đang dùng khung hình (acquire/release)
+        self._users = 0
+        self._users_lock = threading.Lock()
+
+    def start(self):
+        """Bắt đầu luồng chụp (gọi nhiều lần không sao)"""
+        if self.is_running():
+            return
+        with self._cond:
+            # Khung hình của lần chạy trước đã cũ, không dùng lại
+            self._frames.clear()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FrameProducer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def acquire(self):
+        """Đăng ký một nơi dùng khung hình: luồng chụp chạy khi còn ít nhất một nơi dùng"""
+        with self._users_lock:
+            self._users += 1
+            self.start()
+
+    def release(self):
+        """Huỷ đăng ký của acquire(), dừng luồng chụp khi không còn ai dùng"""
+        with self._users_lock:
+            self._users = max(0, self._users - 1)
+            if not self._users:
+                self.stop()
+
+    def is_running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        # Phiên chụp tạo trong chính luồng này
+        capture = self.capture or create_capture()
+        interval = 1.0 / self.fps if self.fps > 0 else 0.0
+        next_tick = time.monotonic()
+        while self._running:
+            try:
+                image = cv2.cvtColor(capture.grab(), cv2.COLOR_BGRA2BGR)
+            except Exception as e:
+                self.errors += 1
+                print(f"Lỗi chụp màn hình nền: {str(e)}")
+                image = None
+            if image is not None:
+                self._publish(image)
+            # Giữ nhịp theo mốc tuyệt đối, không cộng dồn độ trễ
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                with self._cond:
+                    self._cond.wait_for(lambda: not self._running, timeout=delay)
+            else:
+                next_tick = time.monotonic()
+        if self.capture is None:
+            capture.close()
+
+    def _publish(self, image):
+        signature = self.detector.signature(image)
+        previous = self.latest()
+        changed = self.detector.changed_tiles(
+            previous.signature if previous is not None else None, signature)
+        if previous is not None and not changed.any():
+            # Màn hình đứng yên: giữ nguyên khung hình (và frame_id) cũ
+            self.unchanged += 1
+            return
+        with self._cond:
+            self._next_id += 1
+            self._frames.append(Frame(self._next_id, time.monotonic(), image, signature, changed))
+            self._cond.notify_all()
+
+    def latest(self):
+        """Khung hình mới nhất (hoặc None nếu chưa có)"""
+        with self._cond:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, after_id=0, timeout=None):
+        """Chờ đến khi có khung hình mới hơn `after_id`, trả về khung hình đó hoặc None"""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (self._frames and self._frames[-1].frame_id > after_id) or not self._running,
+                timeout=timeout,
+            )
+            if self._frames and self._frames[-1].frame_id > after_id:
+                return self._frames[-1]
+            return None
+
+    def frames(self):
+        """Bản sao danh sách khung hình trong bộ đệm, cũ đến mới"""
+        with self._cond:
+            return list(self._frames)
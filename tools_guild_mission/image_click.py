@@ -1,49 +1,719 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
 import cv2
 import numpy as np
 import pyautogui
-from PIL import ImageGrab
+
+from config import (
+    DEFAULT_SEARCH_MODE, DEFAULT_MATCH_MODE, PYRAMID_LEVELS, PYRAMID_MIN_TEMPLATE_SIZE,
+    PYRAMID_CANDIDATES, PYRAMID_COARSE_MARGIN, ROI_TRACKING, ROI_MARGINS,
+    FRAME_WAIT_TIMEOUT, FRAME_GATING, MATCH_WORKERS, MULTI_SCALE, SCALE_CANDIDATES,
+    FIND_ALL_MAX_RESULTS, FIND_ALL_MIN_DISTANCE,
+    WAIT_IMAGE_TIMEOUT, WAIT_POLL_MIN, WAIT_POLL_MAX, WAIT_POLL_BACKOFF,
+)
+from change_detector import ChangeDetector
+from display_scale import ScaleStore
+from match_memo import MatchMemo
+from screen_capture import create_capture
+from template_cache import TemplateCache, convert_image
+
+
+@dataclass
+class MatchResult:
+    template_path: str
+    x: int            # Tâm ảnh tìm được (toạ độ màn hình)
+    y: int
+    score: float      # Điểm TM_CCOEFF_NORMED
+
+
+@dataclass
+class GateEntry:
+    """Kết quả so khớp gần nhất trên một khung hình, dùng lại khi các ô liên quan không đổi"""
+    frame_id: int
+    signature: np.ndarray
+    match: Optional[MatchResult]
+    box: Optional[Tuple[int, int, int, int]]   # (x1, y1, x2, y2) của ảnh tìm được
+
+
+def build_pyramid(image, levels):
+    """Trả về [ảnh gốc, 1/2, 1/4, ...] gồm `levels` tầng thu nhỏ"""
+    pyramid = [image]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+class ScreenViews:
+    """Ảnh màn hình đã chụp cùng các biến thể (xám, đường viền, pyramid), mỗi thứ tính một lần"""
+
+    def __init__(self, bgr):
+        self.bgr = bgr
+        self._images = {"color": bgr, "mask": bgr}
+        self._pyramids = {}
+
+    def get(self, mode):
+        if mode not in self._images:
+            self._images[mode] = convert_image(self.bgr, mode)
+        return self._images[mode]
+
+    def pyramid(self, mode, levels):
+        pyramid = self._pyramids.get(mode)
+        if pyramid is None or len(pyramid) <= levels:
+            pyramid = build_pyramid(self.get(mode), levels)
+            self._pyramids[mode] = pyramid
+        return pyramid
+
 
 class ImageClicker:
-    def __init__(self, confidence=0.7):
+    def __init__(self, confidence=0.7, template_cache=None,
+                 search_mode=DEFAULT_SEARCH_MODE, pyramid_levels=PYRAMID_LEVELS,
+                 track_last_hit=ROI_TRACKING, capture=None, frame_source=None,
+                 workers=MATCH_WORKERS, multi_scale=MULTI_SCALE, scale_store=None, pool=None):
         self.confidence = confidence
+        # Phiên chụp màn hình giữ mở giữa các lần tìm
+        self.capture = capture or create_capture()
+        # FrameProducer dùng chung; khi đang chạy thì đọc khung hình mới nhất thay vì tự chụp
+        self.frame_source = frame_source
+        # Bỏ qua so khớp ở các ô màn hình không đổi (chỉ khi có frame_source)
+        self.frame_gating = FRAME_GATING
+        self.change_detector = ChangeDetector()
+        self._gate = {}
+        self.gate_stats = {"reused": 0, "partial": 0, "full": 0}
+        # Kết quả đã so khớp trên khung hình hiện tại: gọi lại cùng ảnh mẫu/vùng thì không tốn gì
+        self.memo = MatchMemo()
+        # Ảnh mẫu được giải mã một lần và giữ trong bộ nhớ
+        self.templates = template_cache or TemplateCache()
+        self.search_mode = search_mode
+        self.pyramid_levels = pyramid_levels
+        # Vị trí tìm thấy gần nhất: template_path -> (left, top, w, h) toạ độ màn hình
+        self.track_last_hit = track_last_hit
+        self.last_hits = {}
+        self.roi_stats = {}
+        # last_hits, roi_stats, _gate, gate_stats được ghi từ các luồng của pool (match_all)
+        # và từ nhiều engine dùng chung một ImageClicker
+        self._state_lock = threading.Lock()
+        # OpenCV nhả GIL khi so khớp nên dùng luồng là đủ để chạy song song
+        self.workers = workers or os.cpu_count() or 1
+        # `pool`: ThreadPoolExecutor dùng chung giữa nhiều ImageClicker (không tự đóng)
+        self._pool = pool
+        self._owns_pool = pool is None
+        # Tỉ lệ ảnh mẫu theo màn hình: dò một lần trên SCALE_CANDIDATES rồi lưu lại
+        self.multi_scale = multi_scale
+        self.scales = scale_store or ScaleStore()
+        self._display_key = None
+        self._scale_lock = threading.Lock()
     
-    def find_image(self, template_path, region=None):
-        """Tìm ảnh mẫu trên màn hình với xử lý lỗi đầy đủ"""
-        try:
-            # Chụp màn hình và chuyển đổi định dạng
+    def spawn(self):
+        """ImageClicker mới dùng chung ảnh mẫu, tỉ lệ, frame_source và pool, để tìm trên luồng khác"""
+        return ImageClicker(
+            self.confidence, template_cache=self.templates, search_mode=self.search_mode,
+            pyramid_levels=self.pyramid_levels, track_last_hit=self.track_last_hit,
+            frame_source=self.frame_source, workers=self.workers, multi_scale=self.multi_scale,
+            scale_store=self.scales, pool=self.pool)
+
+    def current_frame(self):
+        """Khung hình mới nhất của frame_source, hoặc None nếu không dùng luồng chụp nền"""
+        source = self.frame_source
+        if source is None or not source.is_running():
+            return None
+        return source.latest() or source.wait_for_frame(timeout=FRAME_WAIT_TIMEOUT)
+
+    def grab_screen(self, region=None, frame=None):
+        """Chụp màn hình (hoặc một vùng) và trả về ảnh BGR"""
+        frame = frame or self.current_frame()
+        if frame is not None:
             if region:
-                screen = np.array(ImageGrab.grab(bbox=region))
-            else:
-                screen = np.array(ImageGrab.grab())
-            
-            # Chuyển đổi sang định dạng BGR (OpenCV mặc định)
-            screen = cv2.cvtColor(screen, cv2.COLOR_RGB2BGR)
-            
-            # Đọc ảnh mẫu và kiểm tra
-            template = cv2.imread(template_path, cv2.IMREAD_COLOR)
-            if template is None:
-                raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
-            
-            # Kiểm tra kích thước ảnh
-            if screen.shape[0] < template.shape[0] or screen.shape[1] < template.shape[1]:
-                raise ValueError("Ảnh mẫu lớn hơn ảnh màn hình")
-            
-            # So khớp template
+                return frame.image[region[1]:region[3], region[0]:region[2]]
+            return frame.image
+        screen = self.capture.grab(region)
+        # Chuyển đổi sang định dạng BGR (OpenCV mặc định)
+        return cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
+
+    def match_template(self, screen, template_path, region=None, views=None, match_mode=None):
+        """So khớp một ảnh mẫu trên ảnh màn hình đã chụp, trả về MatchResult hoặc None"""
+        mode = match_mode or DEFAULT_MATCH_MODE
+        views = views or ScreenViews(screen)
+        # Lấy ảnh mẫu từ bộ nhớ đệm (chỉ đọc đĩa lần đầu hoặc khi file thay đổi)
+        cached = self.templates.get(template_path)
+        scale = self.display_scale()
+        calibrated = scale is None
+        if calibrated:
+            scale = self._calibrate_scale(views, cached)
+            if scale is None:
+                return None
+        mode = cached.usable_mode(mode, scale)
+        if mode is None:
+            return None
+        template = cached.variant(mode, scale)
+        mask = cached.mask_for(scale) if mode == "mask" else None
+
+        # Kiểm tra kích thước ảnh
+        if screen.shape[0] < template.shape[0] or screen.shape[1] < template.shape[1]:
+            raise ValueError("Ảnh mẫu lớn hơn ảnh màn hình")
+
+        if self.search_mode == "pyramid" and mask is None:
+            max_val, max_loc = self._locate_pyramid(views, cached, mode, scale)
+        else:
+            max_val, max_loc = self._locate_exhaustive(views.get(mode), template, mask)
+
+        if max_val < self.confidence:
+            if calibrated:
+                # Tỉ lệ dò được không xác nhận được ở độ phân giải đầy đủ: cũng tính là dò thất bại
+                self.scales.record_miss(self._scale_miss_key(views, cached))
+            return None
+        if self.display_scale() is None:
+            self.set_display_scale(scale)
+        h, w = template.shape[:2]
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        with self._state_lock:
+            self.last_hits[template_path] = (offset_x + max_loc[0], offset_y + max_loc[1], w, h)
+        return MatchResult(
+            template_path=template_path,
+            x=offset_x + max_loc[0] + w // 2,
+            y=offset_y + max_loc[1] + h // 2,
+            score=float(max_val),
+        )
+
+    @property
+    def display_key(self):
+        if self._display_key is None:
+            width, height = pyautogui.size()
+            self._display_key = ScaleStore.display_key(width, height)
+        return self._display_key
+
+    def display_scale(self):
+        """Tỉ lệ ảnh mẫu đã học cho màn hình hiện tại (None nếu chưa dò)"""
+        if not self.multi_scale:
+            return 1.0
+        return self.scales.get(self.display_key)
+
+    def set_display_scale(self, scale):
+        self.scales.set(self.display_key, scale)
+
+    def reset_display_scale(self):
+        """Quên tỉ lệ đã học, lần tìm sau sẽ dò lại"""
+        self.scales.forget(self.display_key)
+
+    def _scale_miss_key(self, views, cached):
+        """Khoá ghi nhận dò tỉ lệ thất bại: màn hình, ảnh mẫu và kích thước vùng tìm"""
+        return (self.display_key, cached.path, views.get("color").shape[:2])
+
+    def _calibrate_scale(self, views, cached):
+        """
+        Thử ảnh mẫu ở mọi tỉ lệ trong SCALE_CANDIDATES (trên ảnh xám thu nhỏ 1/2 cho nhanh),
+        trả về tỉ lệ tốt nhất hoặc None nếu không tỉ lệ nào đủ giống. Dò thất bại thì cùng
+        ảnh mẫu trên cùng màn hình/vùng không dò lại cho tới hết thời gian chờ (ScaleStore).
+        """
+        miss_key = self._scale_miss_key(views, cached)
+        # Kiểm tra trước khi lấy khoá: đang chờ dò lại thì không phải đợi luồng khác dò xong
+        if not self.scales.can_calibrate(miss_key):
+            return None
+        with self._scale_lock:
+            scale = self.display_scale()
+            if scale is not None:
+                return scale
+            if not self.scales.can_calibrate(miss_key):
+                return None
+            screen = views.pyramid("gray", 1)[1]
+            best_val, best_scale = -1.0, None
+            for candidate in SCALE_CANDIDATES:
+                template = cached.variant("gray", candidate / 2)
+                th, tw = template.shape[:2]
+                if (min(th, tw) < PYRAMID_MIN_TEMPLATE_SIZE
+                        or th > screen.shape[0] or tw > screen.shape[1]
+                        or cached.is_flat("gray", candidate / 2)):
+                    continue
+                val, _ = self._locate_exhaustive(screen, template)
+                if val > best_val:
+                    best_val, best_scale = val, candidate
+            if best_val < self.confidence - PYRAMID_COARSE_MARGIN:
+                self.scales.record_miss(miss_key)
+                return None
+            return best_scale
+
+    def _locate_exhaustive(self, screen, template, mask=None):
+        """So khớp template trên toàn bộ ảnh, trả về (điểm cao nhất, vị trí góc trái trên)"""
+        if mask is None:
             result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(result)
-            
-            if max_val >= self.confidence:
-                h, w = template.shape[:-1]
-                if region:
-                    center_x = region[0] + max_loc[0] + w // 2
-                    center_y = region[1] + max_loc[1] + h // 2
-                else:
-                    center_x = max_loc[0] + w // 2
-                    center_y = max_loc[1] + h // 2
-                return (center_x, center_y)
-            
+        else:
+            result = cv2.matchTemplate(screen, template, cv2.TM_CCOEFF_NORMED, mask=mask)
+            # Vùng phẳng dưới mặt nạ cho ra NaN/inf
+            result = np.nan_to_num(result, nan=-1.0, posinf=-1.0, neginf=-1.0)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        return max_val, max_loc
+
+    def pyramid_depth(self, template_shape):
+        """Số tầng thu nhỏ dùng được cho ảnh mẫu (ảnh mẫu ở tầng thô không được quá nhỏ)"""
+        h, w = template_shape[:2]
+        levels = 0
+        while (levels < self.pyramid_levels
+               and min(h, w) >> (levels + 1) >= PYRAMID_MIN_TEMPLATE_SIZE):
+            levels += 1
+        return levels
+
+    def _locate_pyramid(self, views, cached, mode, scale=1.0):
+        """
+        Tìm thô trên ảnh đã thu nhỏ rồi chỉ so khớp lại các cửa sổ ứng viên
+        ở độ phân giải gốc.
+        """
+        screen = views.get(mode)
+        template = cached.variant(mode, scale)
+        levels = self.pyramid_depth(template.shape)
+        if levels == 0:
+            return self._locate_exhaustive(screen, template)
+
+        # Đường viền Canny không thu nhỏ tốt, lượt thô của "edge" dùng ảnh xám
+        coarse_mode = "gray" if mode == "edge" else mode
+        coarse_screen = views.pyramid(coarse_mode, levels)[levels]
+        coarse_template = cached.pyramid(levels, coarse_mode, scale)[levels]
+        th, tw = coarse_template.shape[:2]
+        if coarse_screen.shape[0] < th or coarse_screen.shape[1] < tw:
+            return self._locate_exhaustive(screen, template)
+
+        # Lượt thô: lấy vài đỉnh tốt nhất, xoá lân cận sau mỗi đỉnh
+        coarse = cv2.matchTemplate(coarse_screen, coarse_template, cv2.TM_CCOEFF_NORMED)
+        threshold = self.confidence - PYRAMID_COARSE_MARGIN
+        candidates = []
+        best_coarse = (-1.0, (0, 0))
+        for _ in range(PYRAMID_CANDIDATES):
+            _, val, _, loc = cv2.minMaxLoc(coarse)
+            if val > best_coarse[0]:
+                best_coarse = (val, loc)
+            if val < threshold:
+                break
+            candidates.append(loc)
+            cx, cy = loc
+            coarse[max(0, cy - th // 2):cy + th // 2 + 1,
+                   max(0, cx - tw // 2):cx + tw // 2 + 1] = -1.0
+
+        scale = 1 << levels
+        if not candidates:
+            val, (cx, cy) = best_coarse
+            return val, (cx * scale, cy * scale)
+
+        # Lượt mịn: so khớp ở độ phân giải gốc quanh mỗi ứng viên
+        h, w = template.shape[:2]
+        pad = scale * 2
+        best_val, best_loc = -1.0, (0, 0)
+        for cx, cy in candidates:
+            x0 = max(0, cx * scale - pad)
+            y0 = max(0, cy * scale - pad)
+            x1 = min(screen.shape[1], cx * scale + w + pad)
+            y1 = min(screen.shape[0], cy * scale + h + pad)
+            if x1 - x0 < w or y1 - y0 < h:
+                continue
+            val, (lx, ly) = self._locate_exhaustive(screen[y0:y1, x0:x1], template)
+            if val > best_val:
+                best_val, best_loc = val, (x0 + lx, y0 + ly)
+        return best_val, best_loc
+
+    def roi_windows(self, template_path, bounds):
+        """
+        Các cửa sổ tìm kiếm quanh vị trí tìm thấy gần nhất, nhỏ đến lớn,
+        đã cắt theo `bounds` (x1, y1, x2, y2).
+        """
+        last = self.last_hits.get(template_path) if self.track_last_hit else None
+        if last is None:
+            return []
+        x, y, w, h = last
+        windows = []
+        for margin in ROI_MARGINS:
+            window = (
+                max(bounds[0], x - margin),
+                max(bounds[1], y - margin),
+                min(bounds[2], x + w + margin),
+                min(bounds[3], y + h + margin),
+            )
+            if window[2] - window[0] >= w and window[3] - window[1] >= h:
+                windows.append(window)
+        return windows
+
+    def _record_roi(self, template_path, fast_hit):
+        with self._state_lock:
+            stats = self.roi_stats.setdefault(template_path, {"fast_hits": 0, "fast_misses": 0})
+            stats["fast_hits" if fast_hit else "fast_misses"] += 1
+
+    def _match_tracked(self, screen, template_path, region=None, views=None, match_mode=None):
+        """So khớp trên ảnh đã chụp, thử các cửa sổ quanh vị trí cũ trước rồi mới toàn vùng"""
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        bounds = (offset_x, offset_y, offset_x + screen.shape[1], offset_y + screen.shape[0])
+        windows = self.roi_windows(template_path, bounds)
+        for window in windows:
+            crop = screen[window[1] - offset_y:window[3] - offset_y,
+                          window[0] - offset_x:window[2] - offset_x]
+            match = self.match_template(crop, template_path, window, match_mode=match_mode)
+            if match:
+                self._record_roi(template_path, True)
+                return match
+        if windows:
+            self._record_roi(template_path, False)
+        return self.match_template(screen, template_path, region, views, match_mode)
+
+    def _match_gated(self, frame, screen, template_path, region=None, views=None, match_mode=None):
+        """
+        So khớp có xét thay đổi màn hình so với lần so khớp trước của cùng ảnh mẫu/vùng:
+        - cùng khung hình, hoặc ô chứa ảnh tìm được không đổi: dùng lại kết quả cũ;
+        - lần trước không thấy: chỉ tìm lại quanh các ô đã đổi;
+        - còn lại: tìm đầy đủ.
+        """
+        key = (template_path, region, match_mode)
+        entry = self._gate.get(key)
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        bounds = (offset_x, offset_y, offset_x + screen.shape[1], offset_y + screen.shape[0])
+        match = None
+        searched = False
+        outcome = "full"
+        if entry is not None:
+            boxes = self.change_detector.dirty_boxes(
+                self.change_detector.changed_tiles(entry.signature, frame.signature))
+            boxes = [b for b in boxes if _overlaps(b, bounds)]
+            if entry.match is not None:
+                if not any(_overlaps(b, entry.box) for b in boxes):
+                    match = entry.match
+                    searched = True
+                    outcome = "reused"
+            else:
+                # Các ô không đổi trước đó đã không khớp, chỉ cần xét vùng đổi
+                cached = self.templates.get(template_path)
+                h, w = cached.variant(match_mode or DEFAULT_MATCH_MODE,
+                                      self.display_scale() or 1.0).shape[:2]
+                for x1, y1, x2, y2 in boxes:
+                    window = (max(bounds[0], x1 - w + 1), max(bounds[1], y1 - h + 1),
+                              min(bounds[2], x2 + w - 1), min(bounds[3], y2 + h - 1))
+                    if window[2] - window[0] < w or window[3] - window[1] < h:
+                        continue
+                    crop = screen[window[1] - offset_y:window[3] - offset_y,
+                                  window[0] - offset_x:window[2] - offset_x]
+                    match = self.match_template(crop, template_path, window, match_mode=match_mode)
+                    if match:
+                        break
+                searched = True
+                outcome = "partial" if boxes else "reused"
+
+        if not searched:
+            match = self._match_tracked(screen, template_path, region, views, match_mode)
+
+        box = None
+        if entry is not None and match is entry.match:
+            box = entry.box
+        elif match is not None:
+            # Hộp của chính kết quả này (last_hits có thể đã bị luồng khác ghi đè)
+            h, w = self.templates.get(template_path).variant(
+                match_mode or DEFAULT_MATCH_MODE, self.display_scale() or 1.0).shape[:2]
+            left, top = match.x - w // 2, match.y - h // 2
+            box = (left, top, left + w, top + h)
+        with self._state_lock:
+            self.gate_stats[outcome] += 1
+            self._gate[key] = GateEntry(frame.frame_id, frame.signature, match, box)
+        return match
+
+    def _match_frame(self, frame, screen, template_path, region=None, views=None, match_mode=None):
+        """So khớp trên khung hình của frame_source, mỗi (ảnh mẫu, vùng, kiểu) một lần mỗi khung hình"""
+        def compute():
+            if self.frame_gating:
+                return self._match_gated(frame, screen, template_path, region, views, match_mode)
+            return self._match_tracked(screen, template_path, region, views, match_mode)
+        key = ("first", template_path, region, match_mode)
+        return self.memo.get_or_compute(frame.frame_id, key, compute)
+
+    def find_image(self, template_path, region=None, match_mode=None, screen_size=None):
+        """
+        Tìm ảnh mẫu trên màn hình với xử lý lỗi đầy đủ. `screen_size` (width, height) đã biết
+        (vd. ActionEngine.screen_size) thì không phải hỏi pyautogui.size() ở mỗi lần tìm.
+        """
+        try:
+            frame = self.current_frame()
+            if frame is not None:
+                screen = self.grab_screen(region, frame)
+                match = self._match_frame(frame, screen, template_path, region, match_mode=match_mode)
+                return (match.x, match.y) if match else None
+
+            # Thử chụp và tìm trong cửa sổ nhỏ quanh vị trí cũ trước
+            if self.track_last_hit and template_path in self.last_hits:
+                bounds = region or (0, 0, *(screen_size or pyautogui.size()))
+                windows = self.roi_windows(template_path, bounds)
+                for window in windows:
+                    match = self.match_template(self.grab_screen(window), template_path, window,
+                                                match_mode=match_mode)
+                    if match:
+                        self._record_roi(template_path, True)
+                        return (match.x, match.y)
+                if windows:
+                    self._record_roi(template_path, False)
+
+            screen = self.grab_screen(region)
+            match = self.match_template(screen, template_path, region, match_mode=match_mode)
+            if match:
+                return (match.x, match.y)
+            return None
+
+        except Exception as e:
+            print(f"Lỗi tìm ảnh: {str(e)}")
             return None
-            
+
+    def wait_for_image(self, template_path, region=None, match_mode=None,
+                       timeout=WAIT_IMAGE_TIMEOUT, should_stop=None, screen_size=None):
+        """
+        Chờ đến khi ảnh mẫu xuất hiện, trả về (x, y) ngay khi thấy hoặc None khi hết `timeout`
+        (hay khi `should_stop()` trả về True).
+        Có frame_source: chỉ kiểm tra khi có khung hình mới (màn hình đã đổi).
+        Không có: tự chụp, khoảng cách giữa hai lần tăng dần từ WAIT_POLL_MIN đến WAIT_POLL_MAX.
+        """
+        deadline = time.monotonic() + timeout
+        interval = WAIT_POLL_MIN
+        frame_id = 0
+        while True:
+            frame = self.current_frame()
+            if frame is None or frame.frame_id != frame_id:
+                pos = self.find_image(template_path, region, match_mode, screen_size)
+                if pos:
+                    return pos
+                frame_id = frame.frame_id if frame is not None else 0
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (should_stop and should_stop()):
+                return None
+            wait = min(interval, remaining)
+            interval = min(interval * WAIT_POLL_BACKOFF, WAIT_POLL_MAX)
+            source = self.frame_source
+            if frame is not None and source is not None:
+                # Thức dậy ngay khi có khung hình mới, nhưng vẫn kiểm tra should_stop định kỳ
+                source.wait_for_frame(frame_id, timeout=wait)
+            else:
+                time.sleep(wait)
+
+    def probe_pixels(self, probe):
+        """
+        Kiểm tra các điều kiện màu của PixelProbe trên một khung hình, trả về mảng bool
+        (None nếu lỗi). Không có frame_source thì chỉ chụp vùng nhỏ chứa các điểm.
+        """
+        try:
+            frame = self.current_frame()
+            if frame is not None:
+                return probe.evaluate(frame.image)
+            x1, y1, x2, y2 = probe.bounds
+            region = (max(0, x1), max(0, y1), x2, y2)
+            return probe.evaluate(self.capture.grab(region), origin=region[:2])
+        except Exception as e:
+            print(f"Lỗi kiểm tra màu: {str(e)}")
+            return None
+
+    def find_all(self, template_path, region=None, match_mode=None,
+                 max_results=FIND_ALL_MAX_RESULTS):
+        """
+        Tìm mọi vị trí của ảnh mẫu trên một lần chụp (vd. tất cả rương thưởng).
+        Trả về danh sách MatchResult theo thứ tự đọc: trên xuống dưới, trái sang phải.
+        """
+        try:
+            frame = self.current_frame()
+            screen = self.grab_screen(region, frame)
+            if frame is None:
+                return self.match_instances(screen, template_path, region, match_mode=match_mode,
+                                            max_results=max_results)
+            key = ("all", template_path, region, match_mode, max_results)
+            matches = self.memo.get_or_compute(
+                frame.frame_id, key,
+                lambda: self.match_instances(screen, template_path, region, match_mode=match_mode,
+                                             max_results=max_results))
+            return list(matches)
         except Exception as e:
             print(f"Lỗi tìm ảnh: {str(e)}")
-            return None
\ No newline at end of file
+            return []
+
+    def match_instances(self, screen, template_path, region=None, views=None, match_mode=None,
+                        max_results=FIND_ALL_MAX_RESULTS):
+        """
+        Tất cả vị trí có điểm >= confidence trên một bản đồ matchTemplate,
+        loại bỏ các đỉnh chồng nhau (non-maximum suppression).
+        """
+        mode = match_mode or DEFAULT_MATCH_MODE
+        views = views or ScreenViews(screen)
+        cached = self.templates.get(template_path)
+        scale = self.display_scale()
+        calibrated = scale is None
+        if calibrated:
+            scale = self._calibrate_scale(views, cached)
+            if scale is None:
+                return []
+        mode = cached.usable_mode(mode, scale)
+        if mode is None:
+            return []
+        template = cached.variant(mode, scale)
+        mask = cached.mask_for(scale) if mode == "mask" else None
+        if screen.shape[0] < template.shape[0] or screen.shape[1] < template.shape[1]:
+            raise ValueError("Ảnh mẫu lớn hơn ảnh màn hình")
+
+        if mask is None:
+            result = cv2.matchTemplate(views.get(mode), template, cv2.TM_CCOEFF_NORMED)
+        else:
+            result = cv2.matchTemplate(views.get(mode), template, cv2.TM_CCOEFF_NORMED, mask=mask)
+            result = np.nan_to_num(result, nan=-1.0, posinf=-1.0, neginf=-1.0)
+
+        h, w = template.shape[:2]
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        matches = [
+            MatchResult(
+                template_path=template_path,
+                x=offset_x + mx + w // 2,
+                y=offset_y + my + h // 2,
+                score=score,
+            )
+            for score, mx, my in find_peaks(result, (h, w), self.confidence, max_results)
+        ]
+
+        if calibrated and not matches:
+            self.scales.record_miss(self._scale_miss_key(views, cached))
+        if matches and self.display_scale() is None:
+            self.set_display_scale(scale)
+        matches.sort(key=lambda m: (m.y, m.x))
+        return matches
+
+    def find_any(self, template_paths, region=None, match_modes=None, first_only=False,
+                 regions=None):
+        """
+        Chụp màn hình một lần rồi so khớp tất cả ảnh mẫu trên cùng khung hình.
+        `match_modes`: dict template_path -> kiểu so khớp (mặc định DEFAULT_MATCH_MODE).
+        `regions`: dict template_path -> vùng tìm kiếm riêng (nằm trong `region`).
+        Trả về danh sách MatchResult theo đúng thứ tự `template_paths`.
+        """
+        try:
+            frame = self.current_frame()
+            screen = self.grab_screen(region, frame)
+        except Exception as e:
+            print(f"Lỗi chụp màn hình: {str(e)}")
+            return []
+        return self.match_all(screen, template_paths, region, match_modes, frame, first_only, regions)
+
+    def match_all(self, screen, template_paths, region=None, match_modes=None, frame=None,
+                  first_only=False, regions=None):
+        """
+        So khớp nhiều ảnh mẫu trên một ảnh màn hình đã chụp, song song trên pool luồng.
+        Với `first_only=True` chỉ trả về ảnh đầu tiên (theo thứ tự ưu tiên) tìm thấy;
+        các ảnh xếp sau nó chưa chạy thì bị huỷ.
+        """
+        # Ảnh xám/đường viền/pyramid của màn hình tính một lần, dùng chung cho mọi ảnh mẫu
+        # (mỗi vùng riêng trong `regions` có bộ ảnh riêng, cắt từ cùng ảnh chụp)
+        match_modes = match_modes or {}
+        regions = regions or {}
+        offset_x, offset_y = (region[0], region[1]) if region else (0, 0)
+        targets = {None: (screen, region, ScreenViews(screen))}
+        for template_path in template_paths:
+            sub = regions.get(template_path)
+            if sub is not None and sub not in targets:
+                crop = screen[sub[1] - offset_y:sub[3] - offset_y, sub[0] - offset_x:sub[2] - offset_x]
+                targets[sub] = (crop, sub, ScreenViews(crop))
+
+        def match_one(template_path):
+            mode = match_modes.get(template_path)
+            target, target_region, views = targets[regions.get(template_path)]
+            try:
+                if frame is not None:
+                    return self._match_frame(frame, target, template_path, target_region, views, mode)
+                return self._match_tracked(target, template_path, target_region, views, mode)
+            except Exception as e:
+                print(f"Lỗi tìm ảnh {template_path}: {str(e)}")
+                return None
+
+        matches = []
+        if self.workers <= 1 or len(template_paths) < 2:
+            for template_path in template_paths:
+                match = match_one(template_path)
+                if match:
+                    matches.append(match)
+                    if first_only:
+                        break
+            return matches
+
+        # Tính trước các biến thể màn hình để các luồng chỉ đọc
+        for template_path in template_paths:
+            mode = match_modes.get(template_path) or DEFAULT_MATCH_MODE
+            views = targets[regions.get(template_path)][2]
+            views.get(mode)
+            if self.search_mode == "pyramid":
+                views.pyramid("gray" if mode == "edge" else mode, self.pyramid_levels)
+
+        futures = [self.pool.submit(match_one, p) for p in template_paths]
+        for i, future in enumerate(futures):
+            match = future.result()
+            if match:
+                matches.append(match)
+                if first_only:
+                    for rest in futures[i + 1:]:
+                        rest.cancel()
+                    break
+        return matches
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="match")
+        return self._pool
+
+    def shutdown(self):
+        """Dừng pool luồng so khớp (nếu pool do ImageClicker này tạo)"""
+        if self._pool is not None and self._owns_pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def cache_stats(self):
+        """Thống kê hit/miss của bộ nhớ đệm ảnh mẫu"""
+        return self.templates.stats()
+
+    def tracking_stats(self):
+        """Thống kê theo ảnh mẫu: số lần tìm thấy nhanh quanh vị trí cũ / phải tìm lại toàn vùng"""
+        with self._state_lock:
+            snapshot = {path: dict(stats) for path, stats in self.roi_stats.items()}
+        summary = {}
+        for template_path, stats in snapshot.items():
+            total = stats["fast_hits"] + stats["fast_misses"]
+            summary[template_path] = dict(stats, hit_rate=stats["fast_hits"] / total if total else 0.0)
+        return summary
+
+    def memo_stats(self):
+        """Thống kê số lần dùng lại kết quả so khớp trong cùng khung hình"""
+        return self.memo.stats()
+
+    def reset_gate(self):
+        """Quên các kết quả so khớp đã lưu theo khung hình"""
+        with self._state_lock:
+            self._gate.clear()
+        self.memo.clear()
+
+    def reset_tracking(self, template_path=None):
+        """Quên vị trí cũ (của một ảnh mẫu hoặc tất cả)"""
+        with self._state_lock:
+            if template_path is None:
+                self.last_hits.clear()
+                self.roi_stats.clear()
+            else:
+                self.last_hits.pop(template_path, None)
+                self.roi_stats.pop(template_path, None)
+
+
+def find_peaks(result, template_shape, threshold, max_results=FIND_ALL_MAX_RESULTS):
+    """
+    Các đỉnh (điểm, x, y) >= threshold trên bản đồ matchTemplate, cao đến thấp,
+    xoá lân cận sau mỗi đỉnh (non-maximum suppression). Ghi đè lên `result`.
+    """
+    h, w = template_shape[:2]
+    # Bán kính xoá quanh mỗi đỉnh đã lấy
+    rx = max(1, int(w * FIND_ALL_MIN_DISTANCE))
+    ry = max(1, int(h * FIND_ALL_MIN_DISTANCE))
+    peaks = []
+    while len(peaks) < max_results:
+        _, max_val, _, (mx, my) = cv2.minMaxLoc(result)
+        if max_val < threshold:
+            break
+        peaks.append((float(max_val), mx, my))
+        result[max(0, my - ry):my + ry + 1, max(0, mx - rx):mx + rx + 1] = -1.0
+    return peaks
+
+
+def _overlaps(a, b):
+    """Hai hình chữ nhật (x1, y1, x2, y2) có giao nhau không"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""
+input_dispatcher.py - Hàng đợi thao tác chuột dùng chung cho nhiều kịch bản.
+
+Khi nhiều ActionEngine cùng điều khiển một màn hình, các lệnh moveTo/click của
+chúng xen kẽ nhau và click nhầm chỗ. InputDispatcher nhận thao tác từ mọi engine
+và tự thực hiện trên một luồng duy nhất: mỗi thao tác (di chuột + click) chạy trọn
+vẹn, không bị chen ngang; một lần click có lặp (repeat, nghỉ giữa các lần, move_back)
+là một thao tác. Trong các thao tác đang chờ, thao tác gần con trỏ nhất
+được chạy trước để chuột đi ít nhất; thao tác đã chờ quá INPUT_MAX_WAIT thì được
+ưu tiên để không phiên nào bị bỏ đói. Thời gian chờ được ghi lại theo từng nguồn.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import numpy as np
+import pyautogui
+
+from config import INPUT_MAX_WAIT
+from coordinate_click import CoordinateClicker
+
+
+@dataclass
+class InputEvent:
+    source: str
+    x: int
+    y: int
+    press: object                   # Hàm click (None: chỉ di chuột)
+    extra_points: tuple = ()        # Các điểm click tiếp theo của cùng thao tác
+    gap: float = 0.0                # Nghỉ giữa hai lần click (giây)
+    move_back: bool = False         # Đưa chuột về chỗ cũ sau khi click xong
+    submitted: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+class InputDispatcher:
+    def __init__(self, max_wait=INPUT_MAX_WAIT, history=10000):
+        self.max_wait = max_wait
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self._cursor = None
+        # source -> thời gian chờ (giây) của các thao tác gần nhất
+        self._waits = {}
+        self._history = history
+        self.travel = 0.0           # Tổng quãng đường con trỏ (px)
+        self.executed = 0
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="input-dispatcher")
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for event in pending:
+            event.future.cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, source, x, y, press=None, extra_points=(), gap=0.0, move_back=False):
+        """
+        Xếp hàng một thao tác, trả về Future hoàn thành khi thao tác đã chạy xong.
+        `extra_points`: các điểm click tiếp theo, cách nhau `gap` giây, chạy liền trong cùng thao tác.
+        """
+        event = InputEvent(source, x, y, press, tuple(extra_points), gap, move_back)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("InputDispatcher chưa chạy")
+            self._pending.append(event)
+            self._cond.notify()
+        return event.future
+
+    def _next_event(self):
+        """Thao tác đã chờ quá lâu, nếu không thì thao tác gần con trỏ nhất"""
+        oldest = min(self._pending, key=lambda e: e.submitted)
+        if self._cursor is None or time.monotonic() - oldest.submitted > self.max_wait:
+            event = oldest
+        else:
+            cx, cy = self._cursor
+            event = min(self._pending, key=lambda e: (e.x - cx) ** 2 + (e.y - cy) ** 2)
+        self._pending.remove(event)
+        return event
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._running:
+                    return
+                event = self._next_event()
+            if not event.future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            try:
+                self._perform(event)
+            except Exception as e:
+                event.future.set_exception(e)
+            else:
+                event.future.set_result(None)
+            with self._cond:
+                self.executed += 1
+                waits = self._waits.setdefault(event.source, deque(maxlen=self._history))
+                waits.append(started - event.submitted)
+
+    def _perform(self, event):
+        """Chạy trọn một thao tác trên luồng của dispatcher"""
+        position = None
+        if event.move_back or self._cursor is None:
+            # Đọc trên chính luồng dispatcher, ngay trước khi thao tác này bắt đầu
+            position = tuple(pyautogui.position())
+            with self._cond:
+                if self._cursor is None:
+                    self._cursor = position
+        points = ((event.x, event.y),) + event.extra_points
+        for index, (x, y) in enumerate(points):
+            if index and event.gap > 0:
+                # Nghỉ giữa hai lần click vẫn giữ lượt (không thao tác nào chen vào);
+                # dừng dispatcher thì bỏ các lần còn lại
+                with self._cond:
+                    if self._cond.wait_for(lambda: not self._running, timeout=event.gap):
+                        break
+            self._move(x, y)
+            if event.press is not None:
+                event.press()
+        if event.move_back:
+            self._move(*position)
+
+    def _move(self, x, y):
+        pyautogui.moveTo(x, y, duration=0.1)
+        with self._cond:
+            self.travel += math.hypot(x - self._cursor[0], y - self._cursor[1])
+            self._cursor = (x, y)
+
+    def stats(self):
+        """Thời gian chờ trong hàng đợi (ms) theo từng nguồn, tổng quãng đường con trỏ"""
+        with self._cond:
+            snapshot = {source: list(waits) for source, waits in self._waits.items()}
+            executed, travel = self.executed, self.travel
+        sources = {}
+        for source, waits in snapshot.items():
+            values = np.array(waits) * 1000
+            if not len(values):
+                continue
+            sources[source] = {
+                "count": len(values),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return {"executed": executed, "travel_px": round(travel), "sources": sources}
+
+
+class DispatchedClicker(CoordinateClicker):
+    """CoordinateClicker gửi thao tác qua InputDispatcher thay vì gọi pyautogui trực tiếp"""
+
+    def __init__(self, dispatcher, source):
+        super().__init__()
+        self.dispatcher = dispatcher
+        self.source = source
+
+    def click(self, x, y, click_type="Click Trái", repeat=1, move_back=False, sleep=time.sleep):
+        """
+        Cả chuỗi click (mọi lần lặp, nghỉ giữa các lần và move_back) là một thao tác của
+        dispatcher nên không phiên nào chen vào giữa. Lần nghỉ sau lần click cuối chạy trên
+        luồng gọi bằng `sleep` (dừng được), không giữ lượt của dispatcher.
+        """
+        press = click_type if callable(click_type) else self.press_function(click_type)
+        # Thêm ngẫu nhiên nhỏ để tránh bị phát hiện
+        points = [(x + random.randint(-2, 2), y + random.randint(-2, 2)) for _ in range(repeat)]
+        if not points:
+            return
+        self.dispatcher.submit(self.source, *points[0], press, points[1:], self.delay, move_back).result()
+        sleep(self.delay)
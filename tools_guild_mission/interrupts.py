@@ -0,0 +1,87 @@
+"""
+interrupts.py - Theo dõi popup (mất kết nối, quảng cáo, lên cấp...) song song với kịch bản chính.
+
+InterruptWatcher chạy trên luồng riêng, so khớp ảnh mẫu của mọi action "interrupt"
+trên từng khung hình mới (một lần chụp cho tất cả, xem ImageClicker.find_any). Khi
+thấy popup, nó báo cho ActionEngine (request_interrupt); engine tạm dừng luồng chính
+ở điểm an toàn gần nhất (giữa hai bước hoặc trong lúc chờ), chạy kịch bản xử lý rồi
+tiếp tục từ chỗ đã dừng. Popup vừa kích hoạt được bỏ qua INTERRUPT_COOLDOWN giây để
+kịp đóng, không bị xử lý hai lần.
+"""
+
+import threading
+import time
+
+from config import INTERRUPT_COOLDOWN, INTERRUPT_POLL
+
+
+class InterruptWatcher:
+    def __init__(self, clicker, interrupts, on_fire, cooldown=INTERRUPT_COOLDOWN, poll=INTERRUPT_POLL):
+        # `clicker`: ImageClicker riêng của luồng theo dõi (xem ImageClicker.spawn)
+        self.clicker = clicker
+        self.interrupts = tuple(interrupts)
+        # on_fire(Interrupt, MatchResult)
+        self.on_fire = on_fire
+        self.cooldown = cooldown
+        self.poll = poll
+        self._stop = threading.Event()
+        self._thread = None
+        # Chỉ số quy tắc -> thời điểm (monotonic) được kiểm tra lại
+        self._ready_at = {}
+        self.checks = 0
+        self.fired = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="interrupt-watcher")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        frame_id = 0
+        while not self._stop.is_set():
+            source = self.clicker.frame_source
+            if source is not None and source.is_running():
+                # Chỉ kiểm tra khi màn hình có khung hình mới
+                frame = source.wait_for_frame(frame_id, timeout=self.poll)
+                if frame is None:
+                    continue
+                frame_id = frame.frame_id
+            elif self._stop.wait(self.poll):
+                break
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Lỗi theo dõi popup: {str(e)}")
+                self._stop.wait(self.poll)
+
+    def check(self):
+        """So khớp các popup không trong thời gian nghỉ trên khung hình hiện tại, trả về Interrupt đã kích hoạt"""
+        now = time.monotonic()
+        by_path = {}
+        for index, interrupt in enumerate(self.interrupts):
+            if self._ready_at.get(index, 0) <= now:
+                by_path.setdefault(interrupt.step.template, index)
+        if not by_path:
+            return None
+        steps = {path: self.interrupts[index].step for path, index in by_path.items()}
+        matches = self.clicker.find_any(
+            list(steps), match_modes={path: step.match_mode for path, step in steps.items()},
+            first_only=True,
+            regions={path: step.region for path, step in steps.items() if step.region is not None})
+        self.checks += 1
+        if not matches:
+            return None
+        index = by_path[matches[0].template_path]
+        self._ready_at[index] = time.monotonic() + self.cooldown
+        self.fired += 1
+        interrupt = self.interrupts[index]
+        self.on_fire(interrupt, matches[0])
+        return interrupt
@@ -6,6 +6,7 @@ Description: PyQt5-based auto clicker with coordinate and image click features.
 """
 
 # Standard library imports
+import os
 import sys
 import random
 import time
@@ -25,11 +26,17 @@ from PyQt5.QtGui import QIcon
 
 # Local imports
 from overlay_window import OverlayWindow
-from worker import Worker
+from worker import Worker, JobSignals
+from engine import ActionEngine
+from scheduler import JobScheduler
 from coordinate_click import CoordinateClicker
 from image_click import ImageClicker
+from frame_producer import FrameProducer
+from pixel_probe import compile_probe
+from template_atlas import TemplateAtlas, atlas_path_for
 from actions_manager import ActionsManager, GameAction
-from config import CLICK_TYPES, SEARCH_REGIONS, ASSETS_DIR
+from config import (CLICK_TYPES, SEARCH_REGIONS, ASSETS_DIR, MATCH_MODES, DEFAULT_MATCH_MODE, ATLAS_SUFFIX,
+                    IMAGE_ACTION_TYPES, FLOW_ACTION_TYPES, WAIT_IMAGE_TIMEOUT, WATCH_JITTER)
 from styles import get_stylesheet
 
 
@@ -47,40 +54,46 @@ class AutoClickerGUI(QMainWindow):
     def start_auto_click_then_search(self):
         click_actions = [a for a in self.actions_manager.actions if a.action_type == "coordinate"]
         image_actions = [a for a in self.actions_manager.actions if a.action_type == "image" and getattr(a, 'enabled', True)]
+        if not image_actions:
+            QMessageBox.warning(self, "Lỗi", "Chưa có ảnh mẫu nào được chọn để tìm")
+            return
         interval_min = self.interval_input.value()
-        self.auto_click_then_search(click_actions, image_actions, interval=interval_min*60)
+        try:
+            job = self.auto_click_then_search(click_actions, image_actions, interval=interval_min*60)
+        except ValueError as e:
+            QMessageBox.warning(self, "Lỗi", str(e))
+            return
+        self.statusBar().showMessage(f"Đã bắt đầu job tìm ảnh #{job.job_id}", 3000)
+
     def auto_click_then_search(self, click_actions, image_actions, interval=600):
         """
-        Thực hiện một số click, sau đó lặp lại việc tìm kiếm ảnh mẫu.
-        Nếu tìm thấy thì dừng lại và thông báo, nếu không thì sau 10 phút sẽ click tiếp và lặp lại quá trình cho đến khi tìm thấy ảnh.
+        Tạo job định kỳ (scheduler.WatchJob): click các toạ độ rồi tìm ảnh mẫu, thấy thì click và
+        kết thúc job, không thấy thì thử lại sau `interval` giây (± dao động). Không giữ luồng nào
+        trong lúc chờ; nhiều job chạy cùng lúc được, tiến trình báo về on_watch_progress.
         click_actions: danh sách các action toạ độ
         image_actions: danh sách các action ảnh (chỉ những ảnh được chọn enabled)
-        interval: thời gian chờ giữa các lần lặp (giây)
         """
-        import threading
-        import time
-        def worker():
-            while True:
-                # Thực hiện các click toạ độ
-                for action in click_actions:
-                    self.execute_coordinate_action(action)
-                # Tìm kiếm ảnh
-                found = False
-                for action in image_actions:
-                    pos = self.image_clicker.find_image(action.x)
-                    if pos:
-                        self.execute_image_action(action)
-                        found = True
-                        break
-                if found:
-                    QMessageBox.information(self, "Thông báo", "Đã tìm thấy ảnh mẫu!")
-                    break
-                else:
-                    QMessageBox.information(self, "Thông báo", f"Không tìm thấy ảnh, sẽ thử lại sau {interval//60} phút.")
-                    time.sleep(interval)
-        threading.Thread(target=worker, daemon=True).start()
-
-
+        return self.scheduler.add_watch(click_actions + image_actions, interval,
+                                        jitter=self.jitter_input.value() / 100)
+
+    def on_watch_progress(self, job_id, event, info):
+        """Tiến trình của các job tìm ảnh (chạy trên luồng giao diện)"""
+        if event == "run":
+            self.statusBar().showMessage(f"Job #{job_id}: tìm ảnh lần {info['run']}")
+        elif event == "waiting":
+            self.statusBar().showMessage(
+                f"Job #{job_id}: không tìm thấy ảnh, sẽ thử lại sau {info['delay'] / 60:.1f} phút")
+        elif event == "cancelled":
+            self.statusBar().showMessage(f"Job #{job_id}: đã huỷ", 3000)
+        elif event == "failed":
+            QMessageBox.warning(self, "Lỗi", f"Job #{job_id} lỗi: {info.get('error')}")
+        elif event == "found":
+            self.statusBar().showMessage(f"Job #{job_id}: đã tìm thấy ảnh mẫu", 3000)
+            QMessageBox.information(self, "Thông báo", f"Job #{job_id}: đã tìm thấy ảnh mẫu!")
+
+    def cancel_watch_jobs(self):
+        """Huỷ mọi job tìm ảnh đang chờ hoặc đang chạy"""
+        self.scheduler.cancel_all()
 
     def check_coordinate_highlight(self):
         """Bật/tắt overlay kiểm tra toạ độ, đổi nhãn nút tương ứng"""
@@ -143,7 +156,16 @@ class AutoClickerGUI(QMainWindow):
         super().__init__()
         # Core logic
         self.coord_clicker = CoordinateClicker()
-        self.image_clicker = None  # Khởi tạo khi cần
+        self.frame_producer = FrameProducer()
+        self.image_clicker = ImageClicker(frame_source=self.frame_producer)
+        # Bộ thực thi kịch bản, không phụ thuộc giao diện (Worker chỉ chạy nó trên QThread)
+        self.engine = ActionEngine(self.image_clicker, self.coord_clicker, listener=worker.on_engine_event)
+        # Các job "Auto Click & Tìm ảnh" chạy theo hẹn giờ, báo tiến trình qua signal
+        self.job_signals = JobSignals()
+        self.scheduler = JobScheduler(self.image_clicker, self.coord_clicker,
+                                      listener=self.job_signals.on_job_event)
+        # Atlas ảnh mẫu của thư mục assets (nếu đã tạo bằng template_atlas.py)
+        self.load_atlas(str(ASSETS_DIR.with_suffix(ATLAS_SUFFIX)))
         self.actions_manager = ActionsManager()
         self.worker = worker
         # UI state
@@ -267,6 +289,19 @@ class AutoClickerGUI(QMainWindow):
         
         input_group.setLayout(input_layout)
         layout.addWidget(input_group)
+        
+        # Kiểm tra màu điểm ảnh: click khi mọi điểm đúng màu
+        pixel_group = QGroupBox("Kiểm tra màu điểm ảnh")
+        pixel_layout = QHBoxLayout()
+        self.pixel_checks_input = QLineEdit()
+        self.pixel_checks_input.setPlaceholderText("x,y,#RRGGBB[,sai số[,bán kính]]; ...")
+        pixel_layout.addWidget(self.pixel_checks_input)
+        self.pick_pixel_btn = QPushButton("Lấy màu tại X, Y")
+        pixel_layout.addWidget(self.pick_pixel_btn)
+        self.add_pixel_btn = QPushButton("Thêm kiểm tra màu")
+        pixel_layout.addWidget(self.add_pixel_btn)
+        pixel_group.setLayout(pixel_layout)
+        layout.addWidget(pixel_group)
     
     def setup_image_tab(self, tab):
         """Thiết lập tab click theo ảnh"""
@@ -301,6 +336,30 @@ class AutoClickerGUI(QMainWindow):
         
         input_layout.addLayout(region_layout)
         
+        # Kiểu so khớp (màu / xám / đường viền / mặt nạ alpha)
+        match_layout = QHBoxLayout()
+        match_layout.addWidget(QLabel("Kiểu so khớp:"))
+        self.match_mode_combo = QComboBox()
+        for mode, label in MATCH_MODES.items():
+            self.match_mode_combo.addItem(label, mode)
+        self.match_mode_combo.setCurrentIndex(list(MATCH_MODES).index(DEFAULT_MATCH_MODE))
+        match_layout.addWidget(self.match_mode_combo)
+        self.click_all_check = QCheckBox("Click tất cả vị trí tìm thấy")
+        match_layout.addWidget(self.click_all_check)
+        input_layout.addLayout(match_layout)
+        
+        # Chờ ảnh xuất hiện (thay cho delay cố định lớn)
+        wait_layout = QHBoxLayout()
+        self.wait_image_check = QCheckBox("Chỉ chờ ảnh xuất hiện")
+        wait_layout.addWidget(self.wait_image_check)
+        wait_layout.addWidget(QLabel("Chờ tối đa (giây):"))
+        self.wait_timeout_input = QDoubleSpinBox()
+        self.wait_timeout_input.setRange(0.5, 600.0)
+        self.wait_timeout_input.setSingleStep(0.5)
+        self.wait_timeout_input.setValue(WAIT_IMAGE_TIMEOUT)
+        wait_layout.addWidget(self.wait_timeout_input)
+        input_layout.addLayout(wait_layout)
+        
         # Các tùy chọn
         options_layout = QHBoxLayout()
         options_layout.addWidget(QLabel("Loại Click:"))
@@ -341,6 +400,41 @@ class AutoClickerGUI(QMainWindow):
         
         input_group.setLayout(input_layout)
         layout.addWidget(input_group)
+        
+        # Điều khiển luồng: "Nếu thấy ảnh"/"Lặp đến khi thấy ảnh" dùng ảnh mẫu, khu vực
+        # và kiểu so khớp ở trên; nhãn/kịch bản con nhập ở ô bên cạnh
+        flow_group = QGroupBox("Điều khiển luồng")
+        flow_layout = QHBoxLayout()
+        self.flow_type_combo = QComboBox()
+        for kind, label in FLOW_ACTION_TYPES.items():
+            self.flow_type_combo.addItem(label, kind)
+        flow_layout.addWidget(self.flow_type_combo)
+        self.flow_arg_input = QLineEdit()
+        self.flow_arg_input.setPlaceholderText("Tên nhãn hoặc file kịch bản con")
+        flow_layout.addWidget(self.flow_arg_input)
+        flow_layout.addWidget(QLabel("Lặp tối đa:"))
+        self.flow_limit_spin = QSpinBox()
+        self.flow_limit_spin.setRange(0, 999)
+        self.flow_limit_spin.setSpecialValueText("Không giới hạn")
+        flow_layout.addWidget(self.flow_limit_spin)
+        self.add_flow_btn = QPushButton("Thêm điều khiển")
+        flow_layout.addWidget(self.add_flow_btn)
+        flow_group.setLayout(flow_layout)
+        layout.addWidget(flow_group)
+        
+        # Popup theo dõi song song: thấy ảnh mẫu ở trên thì chạy kịch bản xử lý rồi chạy tiếp
+        interrupt_group = QGroupBox("Xử lý popup")
+        interrupt_layout = QHBoxLayout()
+        interrupt_layout.addWidget(QLabel("Kịch bản xử lý:"))
+        self.handler_input = QLineEdit()
+        self.handler_input.setPlaceholderText("Trống: click vào popup")
+        interrupt_layout.addWidget(self.handler_input)
+        self.browse_handler_btn = QPushButton("Chọn")
+        interrupt_layout.addWidget(self.browse_handler_btn)
+        self.add_interrupt_btn = QPushButton("Thêm popup")
+        interrupt_layout.addWidget(self.add_interrupt_btn)
+        interrupt_group.setLayout(interrupt_layout)
+        layout.addWidget(interrupt_group)
     
     def setup_actions_table(self):
         """Thiết lập bảng hành động với spinbox điều chỉnh số lần lặp"""
@@ -431,10 +525,17 @@ class AutoClickerGUI(QMainWindow):
         self.interval_input.setRange(1, 120)
         self.interval_input.setValue(10)
         self.interval_layout.addWidget(self.interval_input)
+        self.interval_layout.addWidget(QLabel("Dao động (%):"))
+        self.jitter_input = QSpinBox()
+        self.jitter_input.setRange(0, 50)
+        self.jitter_input.setValue(int(WATCH_JITTER * 100))
+        self.interval_layout.addWidget(self.jitter_input)
         right_layout.addLayout(self.interval_layout)
         self.auto_btn = QPushButton("Auto Click & Tìm ảnh")
         self.auto_btn.setStyleSheet("background-color: #00BCD4; color: white;")
         right_layout.addWidget(self.auto_btn)
+        self.cancel_watch_btn = QPushButton("Huỷ tìm ảnh")
+        right_layout.addWidget(self.cancel_watch_btn)
         self.exit_btn = QPushButton("Exit")
         self.exit_btn.setStyleSheet("background-color: #9E9E9E; color: white;")
         right_layout.addWidget(self.exit_btn)
@@ -447,11 +548,18 @@ class AutoClickerGUI(QMainWindow):
     
     def setup_events(self):
         self.auto_btn.clicked.connect(self.start_auto_click_then_search)
+        self.cancel_watch_btn.clicked.connect(self.cancel_watch_jobs)
+        self.job_signals.progress.connect(self.on_watch_progress)
         self.track_btn.clicked.connect(self.start_position_picker)
         self.add_coord_btn.clicked.connect(self.add_coordinate_action)
+        self.pick_pixel_btn.clicked.connect(self.pick_pixel_color)
+        self.add_pixel_btn.clicked.connect(self.add_pixel_action)
         self.browse_btn.clicked.connect(self.browse_image)
         self.test_btn.clicked.connect(self.test_image)
         self.add_image_btn.clicked.connect(self.add_image_action)
+        self.add_flow_btn.clicked.connect(self.add_flow_action)
+        self.browse_handler_btn.clicked.connect(self.browse_handler)
+        self.add_interrupt_btn.clicked.connect(self.add_interrupt_action)
         self.start_btn.clicked.connect(self.start_clicking)
         self.stop_btn.clicked.connect(self.stop_clicking)
         self.clear_btn.clicked.connect(self.clear_actions)
@@ -527,7 +635,8 @@ class AutoClickerGUI(QMainWindow):
             return
         
         region = self.get_search_region()
-        pos = self.image_clicker.find_image(self.image_path.text(), region)
+        pos = self.image_clicker.find_image(
+            self.image_path.text(), region, match_mode=self.match_mode_combo.currentData())
         
         if pos:
             x, y = pos
@@ -591,6 +700,38 @@ class AutoClickerGUI(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", f"Có lỗi xảy ra: {str(e)}")
     
+    def pick_pixel_color(self):
+        """Thêm điều kiện màu cho điểm (X, Y) đang nhập, lấy màu hiện tại trên màn hình"""
+        try:
+            x, y = int(self.x_input.text()), int(self.y_input.text())
+            b, g, r = self.image_clicker.capture.grab((x, y, x + 1, y + 1))[0, 0, :3]
+        except Exception as e:
+            QMessageBox.warning(self, "Lỗi", f"Không lấy được màu: {str(e)}")
+            return
+        checks = self.pixel_checks_input.text().strip().rstrip(";")
+        check = f"{x},{y},#{r:02X}{g:02X}{b:02X}"
+        self.pixel_checks_input.setText(f"{checks}; {check}" if checks else check)
+
+    def add_pixel_action(self):
+        """Thêm hành động click khi các điểm ảnh đúng màu"""
+        text = self.pixel_checks_input.text()
+        try:
+            compile_probe(text)
+        except ValueError as e:
+            QMessageBox.warning(self, "Lỗi", str(e))
+            return
+        action = GameAction(
+            action_type="pixel",
+            x=text,
+            y="",
+            click_type=self.click_type.currentText(),
+            repeat=self.repeat_spin.value(),
+            delay=self.delay_input.value(),
+            move_back=self.move_back_check.isChecked()
+        )
+        self.actions_manager.add_action(action)
+        self.update_actions_table()
+    
     def add_image_action(self):
         """Thêm hành động click theo ảnh"""
         try:
@@ -602,92 +743,158 @@ class AutoClickerGUI(QMainWindow):
                 return
             region = self.get_search_region()
             region_text = self.region_combo.currentText()
+            if self.wait_image_check.isChecked():
+                action_type = "wait_image"
+            elif self.click_all_check.isChecked():
+                action_type = "image_all"
+            else:
+                action_type = "image"
             for image_path in image_paths:
                 action = GameAction(
-                    action_type="image",
+                    action_type=action_type,
                     x=image_path,
                     y=region_text if region_text != "Tùy chỉnh" else self.custom_region.text(),
                     click_type=self.image_click_type.currentText(),
                     repeat=self.image_repeat.value(),
                     delay=self.image_delay_input.value(),
-                    move_back=False
+                    move_back=False,
+                    match_mode=self.match_mode_combo.currentData(),
+                    timeout=self.wait_timeout_input.value()
                 )
                 self.actions_manager.add_action(action)
             self.update_actions_table()
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", f"Có lỗi xảy ra: {str(e)}")
     
+    def add_flow_action(self):
+        """Thêm action điều khiển luồng (rẽ nhánh, lặp, nhãn, gọi kịch bản con)"""
+        kind = self.flow_type_combo.currentData()
+        x, y = "", ""
+        if kind in IMAGE_ACTION_TYPES:
+            x = self.image_path.text()
+            if not x:
+                QMessageBox.warning(self, "Lỗi", "Vui lòng chọn ảnh mẫu làm điều kiện")
+                return
+            region_text = self.region_combo.currentText()
+            y = region_text if region_text != "Tùy chỉnh" else self.custom_region.text()
+        elif kind == "call":
+            x = self.flow_arg_input.text().strip()
+            if not x:
+                x, _ = QFileDialog.getOpenFileName(self, "Chọn kịch bản con", "", "JSON Files (*.json)")
+        elif kind in ("label", "goto"):
+            x = self.flow_arg_input.text().strip()
+        if kind in ("label", "goto", "call") and not x:
+            QMessageBox.warning(self, "Lỗi", "Vui lòng nhập tên nhãn hoặc kịch bản con")
+            return
+        action = GameAction(
+            action_type=kind,
+            x=x,
+            y=y,
+            click_type="",
+            repeat=self.flow_limit_spin.value(),
+            delay=self.image_delay_input.value(),
+            move_back=False,
+            match_mode=self.match_mode_combo.currentData()
+        )
+        self.actions_manager.add_action(action)
+        self.update_actions_table()
+    
+    def browse_handler(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Chọn kịch bản xử lý", "", "JSON Files (*.json)")
+        if file_path:
+            self.handler_input.setText(file_path)
+
+    def add_interrupt_action(self):
+        """Thêm popup được theo dõi song song với kịch bản chính"""
+        image_path = self.image_path.text()
+        if not image_path:
+            QMessageBox.warning(self, "Lỗi", "Vui lòng chọn ảnh popup")
+            return
+        region_text = self.region_combo.currentText()
+        action = GameAction(
+            action_type="interrupt",
+            x=image_path,
+            y=region_text if region_text != "Tùy chỉnh" else self.custom_region.text(),
+            click_type=self.image_click_type.currentText(),
+            repeat=self.image_repeat.value(),
+            delay=self.image_delay_input.value(),
+            move_back=False,
+            match_mode=self.match_mode_combo.currentData(),
+            handler=self.handler_input.text().strip()
+        )
+        self.actions_manager.add_action(action)
+        self.update_actions_table()
+    
     def update_actions_table(self):
         """Cập nhật bảng hành động"""
-        # Gom nhóm các action ảnh
-        coord_actions = [a for a in self.actions_manager.actions if a.action_type == "coordinate"]
-        image_actions = [a for a in self.actions_manager.actions if a.action_type == "image"]
-        total_rows = len(coord_actions) + len(image_actions)
-        self.action_table.setRowCount(total_rows)
-
-        # Hiển thị các action toạ độ như cũ
-        for i, action in enumerate(coord_actions):
-            self.action_table.setItem(i, 0, QTableWidgetItem(str(i+1)))
-            self.action_table.setItem(i, 1, QTableWidgetItem("Tọa độ"))
-            self.action_table.setItem(i, 2, QTableWidgetItem(action.x))
-            self.action_table.setItem(i, 3, QTableWidgetItem(action.y))
-            self.action_table.setItem(i, 4, QTableWidgetItem(action.click_type))
-            spin_box = QSpinBox()
-            spin_box.setRange(1, 999)
-            spin_box.setValue(action.repeat)
-            spin_box.valueChanged.connect(lambda value, idx=i: self.update_repeat_count(idx, value))
-            self.action_table.setCellWidget(i, 5, spin_box)
-            delay_spin = QDoubleSpinBox()
-            delay_spin.setRange(0.1, 10.0)
-            delay_spin.setSingleStep(0.1)
-            delay_spin.setValue(action.delay)
-            delay_spin.valueChanged.connect(lambda value, idx=i: self.update_delay(idx, value))
-            self.action_table.setCellWidget(i, 6, delay_spin)
-            # Cột 'Tìm kiếm' để trống cho tọa độ
-            self.action_table.setCellWidget(i, 7, QWidget())
-            self.add_control_buttons_to_row(i)
+        # Hiển thị đúng thứ tự trong kịch bản: dòng i là actions[i], các nút di chuyển/xoá/sửa
+        # theo số dòng nên luôn tác động đúng action (wait_image, pixel chạy xen giữa toạ độ)
+        actions = self.actions_manager.actions
+        self.action_table.setRowCount(len(actions))
+        for i, action in enumerate(actions):
+            self.fill_action_row(i, action)
+
+    def fill_action_row(self, i, action):
+        """Hiển thị một action trên dòng `i`"""
+        from PyQt5.QtGui import QPixmap, QIcon
+        self.action_table.setItem(i, 0, QTableWidgetItem(str(i+1)))
+        mode_label = MATCH_MODES.get(action.match_mode, action.match_mode)
+        if action.action_type in ("if_image", "loop_until"):
+            kind = f"{FLOW_ACTION_TYPES[action.action_type]} ({mode_label})"
+        elif action.action_type in FLOW_ACTION_TYPES:
+            kind = FLOW_ACTION_TYPES[action.action_type]
+        elif action.action_type in IMAGE_ACTION_TYPES:
+            kind = {"image_all": "Ảnh - tất cả", "wait_image": "Chờ ảnh",
+                    "interrupt": "Popup"}.get(action.action_type, "Ảnh")
+            kind = f"{kind} ({mode_label})"
+        else:
+            kind = "Màu điểm ảnh" if action.action_type == "pixel" else "Tọa độ"
+        self.action_table.setItem(i, 1, QTableWidgetItem(kind))
 
-        # Hiển thị từng ảnh mẫu là một dòng riêng, có checkbox để chọn tìm kiếm
-        from PyQt5.QtWidgets import QCheckBox
-        for j, action in enumerate(image_actions):
-            idx = len(coord_actions) + j
-            self.action_table.setItem(idx, 0, QTableWidgetItem(str(idx+1)))
-            self.action_table.setItem(idx, 1, QTableWidgetItem("Ảnh"))
-            from PyQt5.QtGui import QPixmap, QIcon
-            item = QTableWidgetItem()
+        item = QTableWidgetItem(action.x)
+        if action.action_type in IMAGE_ACTION_TYPES:
             pixmap = QPixmap(action.x)
             if not pixmap.isNull():
                 icon = QIcon(pixmap.scaled(40, 40, Qt.KeepAspectRatio))
                 item.setIcon(icon)
                 item.setText(action.x.split('/')[-1])
-            else:
-                item.setText(action.x)
-            self.action_table.setItem(idx, 2, item)
-            self.action_table.setItem(idx, 3, QTableWidgetItem(action.y))
-            self.action_table.setItem(idx, 4, QTableWidgetItem(action.click_type))
-            spin_box = QSpinBox()
-            spin_box.setRange(1, 999)
-            spin_box.setValue(action.repeat)
-            spin_box.valueChanged.connect(lambda value, idx=idx: self.update_repeat_count(idx, value))
-            self.action_table.setCellWidget(idx, 5, spin_box)
-            delay_spin = QDoubleSpinBox()
-            delay_spin.setRange(0.1, 10.0)
-            delay_spin.setSingleStep(0.1)
-            delay_spin.setValue(action.delay)
-            delay_spin.valueChanged.connect(lambda value, idx=idx: self.update_delay(idx, value))
-            self.action_table.setCellWidget(idx, 6, delay_spin)
+        self.action_table.setItem(i, 2, item)
+        self.action_table.setItem(i, 3, QTableWidgetItem(action.y))
+
+        if action.action_type in FLOW_ACTION_TYPES and action.action_type != "loop_until":
+            # Action điều khiển không click, không lặp, không delay
+            for column in (4, 5, 6, 7):
+                self.action_table.setCellWidget(i, column, QWidget())
+            self.add_control_buttons_to_row(i)
+            return
+
+        self.action_table.setItem(i, 4, QTableWidgetItem(action.click_type))
+        spin_box = QSpinBox()
+        # loop_until: số lần lặp tối đa, 0 là không giới hạn
+        spin_box.setRange(0 if action.action_type == "loop_until" else 1, 999)
+        spin_box.setValue(action.repeat)
+        spin_box.valueChanged.connect(lambda value, idx=i: self.update_repeat_count(idx, value))
+        self.action_table.setCellWidget(i, 5, spin_box)
+        delay_spin = QDoubleSpinBox()
+        delay_spin.setRange(0.1, 10.0)
+        delay_spin.setSingleStep(0.1)
+        delay_spin.setValue(action.delay)
+        delay_spin.valueChanged.connect(lambda value, idx=i: self.update_delay(idx, value))
+        self.action_table.setCellWidget(i, 6, delay_spin)
+        if action.action_type in ("image", "image_all", "wait_image", "interrupt"):
             # Checkbox chọn tìm kiếm
             checkbox = QCheckBox()
             checkbox.setChecked(getattr(action, 'enabled', True))
-            checkbox.stateChanged.connect(lambda state, idx=idx: self.toggle_image_enabled(idx, state))
-            self.action_table.setCellWidget(idx, 7, checkbox)
-            self.add_control_buttons_to_row(idx)
-    def toggle_image_enabled(self, idx, state):
+            checkbox.stateChanged.connect(lambda state, action=action: self.toggle_image_enabled(action, state))
+            self.action_table.setCellWidget(i, 7, checkbox)
+        else:
+            # Cột 'Tìm kiếm' để trống cho tọa độ
+            self.action_table.setCellWidget(i, 7, QWidget())
+        self.add_control_buttons_to_row(i)
+
+    def toggle_image_enabled(self, action, state):
         # Bật/tắt tìm kiếm ảnh
-        image_actions = [a for a in self.actions_manager.actions if a.action_type == "image"]
-        if 0 <= idx - len([a for a in self.actions_manager.actions if a.action_type == "coordinate"]) < len(image_actions):
-            action = image_actions[idx - len([a for a in self.actions_manager.actions if a.action_type == "coordinate"]) ]
-            action.enabled = (state == 2)
+        action.enabled = (state == 2)
     
     def update_delay(self, row, value):
         """Cập nhật delay khi người dùng thay đổi giá trị"""
@@ -709,7 +916,8 @@ class AutoClickerGUI(QMainWindow):
         
         # Cập nhật worker
         self.worker.actions = self.actions_manager.actions
-        self.worker.running = True
+        # Dùng chung luồng chụp nền với các job tìm ảnh (xem FrameProducer.acquire)
+        self.frame_producer.acquire()
         
         self.worker.start()
 
@@ -718,58 +926,12 @@ class AutoClickerGUI(QMainWindow):
         if 0 <= row < len(self.actions_manager.actions):
             self.actions_manager.actions[row].repeat = value
     
-    def execute_coordinate_action(self, action):
-        """Thực hiện hành động click theo tọa độ (tối ưu)"""
-        if not self.is_running:
-            return
-        # Chỉ set delay 1 lần
-        self.coord_clicker.set_delay(action.delay)
-        # Gom click thành 1 lần nếu có thể
-        self.coord_clicker.click(
-            x=int(action.x),
-            y=int(action.y),
-            click_type=action.click_type,
-            repeat=action.repeat,
-            move_back=action.move_back
-        )
-    
-    def execute_image_action(self, action):
-        """Thực hiện hành động click theo ảnh (tối ưu)"""
-        if not self.is_running:
-            return
-        self.coord_clicker.set_delay(action.delay)
-        region = None
-        if action.y == "Toàn màn hình":
-            region = None
-        elif action.y == "Nửa trái":
-            width, height = pyautogui.size()
-            region = (0, 0, width // 2, height)
-        elif action.y == "Nửa phải":
-            width, height = pyautogui.size()
-            region = (width // 2, 0, width, height)
-        else:
-            try:
-                region = tuple(map(int, action.y.split(',')))
-            except:
-                region = None
-        pos = self.image_clicker.find_image(action.x, region)
-        if pos:
-            x, y = pos
-            self.coord_clicker.click(
-                x=x,
-                y=y,
-                click_type=action.click_type,
-                repeat=action.repeat,
-                move_back=False
-            )
-        else:
-            QMessageBox.warning(self, "Cảnh báo", f"Không tìm thấy ảnh: {action.x}")
-    
     def stop_clicking(self):
-        """Dừng thực hiện các hành động (kể cả khi đang lặp)"""
-        self.worker.running = False
+        """Dừng thực hiện các hành động (kể cả khi đang lặp hoặc đang chờ)"""
+        self.worker.stop()
     
     def on_worker_finished(self):
+        self.frame_producer.release()
         self.is_running = False
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
@@ -793,6 +955,7 @@ class AutoClickerGUI(QMainWindow):
                 self.update_actions_table()
                 self.worker.actions = self.actions_manager.actions
                 self.worker.running = True
+                self.frame_producer.acquire()
                 self.worker.start()
     def save_script(self):
         """Lưu kịch bản ra file"""
@@ -808,8 +971,18 @@ class AutoClickerGUI(QMainWindow):
         
         if filename:
             self.actions_manager.load_from_file(filename)
+            self.load_atlas(atlas_path_for(filename))
             self.update_actions_table()
 
+    def load_atlas(self, atlas_path):
+        """Mmap atlas ảnh mẫu nếu file tồn tại"""
+        if not os.path.exists(atlas_path):
+            return
+        try:
+            self.image_clicker.templates.attach_atlas(TemplateAtlas(atlas_path))
+        except (OSError, ValueError) as e:
+            print(f"Không mở được atlas {atlas_path}: {str(e)}")
+
     def show_status(self, message, timeout=3000):
         """Hiển thị trạng thái lên status bar"""
         self.status_bar.showMessage(message, timeout)
@@ -819,6 +992,10 @@ class AutoClickerGUI(QMainWindow):
         """Xử lý khi đóng ứng dụng"""
         if self.is_tracking and self.overlay:
             self.overlay.close()
+        self.engine.stop()
+        self.scheduler.shutdown()
+        self.frame_producer.stop()
+        self.image_clicker.shutdown()
         super().closeEvent(event)
 
 
@@ -834,5 +1011,9 @@ if __name__ == "__main__":
     worker.parent = window
     worker.finished.connect(window.on_worker_finished)
     worker.stopped.connect(window.on_worker_stopped)
+    worker.state_changed.connect(lambda state: window.statusBar().showMessage(f"Trạng thái: {state}"))
+    worker.loop_started.connect(
+        lambda loop, total: window.statusBar().showMessage(f"Vòng {loop + 1}/{total or '∞'}"))
+    worker.interrupted.connect(lambda path: window.statusBar().showMessage(f"Đang xử lý popup: {path}", 3000))
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
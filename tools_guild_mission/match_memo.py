@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+
+from config import MEMO_FRAMES
+
+
+class MatchMemo:
+    """
+    Bộ nhớ ngắn hạn cho kết quả so khớp, khoá theo (frame_id, khoá tìm kiếm).
+    Nhiều action trong cùng một vòng tìm cùng ảnh mẫu/vùng trên cùng khung hình
+    chỉ phải so khớp một lần. Chỉ giữ kết quả của `max_frames` khung hình mới nhất;
+    khi có khung hình mới, kết quả của khung hình cũ nhất bị xoá.
+    """
+
+    def __init__(self, max_frames=MEMO_FRAMES):
+        self.max_frames = max_frames
+        self._frames = OrderedDict()   # frame_id -> {key: kết quả}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, frame_id, key, compute):
+        with self._lock:
+            results = self._frames.get(frame_id)
+            if results is not None and key in results:
+                self.hits += 1
+                return results[key]
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            results = self._frames.get(frame_id)
+            if results is None:
+                if self._frames and frame_id < next(reversed(self._frames)):
+                    # Khung hình đã cũ hơn khung mới nhất: không lưu
+                    return value
+                results = self._frames[frame_id] = {}
+                while len(self._frames) > self.max_frames:
+                    _, dropped = self._frames.popitem(last=False)
+                    self.evictions += len(dropped)
+            results[key] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "frames": len(self._frames),
+                "entries": sum(len(r) for r in self._frames.values()),
+            }
@@ -0,0 +1,185 @@
+"""
+multi_runner.py - Chạy nhiều kịch bản cùng lúc, mỗi kịch bản gắn với một cửa sổ game.
+
+Mỗi phiên (instance) có ActionEngine riêng, toạ độ trong kịch bản được hiểu theo
+cửa sổ của phiên đó (xem plan.py). Mọi phiên dùng chung một FrameProducer (một
+luồng chụp màn hình), một bộ nhớ đệm ảnh mẫu, một pool luồng so khớp và một
+InputDispatcher để thao tác chuột của các phiên không chen ngang nhau.
+
+Ví dụ:
+    python multi_runner.py -i acc1.json 0,0,960,540 -i acc2.json 960,0,960,540 --loops 0
+    python multi_runner.py -i acc1.json "title=LDPlayer-1" -i acc2.json "title=LDPlayer-2"
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pyautogui
+
+from actions_manager import ActionsManager
+from config import MATCH_WORKERS
+from engine import ActionEngine, RunState
+from frame_producer import FrameProducer
+from image_click import ImageClicker
+from input_dispatcher import InputDispatcher, DispatchedClicker
+from template_cache import TemplateCache
+
+
+@dataclass
+class Instance:
+    name: str
+    window: tuple          # (left, top, width, height)
+    engine: ActionEngine
+    actions: list
+    thread: object = None
+
+
+def find_window(title):
+    """(left, top, width, height) của cửa sổ đầu tiên có tiêu đề chứa `title`"""
+    get_windows = getattr(pyautogui, "getWindowsWithTitle", None)
+    if get_windows is None:
+        raise ValueError("Hệ điều hành này không hỗ trợ tìm cửa sổ theo tiêu đề, hãy nhập x,y,w,h")
+    windows = get_windows(title)
+    if not windows:
+        raise ValueError(f"Không tìm thấy cửa sổ: {title}")
+    w = windows[0]
+    return (w.left, w.top, w.width, w.height)
+
+
+def parse_window(text):
+    """'x,y,w,h' hoặc 'title=...' -> (left, top, width, height)"""
+    if text.startswith("title="):
+        return find_window(text[len("title="):])
+    values = tuple(int(v) for v in text.split(","))
+    if len(values) != 4 or values[2] <= 0 or values[3] <= 0:
+        raise ValueError(f"Cửa sổ không hợp lệ: {text} (cần x,y,w,h)")
+    return values
+
+
+class MultiRunner:
+    def __init__(self, confidence=0.7, use_frame_producer=True, workers=MATCH_WORKERS, listener=None):
+        self.frame_producer = FrameProducer() if use_frame_producer else None
+        self.templates = TemplateCache()
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                       thread_name_prefix="match")
+        self.confidence = confidence
+        self.dispatcher = InputDispatcher()
+        # listener(tên phiên, event, info)
+        self.listener = listener
+        self.instances = []
+
+    def add_instance(self, name, actions, window):
+        """Thêm một phiên chạy `actions` trong cửa sổ `window` (left, top, width, height)"""
+        clicker = ImageClicker(self.confidence, template_cache=self.templates,
+                               frame_source=self.frame_producer, pool=self.pool)
+        listener = None
+        if self.listener is not None:
+            listener = lambda event, info, name=name: self.listener(name, event, info)
+        engine = ActionEngine(clicker, DispatchedClicker(self.dispatcher, name), listener=listener,
+                              window=tuple(window))
+        instance = Instance(name, tuple(window), engine, actions)
+        self.instances.append(instance)
+        return instance
+
+    def start(self, total_loops=1, loop_delay=0.0):
+        self.dispatcher.start()
+        if self.frame_producer is not None:
+            self.frame_producer.start()
+        for instance in self.instances:
+            instance.thread = instance.engine.start(instance.actions, total_loops, loop_delay)
+
+    def stop(self):
+        for instance in self.instances:
+            instance.engine.stop()
+
+    def is_running(self):
+        return any(i.thread is not None and i.thread.is_alive() for i in self.instances)
+
+    def join(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for instance in self.instances:
+            if instance.thread is not None:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                instance.thread.join(remaining)
+
+    def input_stats(self):
+        """Thời gian chờ hàng đợi chuột của từng phiên (xem InputDispatcher.stats)"""
+        return self.dispatcher.stats()
+
+    def states(self):
+        return {i.name: i.engine.state for i in self.instances}
+
+    def close(self):
+        self.stop()
+        self.join()
+        self.dispatcher.stop()
+        if self.frame_producer is not None:
+            self.frame_producer.stop()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def log_event(name, event, info):
+    stamp = time.strftime("%H:%M:%S")
+    if event == "state":
+        print(f"[{stamp}] {name}: {info['state'].value}", flush=True)
+    elif event == "found":
+        match = info["match"]
+        print(f"[{stamp}] {name}: tìm thấy {match.template_path} tại ({match.x}, {match.y})", flush=True)
+    elif event == "interrupt":
+        print(f"[{stamp}] {name}: xử lý popup {info['step'].template}", flush=True)
+    elif event == "error":
+        print(f"[{stamp}] {name}: lỗi {info['error']}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy nhiều kịch bản, mỗi kịch bản trong một cửa sổ")
+    parser.add_argument("-i", "--instance", nargs=2, action="append", required=True,
+                        metavar=("KICH_BAN", "CUA_SO"), help="File kịch bản và cửa sổ (x,y,w,h hoặc title=...)")
+    parser.add_argument("--loops", type=int, default=1, help="Số vòng lặp mỗi phiên (0 = lặp mãi)")
+    parser.add_argument("--loop-delay", type=float, default=0.0)
+    parser.add_argument("--confidence", type=float, default=0.7)
+    parser.add_argument("--no-frame-producer", action="store_true")
+    parser.add_argument("--input-stats", action="store_true", help="In thời gian chờ hàng đợi chuột khi kết thúc")
+    args = parser.parse_args(argv)
+
+    runner = MultiRunner(args.confidence, use_frame_producer=not args.no_frame_producer, listener=log_event)
+    for index, (script, window_text) in enumerate(args.instance, 1):
+        manager = ActionsManager()
+        manager.load_from_file(script)
+        if not manager.actions:
+            print(f"Kịch bản rỗng hoặc không đọc được: {script}")
+            return 1
+        try:
+            window = parse_window(window_text)
+        except ValueError as e:
+            print(str(e))
+            return 1
+        runner.add_instance(f"#{index} {os.path.basename(script)}", manager.actions, window)
+
+    def request_stop(signum, frame):
+        runner.stop()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    try:
+        runner.start(total_loops=args.loops or None, loop_delay=args.loop_delay)
+        while runner.is_running():
+            runner.join(0.2)
+    finally:
+        runner.close()
+    if args.input_stats:
+        print(json.dumps(runner.input_stats(), indent=2, ensure_ascii=False))
+    states = runner.states().values()
+    if any(s is RunState.FAILED for s in states):
+        return 1
+    return 130 if any(s is RunState.STOPPED for s in states) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
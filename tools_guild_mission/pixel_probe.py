@@ -0,0 +1,120 @@
+"""
+pixel_probe.py - Kiểm tra màu của nhiều điểm ảnh trên một khung hình.
+
+Nhiều điều kiện (nút đã xanh chưa, thanh năng lượng đầy chưa) không cần so khớp
+ảnh mẫu: chỉ cần so màu vài điểm. Tất cả điểm được kiểm tra cùng lúc bằng một
+phép toán NumPy, nhanh hơn matchTemplate hàng chục lần.
+
+Cú pháp điều kiện (trường `x` của action "pixel"), các điều kiện cách nhau bởi ";":
+    x,y,#RRGGBB[,sai_số[,bán_kính]]
+vd. "812,640,#4CAF50,20; 900,40,#FFFFFF,10,2"
+Bán kính > 0: so màu trung bình của ô vuông (2r+1)x(2r+1) quanh điểm.
+"""
+
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from config import PIXEL_TOLERANCE
+
+
+@dataclass(frozen=True)
+class PixelCheck:
+    x: int
+    y: int
+    color: Tuple[int, int, int]   # (R, G, B)
+    tolerance: int = PIXEL_TOLERANCE
+    radius: int = 0
+
+
+def parse_color(text):
+    """'#RRGGBB' hoặc 'R/G/B' -> (R, G, B)"""
+    text = text.strip()
+    if text.startswith("#") and len(text) == 7:
+        return tuple(int(text[i:i + 2], 16) for i in (1, 3, 5))
+    parts = text.split("/")
+    if len(parts) == 3:
+        return tuple(int(p) for p in parts)
+    raise ValueError(f"Màu không hợp lệ: {text}")
+
+
+def parse_checks(text):
+    """Chuỗi điều kiện -> tuple PixelCheck"""
+    checks = []
+    for item in text.split(";"):
+        if not item.strip():
+            continue
+        fields = [f.strip() for f in item.split(",")]
+        if not 3 <= len(fields) <= 5:
+            raise ValueError(f"Điều kiện màu không hợp lệ: {item.strip()}")
+        radius = int(fields[4]) if len(fields) > 4 else 0
+        if radius < 0:
+            raise ValueError(f"Bán kính không hợp lệ: {item.strip()}")
+        checks.append(PixelCheck(
+            x=int(fields[0]),
+            y=int(fields[1]),
+            color=parse_color(fields[2]),
+            tolerance=int(fields[3]) if len(fields) > 3 else PIXEL_TOLERANCE,
+            radius=radius,
+        ))
+    if not checks:
+        raise ValueError("Chưa có điều kiện màu nào")
+    return tuple(checks)
+
+
+class PixelProbe:
+    """Bộ điều kiện màu đã chuẩn bị sẵn thành mảng NumPy"""
+
+    def __init__(self, checks):
+        self.checks = tuple(checks)
+        self.xs = np.array([c.x for c in self.checks], dtype=np.intp)
+        self.ys = np.array([c.y for c in self.checks], dtype=np.intp)
+        # Ảnh chụp là BGR nên đảo màu sẵn một lần
+        self.colors = np.array([c.color[::-1] for c in self.checks], dtype=np.int16)
+        self.tolerances = np.array([c.tolerance for c in self.checks], dtype=np.int16)
+        radius = max(c.radius for c in self.checks)
+        # Độ lệch của mọi điểm trong ô vuông lớn nhất; điểm nằm ngoài bán kính riêng bị bỏ qua
+        dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        self.dx = dx.ravel()
+        self.dy = dy.ravel()
+        radii = np.array([c.radius for c in self.checks])[:, None]
+        self.weights = ((np.abs(self.dx)[None, :] <= radii)
+                        & (np.abs(self.dy)[None, :] <= radii)).astype(np.float32)
+        self.weights /= self.weights.sum(axis=1, keepdims=True)
+
+    def translated(self, dx, dy):
+        """Bản sao với mọi điểm dời đi (dx, dy), vd. sang toạ độ của một cửa sổ"""
+        return PixelProbe(replace(c, x=c.x + dx, y=c.y + dy) for c in self.checks)
+
+    @property
+    def bounds(self):
+        """(x1, y1, x2, y2) nhỏ nhất chứa mọi điểm cần đọc"""
+        r = int(self.dx.max())
+        return (int(self.xs.min()) - r, int(self.ys.min()) - r,
+                int(self.xs.max()) + r + 1, int(self.ys.max()) + r + 1)
+
+    def evaluate(self, image, origin=(0, 0)):
+        """
+        Mảng bool: điều kiện nào đúng trên ảnh BGR `image` (góc trái trên ở `origin`
+        theo toạ độ màn hình). Điểm nằm ngoài ảnh luôn sai.
+        """
+        h, w = image.shape[:2]
+        px = self.xs[:, None] + self.dx[None, :] - origin[0]
+        py = self.ys[:, None] + self.dy[None, :] - origin[1]
+        inside = ((px >= 0) & (px < w) & (py >= 0) & (py < h)) | (self.weights == 0)
+        samples = image[np.clip(py, 0, h - 1), np.clip(px, 0, w - 1), :3].astype(np.float32)
+        mean = np.einsum("nk,nkc->nc", self.weights, samples)
+        diff = np.abs(mean - self.colors).max(axis=1)
+        return (diff <= self.tolerances) & inside.all(axis=1)
+
+    def matches(self, image, origin=(0, 0)):
+        """True nếu mọi điều kiện đều đúng"""
+        return bool(self.evaluate(image, origin).all())
+
+
+@lru_cache(maxsize=256)
+def compile_probe(text):
+    """PixelProbe cho chuỗi điều kiện, mỗi chuỗi chỉ phân tích một lần"""
+    return PixelProbe(parse_checks(text))
@@ -0,0 +1,344 @@
+"""
+plan.py - Biên dịch kịch bản thành kế hoạch thực thi bất biến.
+
+GameAction lưu mọi thứ dạng chuỗi (toạ độ, vùng tìm kiếm "Nửa trái"/"x1,y1,x2,y2",
+loại click...). compile_plan() phân tích một lần lúc bắt đầu chạy: toạ độ thành
+int, vùng thành tuple theo kích thước màn hình đã biết, loại click thành hàm
+pyautogui, điều kiện màu thành PixelProbe và nạp sẵn ảnh mẫu vào bộ nhớ đệm.
+Vòng lặp chính không còn phân tích chuỗi hay gọi pyautogui.size().
+
+Với `window=(left, top, width, height)` kịch bản được hiểu theo toạ độ trong cửa sổ:
+toạ độ click/điểm màu/vùng tìm kiếm được dời theo góc cửa sổ, "Nửa trái"... tính theo
+kích thước cửa sổ và "Toàn màn hình" chỉ là cửa sổ đó.
+
+Kịch bản có action điều khiển luồng (FLOW_ACTION_TYPES) được biên dịch thêm thành
+chương trình tuần tự (compile_program): dãy Instruction với đích nhảy đã tính sẵn,
+kịch bản con của "call" được biên dịch lồng vào.
+    if_image <ảnh>  ... [else ...] end_if      chạy nhánh theo ảnh có trên màn hình không
+    loop_until <ảnh> ... end_loop              lặp thân đến khi thấy ảnh (tối đa `repeat` lần, 0: mãi)
+    label <tên> / goto <tên>                   nhảy tới nhãn trong cùng kịch bản
+    call <file.json>                           chạy kịch bản con rồi quay lại
+
+Action "interrupt" không nằm trong luồng chạy: chúng thành ExecutionPlan.interrupts,
+được theo dõi song song (interrupts.py) và kịch bản xử lý của chúng được biên dịch sẵn.
+
+Ảnh mẫu thiếu hoặc không đọc được không làm hỏng cả kịch bản: action đó được báo lỗi
+(kèm số thứ tự) rồi bỏ qua, các action khác vẫn chạy; điều kiện if_image/loop_until
+với ảnh lỗi giữ nguyên khối và luôn là "không thấy ảnh" lúc chạy.
+"""
+
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional, Tuple
+
+from config import DEFAULT_MATCH_MODE, IMAGE_ACTION_TYPES, FLOW_ACTION_TYPES
+from coordinate_click import CoordinateClicker
+from pixel_probe import PixelProbe, compile_probe
+
+# Các action chạy theo đúng thứ tự trong kịch bản
+STEP_ACTION_TYPES = ("coordinate", "pixel", "wait_image")
+
+
+class TemplateError(ValueError):
+    """Không đọc được ảnh mẫu của action"""
+
+
+@dataclass(frozen=True)
+class Step:
+    kind: str                           # action_type của GameAction gốc
+    label: str                          # Tên dùng cho thống kê thời gian
+    press: Callable                     # Hàm click của pyautogui
+    repeat: int
+    delay: float
+    move_back: bool
+    point: Optional[Tuple[int, int]] = None     # Toạ độ click ("coordinate", "pixel")
+    # Đường dẫn ảnh mẫu (đã nạp vào cache). Giữ đường dẫn thay vì CachedTemplate để
+    # sửa file ảnh mẫu lúc đang chạy vẫn có hiệu lực (xem TemplateCache.get)
+    template: Optional[str] = None
+    region: Optional[Tuple[int, int, int, int]] = None
+    match_mode: str = DEFAULT_MATCH_MODE
+    timeout: float = 0.0
+    probe: Optional[PixelProbe] = None
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    steps: Tuple[Step, ...]             # coordinate / pixel / wait_image theo thứ tự
+    image_all: Tuple[Step, ...]
+    images: Tuple[Step, ...]            # Tìm trên một lần chụp, ưu tiên theo thứ tự
+    image_paths: Tuple[str, ...]
+    match_modes: Mapping[str, str]
+    regions: Mapping[str, Tuple[int, int, int, int]]   # Vùng tìm kiếm riêng của từng ảnh
+    image_by_path: Mapping[str, Step]
+
+    program: Optional[Tuple["Instruction", ...]] = None   # Có action điều khiển luồng
+    interrupts: Tuple["Interrupt", ...] = ()
+
+    def __len__(self):
+        if self.program is not None:
+            return len(self.program)
+        return len(self.steps) + len(self.image_all) + len(self.images)
+
+
+@dataclass(frozen=True)
+class Instruction:
+    op: str             # "step", "branch", "loop", "repeat", "jump", "call", "nop"
+    step: Optional[Step] = None
+    target: int = -1    # Chỉ số lệnh nhảy tới
+    program: Optional[Tuple["Instruction", ...]] = None     # Kịch bản con của "call"
+    limit: int = 0      # Số lần lặp tối đa của "loop" (0: không giới hạn)
+
+
+@dataclass(frozen=True)
+class Interrupt:
+    step: Step          # Ảnh popup cần theo dõi (click vào đó nếu không có kịch bản xử lý)
+    program: Optional[Tuple[Instruction, ...]] = None       # Kịch bản xử lý đã biên dịch
+
+
+def resolve_region(text, screen_size):
+    """Trường `y` của action ảnh -> vùng (x1, y1, x2, y2) hoặc None (toàn màn hình)"""
+    width, height = screen_size
+    if not text or text == "Toàn màn hình":
+        return None
+    if text == "Nửa trái":
+        return (0, 0, width // 2, height)
+    if text == "Nửa phải":
+        return (width // 2, 0, width, height)
+    if text == "1/4 trái":
+        return (0, 0, width // 4, height)
+    if text == "1/4 phải":
+        return (width * 3 // 4, 0, width, height)
+    try:
+        region = tuple(map(int, text.split(',')))
+    except ValueError:
+        return None
+    return region if len(region) == 4 else None
+
+
+def translate_region(region, origin):
+    if region is None:
+        return None
+    dx, dy = origin
+    return (region[0] + dx, region[1] + dy, region[2] + dx, region[3] + dy)
+
+
+def compile_step(action, screen_size, templates=None, window=None):
+    """
+    Một GameAction -> Step. `templates` (TemplateCache) nếu có thì nạp sẵn ảnh mẫu.
+    `window` (left, top, width, height): toạ độ trong action là toạ độ trong cửa sổ.
+    Ném ValueError nếu action không hợp lệ, TemplateError nếu không đọc được ảnh mẫu.
+    """
+    origin = (0, 0)
+    if window is not None:
+        origin, screen_size = window[:2], window[2:]
+    common = dict(
+        kind=action.action_type,
+        label=action.comment or f"{action.action_type}:{action.x}",
+        press=CoordinateClicker.press_function(action.click_type),
+        repeat=int(action.repeat),
+        delay=float(action.delay),
+        move_back=bool(action.move_back),
+    )
+    if action.action_type == "coordinate":
+        return Step(point=(int(action.x) + origin[0], int(action.y) + origin[1]), **common)
+    if action.action_type == "pixel":
+        probe = compile_probe(action.x)
+        if window is not None:
+            probe = probe.translated(*origin)
+        if action.y:
+            x, y = map(int, action.y.split(','))
+            x, y = x + origin[0], y + origin[1]
+        else:
+            x, y = probe.checks[0].x, probe.checks[0].y
+        return Step(point=(x, y), probe=probe, **common)
+    if action.action_type in IMAGE_ACTION_TYPES:
+        if templates is not None:
+            try:
+                templates.get(action.x)
+            except ValueError as e:
+                raise TemplateError(str(e)) from e
+        region = translate_region(resolve_region(action.y, screen_size), origin)
+        if region is None and window is not None:
+            region = (origin[0], origin[1], origin[0] + screen_size[0], origin[1] + screen_size[1])
+        return Step(
+            template=action.x,
+            region=region,
+            match_mode=action.match_mode or DEFAULT_MATCH_MODE,
+            timeout=float(getattr(action, 'timeout', 0.0)),
+            **common,
+        )
+    raise ValueError(f"Loại action không hỗ trợ: {action.action_type}")
+
+
+def load_subscript(path):
+    """Danh sách GameAction của kịch bản con, ném ValueError nếu không đọc được"""
+    from actions_manager import ActionsManager
+    if not os.path.exists(path):
+        raise ValueError(f"Không tìm thấy kịch bản con: {path}")
+    manager = ActionsManager()
+    manager.load_from_file(path)
+    if not manager.actions:
+        raise ValueError(f"Kịch bản con rỗng hoặc không đọc được: {path}")
+    return manager.actions
+
+
+def compile_program(actions, screen_size, templates=None, window=None, loader=load_subscript,
+                    _calls=()):
+    """
+    Danh sách GameAction -> tuple Instruction chạy tuần tự (xem docstring của module).
+    `loader(path)` đọc kịch bản con; kịch bản con gọi lại chính nó (trực tiếp hoặc
+    gián tiếp) bị báo lỗi. Ném ValueError kèm số thứ tự action nếu kịch bản sai cấu trúc.
+    """
+    ops = []            # [op, step, target, program, limit], đổi sang Instruction ở cuối
+    blocks = []         # (loại action mở khối, chỉ số lệnh mở, số thứ tự action)
+    labels, gotos = {}, []
+    for index, action in enumerate(actions, 1):
+        kind = action.action_type
+        where = f"Action #{index} ({kind})"
+        if kind == "interrupt":
+            continue
+        if kind not in FLOW_ACTION_TYPES and kind != "coordinate" and not getattr(action, 'enabled', True):
+            continue
+        try:
+            if kind == "label":
+                if action.x in labels:
+                    raise ValueError(f"Nhãn bị trùng: {action.x}")
+                labels[action.x] = len(ops)
+            elif kind == "goto":
+                gotos.append((len(ops), action.x, where))
+                ops.append(["jump", None, -1, None, 0])
+            elif kind == "call":
+                path = os.path.abspath(action.x)
+                if path in _calls:
+                    raise ValueError(f"Kịch bản con gọi lại chính nó: {action.x}")
+                try:
+                    program = compile_program(loader(action.x), screen_size, templates, window,
+                                              loader, _calls + (path,))
+                except ValueError as e:
+                    raise ValueError(f"{action.x} -> {e}") from e
+                ops.append(["call", None, -1, program, 0])
+            elif kind in ("if_image", "loop_until"):
+                try:
+                    step = compile_step(action, screen_size, templates, window)
+                except TemplateError as e:
+                    print(f"{where}: {e}")
+                    step = compile_step(action, screen_size, None, window)
+                blocks.append((kind, len(ops), index))
+                if kind == "if_image":
+                    ops.append(["branch", step, -1, None, 0])
+                else:
+                    ops.append(["loop", step, -1, None, max(0, int(action.repeat))])
+            elif kind == "else":
+                if not blocks or blocks[-1][0] != "if_image":
+                    raise ValueError("\"else\" không nằm trong khối if_image")
+                # Nhánh đúng chạy xong thì nhảy qua nhánh else
+                ops[blocks[-1][1]][2] = len(ops) + 1
+                ops.append(["jump", None, -1, None, 0])
+                blocks[-1] = ("else", len(ops) - 1, blocks[-1][2])
+            elif kind == "end_if":
+                if not blocks or blocks[-1][0] not in ("if_image", "else"):
+                    raise ValueError("\"end_if\" không có if_image tương ứng")
+                ops[blocks.pop()[1]][2] = len(ops)
+                ops.append(["nop", None, -1, None, 0])
+            elif kind == "end_loop":
+                if not blocks or blocks[-1][0] != "loop_until":
+                    raise ValueError("\"end_loop\" không có loop_until tương ứng")
+                start = blocks.pop()[1]
+                ops.append(["repeat", None, start, None, 0])
+                ops[start][2] = len(ops)
+            else:
+                try:
+                    step = compile_step(action, screen_size, templates, window)
+                except TemplateError as e:
+                    print(f"{where}: {e}, bỏ qua action này")
+                    continue
+                ops.append(["step", step, -1, None, 0])
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"{where}: {e}") from e
+
+    if blocks:
+        kind, _, index = blocks[-1]
+        raise ValueError(f"Action #{index} ({kind}): khối chưa được đóng")
+    for position, name, where in gotos:
+        if name not in labels:
+            raise ValueError(f"{where}: không có nhãn {name}")
+        ops[position][2] = labels[name]
+    return tuple(Instruction(op, step, target, program, limit)
+                 for op, step, target, program, limit in ops)
+
+
+def compile_interrupts(actions, screen_size, templates=None, window=None, loader=load_subscript):
+    """Các action "interrupt" đang bật -> tuple Interrupt, theo thứ tự ưu tiên trong kịch bản"""
+    interrupts = []
+    for index, action in enumerate(actions, 1):
+        if action.action_type != "interrupt" or not getattr(action, 'enabled', True):
+            continue
+        try:
+            try:
+                step = compile_step(action, screen_size, templates, window)
+            except TemplateError as e:
+                print(f"Action #{index} (interrupt): {e}, bỏ qua action này")
+                continue
+            program = None
+            handler = getattr(action, 'handler', "")
+            if handler:
+                try:
+                    program = compile_program(loader(handler), screen_size, templates, window, loader)
+                except ValueError as e:
+                    raise ValueError(f"{handler} -> {e}") from e
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Action #{index} (interrupt): {e}") from e
+        interrupts.append(Interrupt(step, program))
+    return tuple(interrupts)
+
+
+def compile_plan(actions, screen_size, templates=None, window=None):
+    """
+    Biên dịch danh sách GameAction (bỏ qua action ảnh đã tắt) thành ExecutionPlan.
+    Lỗi ở action nào thì báo kèm số thứ tự của action đó.
+    """
+    interrupts = compile_interrupts(actions, screen_size, templates, window)
+    if any(a.action_type in FLOW_ACTION_TYPES for a in actions):
+        return ExecutionPlan(
+            steps=(), image_all=(), images=(), image_paths=(),
+            match_modes=MappingProxyType({}), regions=MappingProxyType({}),
+            image_by_path=MappingProxyType({}),
+            program=compile_program(actions, screen_size, templates, window),
+            interrupts=interrupts,
+        )
+
+    steps, image_all, images = [], [], []
+    for index, action in enumerate(actions, 1):
+        if action.action_type == "interrupt":
+            continue
+        if action.action_type != "coordinate" and not getattr(action, 'enabled', True):
+            continue
+        try:
+            step = compile_step(action, screen_size, templates, window)
+        except TemplateError as e:
+            print(f"Action #{index} ({action.action_type}): {e}, bỏ qua action này")
+            continue
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Action #{index} ({action.action_type}): {e}") from e
+        if step.kind in STEP_ACTION_TYPES:
+            steps.append(step)
+        elif step.kind == "image_all":
+            image_all.append(step)
+        else:
+            images.append(step)
+
+    image_by_path = {}
+    for step in images:
+        image_by_path.setdefault(step.template, step)
+    return ExecutionPlan(
+        steps=tuple(steps),
+        image_all=tuple(image_all),
+        images=tuple(images),
+        image_paths=tuple(image_by_path),
+        match_modes=MappingProxyType({path: step.match_mode for path, step in image_by_path.items()}),
+        regions=MappingProxyType({path: step.region for path, step in image_by_path.items()
+                                  if step.region is not None}),
+        image_by_path=MappingProxyType(image_by_path),
+        interrupts=interrupts,
+    )
@@ -0,0 +1,127 @@
+"""
+run_script.py - Chạy kịch bản đã lưu từ dòng lệnh, không cần giao diện (không import Qt).
+
+Ví dụ:
+    python run_script.py kich_ban.json --loops 100 --loop-delay 2
+    python run_script.py kich_ban.json --loops 0          # lặp mãi đến khi bị dừng
+
+Dừng bằng Ctrl+C hoặc SIGTERM (vd. từ process supervisor); lần chờ đang diễn ra
+kết thúc ngay. Mã thoát: 0 chạy xong, 1 lỗi, 130 bị dừng.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import time
+
+from actions_manager import ActionsManager
+from config import ASSETS_DIR, ATLAS_SUFFIX, SEARCH_MODES, DEFAULT_SEARCH_MODE
+from coordinate_click import CoordinateClicker
+from engine import ActionEngine, RunState
+from frame_producer import FrameProducer
+from image_click import ImageClicker
+from template_atlas import TemplateAtlas, atlas_path_for
+
+EXIT_CODES = {RunState.FINISHED: 0, RunState.FAILED: 1, RunState.STOPPED: 130}
+
+
+def load_atlas(clicker, atlas_path):
+    """Mmap atlas ảnh mẫu nếu file tồn tại"""
+    if not os.path.exists(atlas_path):
+        return
+    try:
+        clicker.templates.attach_atlas(TemplateAtlas(atlas_path))
+    except (OSError, ValueError) as e:
+        print(f"Không mở được atlas {atlas_path}: {str(e)}")
+
+
+def log_event(event, info):
+    stamp = time.strftime("%H:%M:%S")
+    if event == "state":
+        print(f"[{stamp}] Trạng thái: {info['state'].value}", flush=True)
+    elif event == "loop":
+        total = info["total"] or "∞"
+        print(f"[{stamp}] Vòng {info['loop'] + 1}/{total}", flush=True)
+    elif event == "found":
+        match = info["match"]
+        print(f"[{stamp}] Tìm thấy {match.template_path} tại ({match.x}, {match.y})", flush=True)
+    elif event == "interrupt":
+        print(f"[{stamp}] Xử lý popup {info['step'].template}", flush=True)
+    elif event == "error":
+        print(f"[{stamp}] Lỗi: {info['error']}", flush=True)
+
+
+def print_timing(timing):
+    """In độ trễ thực tế so với lịch, tổng và theo từng action"""
+    overall = timing["overall"]
+    if not overall["count"]:
+        return
+    print(f"Độ trễ so với lịch ({overall['count']} lần chờ trong {timing['elapsed_s']}s): "
+          f"p50={overall['p50_ms']}ms p95={overall['p95_ms']}ms max={overall['max_ms']}ms "
+          f"lấy lại mốc={overall['rebased']}")
+    for label, stats in timing["labels"].items():
+        print(f"  {label[:40]:40} n={stats['count']:<6} p50={stats['p50_ms']:8.3f}ms "
+              f"p95={stats['p95_ms']:8.3f}ms max={stats['max_ms']:8.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy kịch bản Auto Clicker không cần giao diện")
+    parser.add_argument("script", help="File kịch bản JSON")
+    parser.add_argument("--loops", type=int, default=1, help="Số vòng lặp (0 = lặp mãi)")
+    parser.add_argument("--loop-delay", type=float, default=0.0, help="Nghỉ giữa các vòng (giây)")
+    parser.add_argument("--confidence", type=float, default=0.7)
+    parser.add_argument("--search-mode", choices=SEARCH_MODES, default=DEFAULT_SEARCH_MODE)
+    parser.add_argument("--no-frame-producer", action="store_true",
+                        help="Không dùng luồng chụp nền, chụp mỗi lần tìm")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Không in tiến trình")
+    parser.add_argument("--timing-json", help="Ghi thống kê độ trễ so với lịch ra file JSON")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.script):
+        print(f"Không tìm thấy kịch bản: {args.script}")
+        return 1
+    manager = ActionsManager()
+    manager.load_from_file(args.script)
+    if not manager.actions:
+        print(f"Kịch bản rỗng hoặc không đọc được: {args.script}")
+        return 1
+
+    frame_producer = None if args.no_frame_producer else FrameProducer()
+    clicker = ImageClicker(args.confidence, search_mode=args.search_mode, frame_source=frame_producer)
+    load_atlas(clicker, str(ASSETS_DIR.with_suffix(ATLAS_SUFFIX)))
+    load_atlas(clicker, atlas_path_for(args.script))
+    engine = ActionEngine(clicker, CoordinateClicker(), listener=None if args.quiet else log_event)
+
+    def request_stop(signum, frame):
+        engine.stop()
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    if frame_producer is not None:
+        frame_producer.start()
+    try:
+        thread = engine.start(manager.actions, total_loops=args.loops or None,
+                              loop_delay=args.loop_delay)
+        # Chờ theo từng đoạn ngắn để luồng chính vẫn nhận được tín hiệu dừng
+        while thread.is_alive():
+            thread.join(0.2)
+    finally:
+        engine.stop()
+        engine.join()
+        if frame_producer is not None:
+            frame_producer.stop()
+        clicker.shutdown()
+
+    timing = engine.timing_stats()
+    if not args.quiet:
+        print_timing(timing)
+    if args.timing_json:
+        with open(args.timing_json, 'w', encoding='utf-8') as f:
+            json.dump(timing, f, indent=2, ensure_ascii=False)
+    return EXIT_CODES.get(engine.state, 1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
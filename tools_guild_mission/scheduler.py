@@ -0,0 +1,295 @@
+"""
+scheduler.py - Hẹn giờ và các job "Auto Click & Tìm ảnh" chạy định kỳ.
+
+TimerWheel là bánh xe hẹn giờ: hẹn giờ xếp vào ô theo tick WHEEL_TICK, một luồng duy
+nhất ngủ thẳng tới tick đến hạn sớm nhất (không thức theo từng tick), nên chờ 10 phút
+không tốn gì. Hẹn giờ đến hạn được chạy trên executor, huỷ hẹn giờ có hiệu lực ngay.
+
+Luồng chụp nền (FrameProducer) chỉ chạy trong lúc WatchJob đang chạy, không chạy
+suốt thời gian chờ giữa hai lần.
+
+WatchJob thay cho vòng lặp luồng cũ của auto_click_then_search: mỗi lần chạy click các
+toạ độ rồi tìm ảnh mẫu (ActionEngine, dừng được ngay); thấy ảnh thì click và kết thúc,
+không thấy thì hẹn lần sau sau `interval` giây ± jitter. Tiến trình được báo qua
+listener(job, event, info) để giao diện tự hiển thị trên luồng của nó.
+"""
+
+import itertools
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import WHEEL_TICK, WHEEL_SLOTS, WATCH_JITTER
+from engine import ActionEngine, RunState
+
+
+class Timer:
+    """Một hẹn giờ trên TimerWheel"""
+
+    def __init__(self, wheel, tick, callback):
+        self.wheel = wheel
+        self.tick = tick            # Số thứ tự tick đến hạn
+        self.callback = callback
+        self.cancelled = False
+        self.fired = False
+
+    def cancel(self):
+        """Huỷ hẹn giờ, trả về False nếu đã chạy hoặc đã huỷ"""
+        return self.wheel.cancel(self)
+
+
+class TimerWheel:
+    def __init__(self, tick=WHEEL_TICK, slots=WHEEL_SLOTS, executor=None, clock=time.monotonic):
+        self.tick = tick
+        self.clock = clock
+        self._slots = [[] for _ in range(slots)]
+        self._cond = threading.Condition()
+        self._origin = clock()
+        self._current = 0           # Tick cuối cùng đã xử lý
+        self._count = 0
+        self._running = False
+        self._thread = None
+        # Callback chạy trên executor để luồng quay bánh xe không bị chặn
+        self._owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="timer")
+
+    def __len__(self):
+        return self._count
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="timer-wheel")
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            for slot in self._slots:
+                for timer in slot:
+                    timer.cancelled = True
+                slot.clear()
+            self._count = 0
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _tick_at(self, moment):
+        return (moment - self._origin) / self.tick
+
+    def schedule(self, delay, callback):
+        """Gọi `callback()` sau `delay` giây (làm tròn lên theo tick), trả về Timer"""
+        with self._cond:
+            now = self.clock()
+            if not self._count:
+                # Bánh xe đứng yên khi không có hẹn giờ: bỏ qua các tick đã trôi qua
+                self._current = max(self._current, math.floor(self._tick_at(now)))
+            tick = max(self._current + 1, math.ceil(self._tick_at(now + max(0.0, delay))))
+            timer = Timer(self, tick, callback)
+            self._slots[tick % len(self._slots)].append(timer)
+            self._count += 1
+            self._cond.notify()
+        return timer
+
+    def cancel(self, timer):
+        with self._cond:
+            if timer.fired or timer.cancelled:
+                return False
+            timer.cancelled = True
+            self._slots[timer.tick % len(self._slots)].remove(timer)
+            self._count -= 1
+        return True
+
+    def next_tick(self):
+        """Tick đến hạn sớm nhất trong các hẹn giờ đang chờ, hoặc None"""
+        with self._cond:
+            return min((t.tick for slot in self._slots for t in slot), default=None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    nearest = self.next_tick()
+                    if nearest is None:
+                        self._cond.wait()
+                        continue
+                    # Ngủ thẳng tới hẹn giờ sớm nhất; schedule/stop đánh thức để tính lại
+                    remaining = nearest * self.tick + self._origin - self.clock()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._running:
+                    return
+                first = self._current + 1
+                self._current = max(nearest, math.floor(self._tick_at(self.clock())))
+                due = []
+                # Chỉ xét các ô của những tick vừa đi qua (nhiều nhất một vòng)
+                for tick in range(first, min(self._current, first + len(self._slots) - 1) + 1):
+                    slot = self._slots[tick % len(self._slots)]
+                    # Các hẹn giờ cùng ô nhưng ở vòng sau vẫn nằm lại
+                    due.extend(t for t in slot if t.tick <= self._current)
+                    slot[:] = [t for t in slot if t.tick > self._current]
+                due.sort(key=lambda t: t.tick)
+                self._count -= len(due)
+                for timer in due:
+                    timer.fired = True
+            for timer in due:
+                try:
+                    self.executor.submit(timer.callback)
+                except RuntimeError:
+                    # Executor đã đóng (đang tắt chương trình)
+                    return
+
+
+class WatchJob:
+    # Trạng thái: pending, running, waiting, found, finished, cancelled, failed
+    DONE = ("found", "finished", "cancelled", "failed")
+
+    def __init__(self, job_id, wheel, image_clicker, coord_clicker, actions, interval,
+                 jitter=WATCH_JITTER, listener=None, max_runs=None):
+        self.job_id = job_id
+        self.wheel = wheel
+        self.interval = interval
+        self.jitter = jitter
+        self.listener = listener
+        self.max_runs = max_runs
+        self.engine = ActionEngine(image_clicker, coord_clicker, listener=self._on_engine_event)
+        # Luồng chụp nền dùng chung (nếu có), chỉ giữ trong lúc chạy
+        self.frame_source = getattr(image_clicker, "frame_source", None)
+        # Biên dịch ngay để báo lỗi kịch bản lúc tạo job
+        self.plan = self.engine.compile(actions)
+        self.state = "pending"
+        self.runs = 0
+        self.found = None
+        self.error = None
+        self.cancelled = False
+        self.next_run = None        # Thời điểm (monotonic) của lần chạy tiếp theo
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _emit(self, event, **info):
+        if self.listener is not None:
+            try:
+                self.listener(self, event, info)
+            except Exception as e:
+                print(f"Lỗi listener {event}: {str(e)}")
+
+    def _on_engine_event(self, event, info):
+        if event == "found":
+            self.found = info["match"]
+        elif event == "error":
+            self.error = info["error"]
+
+    def next_delay(self):
+        """Khoảng chờ tới lần chạy sau: interval ± jitter"""
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def start(self, delay=0.0):
+        with self._lock:
+            self._schedule(delay)
+
+    def _schedule(self, delay):
+        self.next_run = time.monotonic() + delay
+        self._timer = self.wheel.schedule(delay, self._run)
+
+    def cancel(self):
+        """Huỷ job: bỏ hẹn giờ, lần chạy đang diễn ra dừng ngay"""
+        with self._lock:
+            if self.state in self.DONE or self.cancelled:
+                return False
+            self.cancelled = True
+            timer, self._timer = self._timer, None
+            running = self.state == "running"
+            if not running:
+                self.state = "cancelled"
+        if timer is not None:
+            timer.cancel()
+        self.engine.stop()
+        if not running:
+            self._emit("cancelled")
+        return True
+
+    def _run(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self._timer = None
+            self.next_run = None
+            self.runs += 1
+            self.state = "running"
+            # Trong khoá: cancel() đến sau đây sẽ gọi engine.stop() sau khi cờ đã được xoá
+            self.engine.reset_stop()
+        self.found = None
+        self._emit("run", run=self.runs)
+        if self.frame_source is not None:
+            self.frame_source.acquire()
+        try:
+            final = self.engine.run(self.plan, 1, reset_stop=False)
+        finally:
+            if self.frame_source is not None:
+                self.frame_source.release()
+        info = {}
+        with self._lock:
+            if self.cancelled or final is RunState.STOPPED:
+                self.state = "cancelled"
+            elif final is RunState.FAILED:
+                self.state = "failed"
+                info["error"] = self.error
+            elif self.found is not None:
+                self.state = "found"
+                info["match"] = self.found
+            elif self.max_runs and self.runs >= self.max_runs:
+                self.state = "finished"
+            else:
+                delay = self.next_delay()
+                self._schedule(delay)
+                self.state = "waiting"
+                info["delay"] = delay
+        self._emit(self.state, **info)
+
+
+class JobScheduler:
+    """Quản lý nhiều WatchJob chạy đồng thời trên một bánh xe hẹn giờ"""
+
+    def __init__(self, image_clicker, coord_clicker=None, listener=None):
+        self.image_clicker = image_clicker
+        self.coord_clicker = coord_clicker
+        # listener(job, event, info): "run", "waiting", "found", "finished", "cancelled", "failed"
+        self.listener = listener
+        # Một luồng chạy job: các job không click chen ngang nhau
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watch-job")
+        self.wheel = TimerWheel(executor=self.executor)
+        self.jobs = {}
+        self._ids = itertools.count(1)
+
+    def add_watch(self, actions, interval, jitter=WATCH_JITTER, delay=0.0, max_runs=None):
+        """Tạo và hẹn giờ một WatchJob (ném ValueError nếu kịch bản không hợp lệ)"""
+        job = WatchJob(next(self._ids), self.wheel, self.image_clicker, self.coord_clicker,
+                       actions, interval, jitter, self.listener, max_runs)
+        self.jobs[job.job_id] = job
+        self.wheel.start()
+        job.start(delay)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.cancel() if job is not None else False
+
+    def cancel_all(self):
+        for job in list(self.jobs.values()):
+            job.cancel()
+
+    def active_jobs(self):
+        return [job for job in self.jobs.values() if job.state not in WatchJob.DONE]
+
+    def shutdown(self):
+        self.cancel_all()
+        self.wheel.stop()
+        self.executor.shutdown(wait=False, cancel_futures=True)
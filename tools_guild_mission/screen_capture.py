@@ -0,0 +1,93 @@
+"""
+screen_capture.py - Chụp màn hình qua một phiên giữ mở lâu dài.
+
+Backend "mss" giữ kết nối tới màn hình (X11 / GDI / Quartz) giữa các lần chụp
+và trả về ảnh BGRA dạng view NumPy trên bộ đệm của mss (không copy).
+Nếu không cài mss thì dùng PIL.ImageGrab như trước.
+
+Kiểm tra trên Linux không có màn hình thật (tests/test_screen_capture.py):
+    xvfb-run -s "-screen 0 640x480x24" python -m pytest tests/test_screen_capture.py
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_BACKEND
+
+try:
+    import mss
+except ImportError:  # mss là tuỳ chọn
+    mss = None
+
+
+class ImageGrabCapture:
+    """Backend dự phòng: PIL.ImageGrab, mỗi lần chụp là một phiên mới"""
+
+    name = "imagegrab"
+
+    def grab(self, region=None):
+        from PIL import ImageGrab
+        image = ImageGrab.grab(bbox=region) if region else ImageGrab.grab()
+        return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGRA)
+
+    def close(self):
+        pass
+
+
+class MssCapture:
+    """Backend mss: mỗi luồng giữ một phiên mss riêng, mở một lần và dùng lại"""
+
+    name = "mss"
+
+    def __init__(self):
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = mss.mss()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def grab(self, region=None):
+        session = self._session()
+        if region:
+            x1, y1, x2, y2 = region
+            monitor = {"left": x1, "top": y1, "width": x2 - x1, "height": y2 - y1}
+        else:
+            monitor = session.monitors[1]  # Màn hình chính, giống ImageGrab.grab()
+        shot = session.grab(monitor)
+        # View trực tiếp lên bộ đệm BGRA của mss
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._local = threading.local()
+
+
+def create_capture(backend=CAPTURE_BACKEND):
+    """
+    Tạo backend chụp màn hình: "mss", "imagegrab" hoặc "auto"
+    (ưu tiên mss, không có thì dùng ImageGrab).
+    """
+    if backend in ("auto", "mss") and mss is not None:
+        try:
+            capture = MssCapture()
+            capture.grab((0, 0, 1, 1))
+            return capture
+        except Exception as e:
+            if backend == "mss":
+                raise
+            print(f"Không dùng được mss, chuyển sang ImageGrab: {str(e)}")
+    elif backend == "mss":
+        raise ValueError("Chưa cài mss (pip install mss)")
+    return ImageGrabCapture()
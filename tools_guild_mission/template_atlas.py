@@ -0,0 +1,142 @@
+"""
+template_atlas.py - Gói tất cả ảnh mẫu của một kịch bản vào một file atlas.
+
+File atlas gồm: MAGIC, độ dài header (8 byte), header JSON (chỉ mục) và dữ liệu
+ảnh thô (đã giải mã) nối tiếp nhau. Khi chạy chỉ cần mmap file một lần, mỗi ảnh
+mẫu là một view NumPy trên vùng nhớ đó, không phải đọc/giải mã PNG.
+
+Tạo atlas:
+    python template_atlas.py kich_ban.json              # -> kich_ban.atlas
+    python template_atlas.py --assets assets/ -o assets.atlas
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import ATLAS_SUFFIX, IMAGE_ACTION_TYPES
+
+MAGIC = b"THATLAS1"
+ALIGN = 64
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
+
+
+def atlas_path_for(script_path):
+    """Đường dẫn atlas đi kèm một file kịch bản"""
+    return str(Path(script_path).with_suffix(ATLAS_SUFFIX))
+
+
+def compile_atlas(template_paths, atlas_path):
+    """Giải mã các ảnh mẫu và ghi vào một file atlas, trả về số ảnh đã gói"""
+    entries = {}
+    blobs = []
+    offset = 0
+    for template_path in dict.fromkeys(template_paths):
+        path = os.path.abspath(template_path)
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            print(f"Bỏ qua, không đọc được ảnh: {template_path}")
+            continue
+        image = np.ascontiguousarray(image)
+        entries[path] = {
+            "offset": offset,
+            "shape": list(image.shape),
+            "dtype": image.dtype.str,
+            "mtime": os.stat(path).st_mtime_ns,
+        }
+        blobs.append(image)
+        offset += -(-image.nbytes // ALIGN) * ALIGN
+
+    header = json.dumps({"entries": entries}, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+    with open(atlas_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for image in blobs:
+            f.write(image.tobytes())
+            f.write(b"\0" * (-image.nbytes % ALIGN))
+    return len(entries)
+
+
+class TemplateAtlas:
+    """Atlas đã mmap; `get()` trả về view chỉ đọc, không copy"""
+
+    def __init__(self, atlas_path):
+        self.path = atlas_path
+        self._file = open(atlas_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"File atlas không hợp lệ: {atlas_path}")
+        (header_len,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_len].decode("utf-8"))
+        self.entries = header["entries"]
+        self._data_start = -(-(header_start + header_len) // ALIGN) * ALIGN
+
+    def __contains__(self, template_path):
+        return os.path.abspath(template_path) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, template_path):
+        """(ảnh, mtime lúc gói) hoặc None nếu atlas không chứa ảnh này"""
+        entry = self.entries.get(os.path.abspath(template_path))
+        if entry is None:
+            return None
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        image = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                              offset=self._data_start + entry["offset"]).reshape(entry["shape"])
+        return image, entry["mtime"]
+
+    def close(self):
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Vẫn còn view NumPy trỏ vào atlas; để GC đóng sau
+            return
+        self._file.close()
+
+
+def _script_templates(script_path):
+    from actions_manager import ActionsManager
+    manager = ActionsManager()
+    manager.load_from_file(script_path)
+    return [a.x for a in manager.actions if a.action_type in IMAGE_ACTION_TYPES]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gói ảnh mẫu thành file atlas")
+    parser.add_argument("script", nargs="?", help="File kịch bản JSON")
+    parser.add_argument("--assets", help="Thư mục ảnh mẫu (thay cho kịch bản)")
+    parser.add_argument("-o", "--output", help="File atlas đầu ra")
+    args = parser.parse_args(argv)
+
+    if args.assets:
+        templates = [str(p) for p in sorted(Path(args.assets).iterdir())
+                     if p.suffix.lower() in IMAGE_SUFFIXES]
+        output = args.output or str(Path(args.assets).with_suffix(ATLAS_SUFFIX))
+    elif args.script:
+        templates = _script_templates(args.script)
+        output = args.output or atlas_path_for(args.script)
+    else:
+        parser.error("Cần file kịch bản hoặc --assets")
+
+    count = compile_atlas(templates, output)
+    print(f"Đã gói {count} ảnh mẫu vào {output} ({os.path.getsize(output) / 1024:.0f} KB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
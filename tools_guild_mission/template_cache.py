@@ -0,0 +1,247 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from config import TEMPLATE_CACHE_MAX_BYTES, EDGE_CANNY_LOW, EDGE_CANNY_HIGH
+
+
+def convert_image(bgr, mode):
+    """Chuyển ảnh BGR sang dạng dùng để so khớp theo `mode` (xem MATCH_MODES)"""
+    if mode == "gray":
+        return cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    if mode == "edge":
+        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+        return cv2.Canny(gray, EDGE_CANNY_LOW, EDGE_CANNY_HIGH)
+    return bgr
+
+
+class CachedTemplate:
+    """Ảnh mẫu đã giải mã sẵn (BGR, grayscale, đường viền, mặt nạ alpha và các tầng pyramid)"""
+
+    def __init__(self, path, mtime, image):
+        self.path = path
+        self.mtime = mtime
+        self.mask = None
+        if image.dtype == np.uint16:
+            # PNG 16-bit (IMREAD_UNCHANGED giữ nguyên độ sâu): đưa về 8-bit như ảnh chụp màn hình
+            image = (image >> 8).astype(np.uint8)
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            # Kênh alpha: điểm trong suốt không tham gia so khớp ở chế độ "mask"
+            self.mask = np.where(image[:, :, 3] > 0, 255, 0).astype(np.uint8)
+            image = np.ascontiguousarray(image[:, :, :3])
+        self.bgr = image
+        self.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        self.variants = {("color", 1.0): self.bgr, ("gray", 1.0): self.gray}
+        self.masks = {1.0: self.mask}
+        self.pyramids = {}
+        # (mode, scale) -> ảnh mẫu không có biến thiên
+        self.flat = {}
+        # Dung lượng cộng dồn khi tạo thêm dạng ảnh; on_grow(template) báo cho TemplateCache
+        self._lock = threading.Lock()
+        self._nbytes = self.bgr.nbytes + self.gray.nbytes + (self.mask.nbytes if self.mask is not None else 0)
+        self.on_grow = None
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def _store(self, table, key, build, size):
+        """Lấy `table[key]`, chưa có thì tạo bằng `build()` và cộng `size(giá trị)` vào dung lượng"""
+        value = table.get(key)
+        if value is not None:
+            return value
+        # Tạo ngoài khoá; hai luồng cùng tạo thì giữ bản của luồng ghi trước
+        value = build()
+        with self._lock:
+            if key in table:
+                return table[key]
+            table[key] = value
+            self._nbytes += size(value)
+        if self.on_grow is not None:
+            self.on_grow(self)
+        return value
+
+    def variant(self, mode, scale=1.0):
+        """Ảnh mẫu ở dạng dùng cho `mode`, phóng to/thu nhỏ theo `scale` ("mask" dùng ảnh màu)"""
+        if mode == "mask":
+            mode = "color"
+        return self._store(self.variants, (mode, scale),
+                           lambda: convert_image(self._resized(self.bgr, scale), mode),
+                           lambda image: image.nbytes)
+
+    def is_flat(self, mode, scale=1.0):
+        """
+        True nếu ảnh mẫu dạng `mode` phẳng (std = 0 trên mọi kênh), vd. nút một màu qua Canny không còn
+        đường viền nào. TM_CCOEFF_NORMED cho ảnh phẳng điểm 1.0 ngay tại góc vùng tìm.
+        """
+        key = ("color" if mode == "mask" else mode, scale)
+        if key not in self.flat:
+            variant = self.variant(mode, scale)
+            channels = variant.reshape(-1, variant.shape[2] if variant.ndim == 3 else 1)
+            self.flat[key] = float(channels.std(axis=0).max()) == 0.0
+        return self.flat[key]
+
+    def usable_mode(self, mode, scale=1.0):
+        """`mode` nếu so khớp được; gray/edge phẳng thì dùng "color"; None nếu ảnh màu cũng phẳng"""
+        if mode in ("gray", "edge") and self.is_flat(mode, scale):
+            mode = "color"
+        if self.is_flat(mode, scale):
+            return None
+        return mode
+
+    def mask_for(self, scale=1.0):
+        """Mặt nạ alpha theo `scale` (None nếu ảnh không có kênh alpha)"""
+        if self.mask is None:
+            return None
+        return self._store(self.masks, scale,
+                           lambda: self._resized(self.mask, scale, cv2.INTER_NEAREST),
+                           lambda mask: mask.nbytes)
+
+    @staticmethod
+    def _resized(image, scale, interpolation=None):
+        if scale == 1.0:
+            return image
+        h, w = image.shape[:2]
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        if interpolation is None:
+            interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    def pyramid(self, levels, mode="gray", scale=1.0):
+        """Trả về danh sách ảnh [gốc, 1/2, 1/4, ...] với `levels` tầng thu nhỏ"""
+        def build():
+            result = [self.variant(mode, scale)]
+            for _ in range(levels):
+                h, w = result[-1].shape[:2]
+                if h < 2 or w < 2:
+                    break
+                result.append(cv2.pyrDown(result[-1]))
+            return result
+
+        # Tầng gốc chính là variant(), đã được tính
+        return self._store(self.pyramids, (levels, mode, scale), build,
+                           lambda result: sum(level.nbytes for level in result[1:]))
+
+
+class TemplateCache:
+    """
+    Bộ nhớ đệm ảnh mẫu: mỗi file chỉ đọc/giải mã một lần.
+    Khóa theo đường dẫn + mtime (sửa file thì tự đọc lại), loại bỏ theo LRU
+    khi vượt quá `max_bytes`. Nếu có atlas (template_atlas.py) thì lấy ảnh
+    đã giải mã sẵn từ atlas thay vì đọc file.
+    """
+
+    def __init__(self, max_bytes=TEMPLATE_CACHE_MAX_BYTES, atlas=None):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.atlas = atlas
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.atlas_loads = 0
+
+    def attach_atlas(self, atlas):
+        """Dùng `atlas` cho các lần nạp ảnh mẫu tiếp theo (thay atlas cũ nếu có)"""
+        with self._lock:
+            old, self.atlas = self.atlas, atlas
+        if old is not None and old is not atlas:
+            old.close()
+
+    def get(self, template_path):
+        """
+        Lấy CachedTemplate cho `template_path`, đọc từ atlas hoặc đĩa nếu chưa có.
+        Mỗi lần gọi có một os.stat (vài µs, nhỏ so với một lần matchTemplate): cố ý giữ lại
+        để sửa file ảnh mẫu trong lúc kịch bản đang chạy thì lần tìm sau dùng ngay ảnh mới.
+        """
+        path = os.path.abspath(template_path)
+        atlas = self.atlas
+        packed = atlas.get(path) if atlas is not None else None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            # Chỉ có atlas, không có file gốc: vẫn dùng được
+            if packed is None:
+                raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
+            mtime = packed[1]
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        from_atlas = packed is not None and packed[1] == mtime
+        if from_atlas:
+            image = packed[0]
+        else:
+            image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+            if image is None:
+                raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
+        entry = CachedTemplate(path, mtime, image)
+        entry.on_grow = self._on_grow
+
+        with self._lock:
+            self.misses += 1
+            self.atlas_loads += from_atlas
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            self._evict()
+        return entry
+
+    def _on_grow(self, entry):
+        # Ảnh mẫu vừa tạo thêm dạng ảnh (xám, viền, tỉ lệ, pyramid...): kiểm tra lại ngân sách
+        with self._lock:
+            if self._entries.get(entry.path) is entry:
+                self._evict()
+
+    def _evict(self):
+        # Gọi khi đang giữ self._lock. Giữ lại ít nhất một ảnh mẫu kể cả khi nó lớn hơn ngân sách
+        while len(self._entries) > 1 and self._total_bytes() > self.max_bytes:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _total_bytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def invalidate(self, template_path=None):
+        """Xóa một ảnh mẫu (hoặc toàn bộ nếu không truyền đường dẫn)"""
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(template_path), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "atlas_loads": self.atlas_loads,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.atlas_loads = 0
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Các module trong tools_guild_mission import phẳng (from config import ...)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
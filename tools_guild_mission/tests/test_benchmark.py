@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+pytest.importorskip("pyautogui")
+
+import benchmark
+
+
+def test_corpus_is_reproducible(tmp_path):
+    a = benchmark.make_corpus(tmp_path / "a", seed=1, screenshots=2, templates=3, size=(320, 240))
+    b = benchmark.make_corpus(tmp_path / "b", seed=1, screenshots=2, templates=3, size=(320, 240))
+    assert a == b
+    assert (tmp_path / "a" / "screenshots" / "s0.png").read_bytes() == \
+        (tmp_path / "b" / "screenshots" / "s0.png").read_bytes()
+
+
+def test_pipeline_finds_every_generated_template(tmp_path):
+    corpus = tmp_path / "corpus"
+    report_path = tmp_path / "report.json"
+    assert benchmark.main(["corpus", str(corpus), "--seed", "2", "--screenshots", "2",
+                           "--templates", "3", "--width", "320", "--height", "240"]) == 0
+    assert benchmark.main(["pipeline", "--corpus", str(corpus), "--repeat", "1",
+                           "--json", str(report_path)]) == 0
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["accuracy"]["rate"] == 1.0
+    assert report["stages"]["decode"]["count"] == 2
+    assert report["stages"]["capture"]["count"] == 0
@@ -0,0 +1,55 @@
+import numpy as np
+
+from change_detector import ChangeDetector
+from frame_producer import FrameProducer
+
+
+def solid(color, shape=(128, 128)):
+    image = np.zeros(shape + (3,), dtype=np.uint8)
+    image[:] = color
+    return image
+
+
+def test_identical_frames_have_no_changed_tiles():
+    detector = ChangeDetector()
+    image = solid((128, 128, 128))
+    assert not detector.changed_tiles(detector.signature(image), detector.signature(image.copy())).any()
+
+
+def test_colour_change_with_same_brightness_is_detected():
+    detector = ChangeDetector()
+    gray = solid((128, 128, 128))
+    green = gray.copy()
+    # #4CAF50 (BGR 50,AF,4C) có độ sáng gần bằng xám 128
+    green[:64, :64] = (0x50, 0xAF, 0x4C)
+    changed = detector.changed_tiles(detector.signature(gray), detector.signature(green))
+    assert changed.any()
+    assert not changed.all()
+
+
+def test_dirty_boxes_cover_changed_tile():
+    detector = ChangeDetector(tile_size=32)
+    before = solid((0, 0, 0))
+    after = before.copy()
+    after[40:50, 70:80] = 255
+    mask = detector.changed_tiles(detector.signature(before), detector.signature(after))
+    assert detector.dirty_boxes(mask) == [(64, 32, 96, 64)]
+
+
+def test_bgra_input_is_accepted():
+    detector = ChangeDetector()
+    bgra = np.zeros((100, 100, 4), dtype=np.uint8)
+    assert detector.signature(bgra).shape[-1] == 3
+
+
+def test_producer_publishes_colour_only_change():
+    producer = FrameProducer()
+    gray = solid((128, 128, 128))
+    green = gray.copy()
+    green[:64, :64] = (0x50, 0xAF, 0x4C)
+    producer._publish(gray)
+    producer._publish(gray.copy())
+    assert producer.latest().frame_id == 1
+    producer._publish(green)
+    assert producer.latest().frame_id == 2
+    assert producer.unchanged == 1
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+
+from display_scale import ScaleStore
+
+
+def test_failed_calibration_backs_off(tmp_path):
+    store = ScaleStore(tmp_path / "scale.json")
+    key = ("pc:1920x1080", "a.png", (1080, 1920))
+    assert store.can_calibrate(key, now=0.0)
+    store.record_miss(key, now=0.0)
+    assert not store.can_calibrate(key, now=1.0)
+    assert store.can_calibrate(key, now=5.0)
+    # Lần thất bại thứ hai chờ gấp đôi
+    store.record_miss(key, now=5.0)
+    assert not store.can_calibrate(key, now=14.0)
+    assert store.can_calibrate(key, now=15.0)
+    # Học được tỉ lệ thì quên các lần thất bại
+    store.record_miss(key, now=15.0)
+    store.set("pc:1920x1080", 1.0)
+    assert store.can_calibrate(key, now=15.0)
+
+
+def test_clicker_does_not_recalibrate_after_miss(tmp_path, monkeypatch):
+    pytest.importorskip("pyautogui")
+    from image_click import ImageClicker
+    path = str(tmp_path / "icon.png")
+    rng = np.random.default_rng(1)
+    cv2.imwrite(path, rng.integers(0, 255, (40, 40, 3), dtype=np.uint8))
+    screen = np.zeros((300, 400, 3), dtype=np.uint8)
+    clicker = ImageClicker(capture=object(), scale_store=ScaleStore(tmp_path / "scale.json"))
+    clicker._display_key = "pc:400x300"
+    calls = []
+    locate = clicker._locate_exhaustive
+    monkeypatch.setattr(clicker, "_locate_exhaustive", lambda *a, **k: calls.append(1) or locate(*a, **k))
+    assert clicker.match_template(screen, path) is None
+    tried = len(calls)
+    assert tried > 0
+    assert clicker.match_template(screen, path) is None
+    assert len(calls) == tried
+    clicker.shutdown()
+
+
+def test_unconfirmed_calibration_counts_as_miss(tmp_path, monkeypatch):
+    pytest.importorskip("pyautogui")
+    import image_click
+    from image_click import ImageClicker
+    rng = np.random.default_rng(3)
+    # Ảnh mẫu và nền cùng kiểu hoa văn mờ: ở 1/2 độ phân giải vẫn đủ giống để chọn được
+    # một tỉ lệ, nhưng ở độ phân giải đầy đủ thì không đạt confidence (ảnh mẫu không có trên màn hình)
+    path = str(tmp_path / "icon.png")
+    template = cv2.GaussianBlur(rng.integers(0, 255, (48, 48, 3), dtype=np.uint8), (0, 0), 3)
+    cv2.imwrite(path, cv2.normalize(template, None, 0, 255, cv2.NORM_MINMAX))
+    screen = cv2.GaussianBlur(rng.integers(0, 255, (300, 400, 3), dtype=np.uint8), (0, 0), 3)
+    clicker = ImageClicker(capture=object(), scale_store=ScaleStore(tmp_path / "scale.json"))
+    clicker._display_key = "pc:400x300"
+    calls = []
+    match = cv2.matchTemplate
+    monkeypatch.setattr(image_click.cv2, "matchTemplate", lambda *a, **k: calls.append(1) or match(*a, **k))
+    assert clicker.match_template(screen, path) is None
+    assert clicker.display_scale() is None
+    assert len(calls) > 1
+    calls.clear()
+    assert clicker.match_template(screen, path) is None
+    assert calls == []
+    clicker.shutdown()
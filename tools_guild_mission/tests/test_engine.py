@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+pytest.importorskip("pyautogui")
+
+from actions_manager import GameAction
+from engine import ActionEngine, RunState
+
+
+def act(action_type, x="", y="", repeat=1):
+    return GameAction(action_type, str(x), str(y), "Click Trái", repeat, 0.0, False)
+
+
+class FakeImages:
+    """ImageClicker giả: find_image trả lần lượt theo `visible` (hết danh sách: không thấy)"""
+    templates = None
+    frame_source = None
+
+    def __init__(self, visible=()):
+        self.visible = list(visible)
+        self.searched = []
+
+    def find_image(self, template, region=None, match_mode=None, screen_size=None):
+        self.searched.append(template)
+        return (1, 1) if self.visible and self.visible.pop(0) else None
+
+
+class FakeClicks:
+    """CoordinateClicker giả: chỉ ghi lại toạ độ, không di chuột"""
+
+    def __init__(self):
+        self.points = []
+
+    def set_delay(self, delay):
+        pass
+
+    def click(self, x, y, click_type, repeat, move_back, sleep):
+        self.points.append((x, y))
+
+
+def make_engine(visible=()):
+    clicks = FakeClicks()
+    engine = ActionEngine(FakeImages(visible), clicks)
+    engine._screen_size = (1920, 1080)
+    return engine, clicks
+
+
+@pytest.mark.parametrize("visible, clicked", [([True], [(2, 2), (4, 4)]), ([False], [(3, 3), (4, 4)])])
+def test_if_image_runs_one_branch(visible, clicked):
+    engine, clicks = make_engine(visible)
+    state = engine.run([
+        act("if_image", "a.png"),
+        act("coordinate", 2, 2),
+        act("else"),
+        act("coordinate", 3, 3),
+        act("end_if"),
+        act("coordinate", 4, 4),
+    ])
+    assert state is RunState.FINISHED
+    assert clicks.points == clicked
+
+
+def test_loop_until_stops_when_image_appears():
+    engine, clicks = make_engine([False, False, True])
+    engine.run([act("loop_until", "done.png", repeat=10), act("coordinate", 1, 1), act("end_loop")])
+    assert clicks.points == [(1, 1), (1, 1)]
+
+
+def test_loop_until_respects_limit():
+    engine, clicks = make_engine()
+    engine.run([act("loop_until", "done.png", repeat=3), act("coordinate", 1, 1), act("end_loop")])
+    assert len(clicks.points) == 3
+
+
+def test_stop_right_after_start_is_not_lost():
+    engine, clicks = make_engine()
+    # Giả lập luồng nền được lập lịch muộn: stop() đến trước khi run() bắt đầu
+    gate = threading.Event()
+    run = engine.run
+    engine.run = lambda *args: gate.wait() and run(*args)
+    thread = engine.start([act("coordinate", 1, 1)], total_loops=3)
+    engine.stop()
+    gate.set()
+    thread.join(2)
+    assert engine.state is RunState.STOPPED
+    assert clicks.points == []
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("pyautogui")
+
+from image_click import find_peaks
+
+
+def test_peaks_sorted_and_suppressed():
+    result = np.zeros((100, 100), dtype=np.float32)
+    result[10, 10] = 0.95
+    result[11, 12] = 0.9        # Sát đỉnh (10, 10): bị xoá
+    result[50, 70] = 0.85
+    result[80, 20] = 0.5        # Dưới ngưỡng
+    peaks = find_peaks(result, (20, 20), threshold=0.8)
+    assert [(x, y) for _, x, y in peaks] == [(10, 10), (70, 50)]
+    assert peaks[0][0] == pytest.approx(0.95)
+
+
+def test_peaks_limited_by_max_results():
+    result = np.zeros((100, 100), dtype=np.float32)
+    for i in range(5):
+        result[10, 10 + i * 20] = 0.9 - i * 0.01
+    peaks = find_peaks(result, (10, 10), threshold=0.8, max_results=3)
+    assert [x for _, x, _ in peaks] == [10, 30, 50]
+
+
+class ScreenCapture:
+    """Backend chụp giả trả về các vùng của một ảnh cố định"""
+    name = "fake"
+
+    def __init__(self, image):
+        self.image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+
+    def grab(self, region=None):
+        if region is None:
+            return self.image
+        return self.image[region[1]:region[3], region[0]:region[2]]
+
+
+def test_roi_search_uses_known_screen_size(tmp_path, monkeypatch):
+    import image_click
+    from image_click import ImageClicker
+    rng = np.random.default_rng(4)
+    screen = rng.integers(0, 255, (300, 400, 3), dtype=np.uint8)
+    path = str(tmp_path / "icon.png")
+    cv2.imwrite(path, screen[100:140, 200:240])
+    clicker = ImageClicker(capture=ScreenCapture(screen), multi_scale=False)
+    clicker.last_hits[path] = (200, 100, 40, 40)
+
+    def no_size():
+        raise AssertionError("pyautogui.size() trong vòng tìm")
+    monkeypatch.setattr(image_click.pyautogui, "size", no_size)
+    assert clicker.find_image(path, screen_size=(400, 300)) == (220, 120)
+    assert clicker.roi_stats[path]["fast_hits"] == 1
+    clicker.shutdown()
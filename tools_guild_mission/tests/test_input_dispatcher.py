@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyautogui")
+
+from input_dispatcher import InputDispatcher, InputEvent
+
+
+def pending(dispatcher, *points, age=0.0):
+    for source, x, y in points:
+        dispatcher._pending.append(InputEvent(source, x, y, None, submitted=time.monotonic() - age))
+
+
+def drain(dispatcher):
+    order = []
+    while dispatcher._pending:
+        event = dispatcher._next_event()
+        dispatcher._cursor = (event.x, event.y)
+        order.append(event.source)
+    return order
+
+
+def test_nearest_event_runs_first():
+    dispatcher = InputDispatcher(max_wait=10)
+    dispatcher._cursor = (0, 0)
+    pending(dispatcher, ("far", 900, 900), ("near", 10, 10), ("mid", 300, 300))
+    assert drain(dispatcher) == ["near", "mid", "far"]
+
+
+def test_starved_event_runs_first():
+    dispatcher = InputDispatcher(max_wait=0.5)
+    dispatcher._cursor = (0, 0)
+    pending(dispatcher, ("old", 900, 900), age=1.0)
+    pending(dispatcher, ("near", 10, 10))
+    assert drain(dispatcher)[0] == "old"
+
+
+def test_first_event_without_cursor_is_oldest():
+    dispatcher = InputDispatcher(max_wait=10)
+    pending(dispatcher, ("first", 900, 900), age=0.2)
+    pending(dispatcher, ("second", 10, 10))
+    assert dispatcher._next_event().source == "first"
+
+
+def test_submit_requires_running_dispatcher():
+    with pytest.raises(RuntimeError):
+        InputDispatcher().submit("a", 1, 1)
+
+
+class FakeMouse:
+    """Thay pyautogui trong input_dispatcher: ghi lại thao tác, không di chuột thật"""
+
+    def __init__(self):
+        self.log = []
+
+    def position(self):
+        return (7, 7)
+
+    def moveTo(self, x, y, duration=0.0):
+        self.log.append(("move", x, y))
+
+
+def test_repeat_sequence_is_not_interleaved(monkeypatch):
+    import input_dispatcher
+    from input_dispatcher import DispatchedClicker
+    mouse = FakeMouse()
+    monkeypatch.setattr(input_dispatcher, "pyautogui", mouse)
+    monkeypatch.setattr(input_dispatcher.random, "randint", lambda a, b: 0)
+    dispatcher = InputDispatcher()
+    dispatcher.start()
+    try:
+        first = DispatchedClicker(dispatcher, "a")
+        first.set_delay(0.1)
+        slept = []
+        press = lambda: mouse.log.append(("press", "a"))
+        worker = threading.Thread(target=first.click, args=(100, 100, press, 3, True, slept.append))
+        worker.start()
+        # Thao tác của phiên khác đến giữa các lần click của "a"
+        time.sleep(0.05)
+        dispatcher.submit("b", 500, 500, lambda: mouse.log.append(("press", "b"))).result(2)
+        worker.join(2)
+    finally:
+        dispatcher.stop()
+    assert mouse.log == [("move", 100, 100), ("press", "a")] * 3 + [
+        ("move", 7, 7), ("move", 500, 500), ("press", "b")]
+    # Lần nghỉ cuối chạy trên luồng gọi (dừng được)
+    assert slept == [0.1]
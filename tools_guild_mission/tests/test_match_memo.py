@@ -0,0 +1,28 @@
+from match_memo import MatchMemo
+
+
+def test_same_frame_and_key_computed_once():
+    memo = MatchMemo(max_frames=2)
+    calls = []
+    compute = lambda: calls.append(1) or "hit"
+    assert memo.get_or_compute(1, "a.png", compute) == "hit"
+    assert memo.get_or_compute(1, "a.png", compute) == "hit"
+    assert memo.get_or_compute(1, "b.png", compute) == "hit"
+    assert len(calls) == 2
+    assert memo.stats()["hits"] == 1
+
+
+def test_oldest_frame_is_evicted():
+    memo = MatchMemo(max_frames=2)
+    for frame_id in (1, 2, 3):
+        memo.get_or_compute(frame_id, "a.png", lambda: frame_id)
+    stats = memo.stats()
+    assert stats["frames"] == 2 and stats["evictions"] == 1
+    assert memo.get_or_compute(1, "a.png", lambda: "again") == "again"
+
+
+def test_result_of_older_frame_is_not_stored():
+    memo = MatchMemo(max_frames=4)
+    memo.get_or_compute(5, "a.png", lambda: "new")
+    assert memo.get_or_compute(4, "a.png", lambda: "old") == "old"
+    assert memo.stats()["frames"] == 1
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from pixel_probe import PixelProbe, compile_probe, parse_checks, parse_color
+
+
+def screen():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    image[40, 10] = (0x50, 0xAF, 0x4C)          # BGR của #4CAF50
+    image[60:65, 100:105] = (255, 255, 255)
+    image[62, 102] = (0, 0, 0)
+    return image
+
+
+def test_parse_colour_formats():
+    assert parse_color("#4CAF50") == (0x4C, 0xAF, 0x50)
+    assert parse_color("1/2/3") == (1, 2, 3)
+    with pytest.raises(ValueError):
+        parse_color("xanh")
+
+
+@pytest.mark.parametrize("text", ["", "1,2", "1,2,#FFFFFF,3,4,5", "1,2,#FFFFFF,3,-1"])
+def test_parse_rejects_bad_conditions(text):
+    with pytest.raises(ValueError):
+        parse_checks(text)
+
+
+def test_all_checks_evaluated_together():
+    probe = compile_probe("10,40,#4CAF50; 10,41,#4CAF50; 500,40,#000000")
+    assert probe.evaluate(screen()).tolist() == [True, False, False]
+    assert not probe.matches(screen())
+    assert compile_probe("10,40,#4CAF50,0").matches(screen())
+
+
+def test_tolerance_and_radius_average():
+    # Ô 5x5 trắng có một điểm đen ở giữa: trung bình lệch 255/25 ≈ 10
+    assert not compile_probe("102,62,#FFFFFF,16").matches(screen())
+    assert compile_probe("102,62,#FFFFFF,11,2").matches(screen())
+    assert not compile_probe("102,62,#FFFFFF,9,2").matches(screen())
+
+
+def test_origin_and_translation():
+    probe = PixelProbe(parse_checks("10,40,#4CAF50,0"))
+    shifted = probe.translated(100, 50)
+    assert shifted.bounds == (110, 90, 111, 91)
+    # Ảnh là vùng chụp có góc trái trên ở (100, 50) trên màn hình
+    assert shifted.matches(screen(), origin=(100, 50))
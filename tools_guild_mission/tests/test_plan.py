@@ -0,0 +1,152 @@
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("pyautogui")
+
+from actions_manager import GameAction
+from plan import compile_plan, compile_program
+
+SCREEN = (1920, 1080)
+
+
+def act(action_type, x="", y="", repeat=1, **kwargs):
+    return GameAction(action_type, str(x), str(y), "Click Trái", repeat, 0.0, False, **kwargs)
+
+
+def ops(program):
+    return [(ins.op, ins.target) for ins in program]
+
+
+def test_if_else_targets():
+    program = compile_program([
+        act("coordinate", 1, 1),
+        act("if_image", "a.png"),
+        act("coordinate", 2, 2),
+        act("else"),
+        act("coordinate", 3, 3),
+        act("end_if"),
+        act("coordinate", 4, 4),
+    ], SCREEN)
+    # Ảnh không có: nhảy vào nhánh else; nhánh đúng chạy xong thì nhảy qua else
+    assert ops(program) == [("step", -1), ("branch", 4), ("step", -1), ("jump", 5),
+                            ("step", -1), ("nop", -1), ("step", -1)]
+    assert program[4].step.point == (3, 3)
+
+
+def test_loop_until_targets_and_limit():
+    program = compile_program([
+        act("loop_until", "done.png", repeat=3),
+        act("coordinate", 1, 1),
+        act("end_loop"),
+    ], SCREEN)
+    assert ops(program) == [("loop", 3), ("step", -1), ("repeat", 0)]
+    assert program[0].limit == 3
+
+
+def test_goto_resolves_labels_in_both_directions():
+    program = compile_program([
+        act("goto", "end"),
+        act("label", "top"),
+        act("coordinate", 1, 1),
+        act("goto", "top"),
+        act("label", "end"),
+    ], SCREEN)
+    assert ops(program) == [("jump", 3), ("step", -1), ("jump", 1)]
+
+
+def test_call_compiles_subscript_inline():
+    scripts = {"sub.json": [act("coordinate", 5, 6)]}
+    program = compile_program([act("call", "sub.json")], SCREEN, loader=scripts.__getitem__)
+    assert program[0].op == "call"
+    assert program[0].program[0].step.point == (5, 6)
+
+
+def test_recursive_call_is_rejected():
+    scripts = {"a.json": [act("call", "b.json")], "b.json": [act("call", "a.json")]}
+    with pytest.raises(ValueError, match="gọi lại chính nó"):
+        compile_program([act("call", "a.json")], SCREEN, loader=scripts.__getitem__)
+
+
+@pytest.mark.parametrize("actions, message", [
+    ([act("if_image", "a.png")], "Action #1 \\(if_image\\): khối chưa được đóng"),
+    ([act("else")], "Action #1 \\(else\\)"),
+    ([act("if_image", "a.png"), act("end_loop")], "Action #2 \\(end_loop\\)"),
+    ([act("goto", "nowhere")], "không có nhãn nowhere"),
+    ([act("label", "x"), act("label", "x")], "Action #2 \\(label\\): Nhãn bị trùng"),
+    ([act("coordinate", 1, 1), act("pixel", "5,5,#FFFFFF,10,-2")], "Action #2 \\(pixel\\): Bán kính"),
+])
+def test_structure_errors(actions, message):
+    with pytest.raises(ValueError, match=message):
+        compile_program(actions, SCREEN)
+
+
+def test_disabled_images_and_interrupts_are_not_in_program():
+    program = compile_program([
+        act("image", "off.png", enabled=False),
+        act("interrupt", "popup.png"),
+        act("if_image", "a.png"),
+        act("end_if"),
+    ], SCREEN)
+    assert ops(program) == [("branch", 1), ("nop", -1)]
+
+
+def test_plan_without_flow_groups_steps():
+    plan = compile_plan([
+        act("coordinate", 1, 1),
+        act("image", "a.png", "Nửa trái"),
+        act("image_all", "b.png"),
+        act("image", "a.png"),
+        act("interrupt", "popup.png"),
+    ], SCREEN)
+    assert plan.program is None
+    assert [s.kind for s in plan.steps] == ["coordinate"]
+    assert [s.template for s in plan.image_all] == ["b.png"]
+    assert plan.image_paths == ("a.png",)
+    assert plan.regions == {"a.png": (0, 0, 960, 1080)}
+    assert [i.step.template for i in plan.interrupts] == ["popup.png"]
+    assert len(plan) == 4
+
+
+def test_plan_with_flow_uses_program():
+    plan = compile_plan([act("label", "top"), act("coordinate", 1, 1), act("goto", "top")], SCREEN)
+    assert plan.steps == ()
+    assert len(plan) == len(plan.program) == 2
+
+
+def test_window_offsets_coordinates_and_regions():
+    plan = compile_plan([act("coordinate", 10, 20), act("image", "a.png", "Nửa phải")], SCREEN,
+                        window=(100, 200, 800, 600))
+    assert plan.steps[0].point == (110, 220)
+    assert plan.regions["a.png"] == (500, 200, 900, 800)
+
+
+def test_missing_template_drops_only_that_action(tmp_path, capsys):
+    from template_cache import TemplateCache
+    good = tmp_path / "good.png"
+    cv2.imwrite(str(good), np.full((10, 10, 3), 128, dtype=np.uint8))
+    missing = str(tmp_path / "missing.png")
+    plan = compile_plan([
+        act("coordinate", 1, 1),
+        act("image", missing),
+        act("image", str(good)),
+        act("interrupt", missing),
+    ], SCREEN, templates=TemplateCache())
+    assert [s.kind for s in plan.steps] == ["coordinate"]
+    assert plan.image_paths == (str(good),)
+    assert plan.interrupts == ()
+    assert "Action #2 (image)" in capsys.readouterr().out
+
+
+def test_missing_template_keeps_flow_structure(tmp_path, capsys):
+    from template_cache import TemplateCache
+    missing = str(tmp_path / "missing.png")
+    program = compile_program([
+        act("if_image", missing),
+        act("wait_image", missing),
+        act("coordinate", 1, 1),
+        act("end_if"),
+    ], SCREEN, templates=TemplateCache())
+    # Điều kiện giữ nguyên khối (lúc chạy luôn là "không thấy"), bước chờ ảnh lỗi bị bỏ
+    assert ops(program) == [("branch", 2), ("step", -1), ("nop", -1)]
+    assert "Action #2 (wait_image)" in capsys.readouterr().out
@@ -0,0 +1,200 @@
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip("pyautogui")
+
+from actions_manager import GameAction
+from engine import RunState
+from scheduler import TimerWheel, WatchJob
+
+
+class CountingCondition(threading.Condition):
+    """Condition đếm số lần luồng bánh xe thức dậy"""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+
+    def wait(self, timeout=None):
+        self.waits += 1
+        return super().wait(timeout)
+
+
+def make_wheel(tick=0.01):
+    wheel = TimerWheel(tick=tick, slots=8)
+    wheel._cond = CountingCondition()
+    wheel.start()
+    return wheel
+
+
+def test_timers_fire_in_due_order_across_rounds():
+    wheel = make_wheel()
+    fired = []
+    done = threading.Event()
+    # 0.05s và 0.13s rơi vào cùng ô của bánh xe 8 ô, khác vòng
+    wheel.schedule(0.13, lambda: (fired.append("late"), done.set()))
+    wheel.schedule(0.05, lambda: fired.append("early"))
+    wheel.schedule(0.02, lambda: fired.append("first"))
+    try:
+        assert done.wait(2)
+        assert fired == ["first", "early", "late"]
+        assert len(wheel) == 0
+    finally:
+        wheel.stop()
+
+
+def test_cancelled_timer_never_fires():
+    wheel = make_wheel()
+    fired = []
+    timer = wheel.schedule(0.05, lambda: fired.append("cancelled"))
+    done = threading.Event()
+    wheel.schedule(0.1, done.set)
+    try:
+        assert timer.cancel()
+        assert not timer.cancel()
+        assert done.wait(2)
+        assert fired == []
+    finally:
+        wheel.stop()
+
+
+def test_wheel_sleeps_until_nearest_timer():
+    wheel = make_wheel(tick=0.001)
+    done = threading.Event()
+    wheel.schedule(0.3, done.set)
+    try:
+        assert done.wait(2)
+        # Thức theo từng tick sẽ là ~300 lần
+        assert wheel._cond.waits < 10
+    finally:
+        wheel.stop()
+
+
+def test_stop_wakes_idle_wheel():
+    wheel = make_wheel()
+    wheel.schedule(60, lambda: None)
+    started = time.monotonic()
+    wheel.stop()
+    assert time.monotonic() - started < 1
+
+
+class FakeWheel:
+    """TimerWheel giả: giữ hẹn giờ để test tự gọi"""
+
+    def __init__(self):
+        self.timers = []
+
+    def schedule(self, delay, callback):
+        timer = FakeTimer(delay, callback)
+        self.timers.append(timer)
+        return timer
+
+
+class FakeTimer:
+    def __init__(self, delay, callback):
+        self.delay = delay
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class FakeSource:
+    def __init__(self):
+        self.users = 0
+        self.acquired = 0
+
+    def acquire(self):
+        self.users += 1
+        self.acquired += 1
+
+    def release(self):
+        self.users -= 1
+
+
+def make_job(outcomes, max_runs=None):
+    """WatchJob với engine.run trả lần lượt theo `outcomes` ("miss", "found", "failed", "stopped")"""
+    source = FakeSource()
+    images = types.SimpleNamespace(templates=None, frame_source=source)
+    events = []
+    job = WatchJob(1, FakeWheel(), images, None,
+                   [GameAction("coordinate", "1", "1", "Click Trái", 1, 0.0, False)],
+                   interval=600, jitter=0.0, max_runs=max_runs,
+                   listener=lambda job, event, info: events.append(event))
+    outcomes = list(outcomes)
+
+    def run(plan, total_loops=1, loop_delay=0.0, reset_stop=True):
+        assert source.users == 1
+        outcome = outcomes.pop(0)
+        if outcome == "found":
+            job._on_engine_event("found", {"match": (5, 5)})
+        if outcome == "failed":
+            job._on_engine_event("error", {"error": ValueError("x")})
+            return RunState.FAILED
+        return RunState.STOPPED if outcome == "stopped" else RunState.FINISHED
+
+    job.engine.run = run
+    return job, job.wheel, source, events
+
+
+def fire(wheel):
+    wheel.timers[-1].callback()
+
+
+def test_watch_job_retries_until_found():
+    job, wheel, source, events = make_job(["miss", "found"])
+    job.start()
+    assert job.state == "pending"
+    fire(wheel)
+    assert job.state == "waiting"
+    assert wheel.timers[-1].delay == 600
+    fire(wheel)
+    assert job.state == "found"
+    assert job.found == (5, 5)
+    assert events == ["run", "waiting", "run", "found"]
+    # Chỉ chụp màn hình trong lúc chạy, không trong lúc chờ
+    assert source.acquired == 2 and source.users == 0
+
+
+def test_watch_job_finishes_after_max_runs():
+    job, wheel, _, events = make_job(["miss", "miss"], max_runs=2)
+    job.start()
+    fire(wheel)
+    fire(wheel)
+    assert job.state == "finished"
+    assert len(wheel.timers) == 2
+
+
+def test_watch_job_failure():
+    job, wheel, source, events = make_job(["failed"])
+    job.start()
+    fire(wheel)
+    assert job.state == "failed"
+    assert events[-1] == "failed"
+    assert source.users == 0
+
+
+def test_cancel_while_waiting_drops_timer():
+    job, wheel, _, events = make_job(["miss"])
+    job.start()
+    fire(wheel)
+    assert job.cancel()
+    assert job.state == "cancelled"
+    assert wheel.timers[-1].cancelled
+    assert not job.cancel()
+    # Hẹn giờ đã lỡ chạy cũng không chạy lại job
+    fire(wheel)
+    assert events == ["run", "waiting", "cancelled"]
+
+
+def test_stopped_run_is_cancelled():
+    job, wheel, _, events = make_job(["stopped"])
+    job.start()
+    fire(wheel)
+    assert job.state == "cancelled"
+    assert job.state in job.DONE
@@ -0,0 +1,40 @@
+# Chụp màn hình thật trên Xvfb: xvfb-run -s "-screen 0 640x480x24" python -m pytest tests/test_screen_capture.py
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+if not os.environ.get("DISPLAY"):
+    pytest.skip("Cần DISPLAY (chạy qua xvfb-run)", allow_module_level=True)
+pytest.importorskip("mss")
+
+from screen_capture import create_capture
+
+# Nền #3366cc: BGR = (0xcc, 0x66, 0x33)
+ROOT_COLOR = "#3366cc"
+EXPECTED = (0xcc, 0x66, 0x33)
+
+
+@pytest.fixture(scope="module")
+def painted_root():
+    if shutil.which("xsetroot") is None:
+        pytest.skip("Chưa cài xsetroot")
+    subprocess.run(["xsetroot", "-solid", ROOT_COLOR], check=True)
+
+
+@pytest.mark.parametrize("backend", ["mss", "imagegrab"])
+def test_capture_reads_painted_colour(painted_root, backend):
+    if backend == "imagegrab":
+        pytest.importorskip("PIL.ImageGrab")
+    capture = create_capture(backend)
+    try:
+        full = capture.grab()
+        part = capture.grab((10, 20, 110, 70))
+    finally:
+        capture.close()
+    assert full.ndim == 3 and full.shape[2] == 4
+    assert part.shape == (50, 100, 4)
+    assert tuple(full[20, 10, :3]) == EXPECTED
+    assert tuple(part[0, 0, :3]) == EXPECTED
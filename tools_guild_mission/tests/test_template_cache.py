@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+import pytest
+
+from template_cache import CachedTemplate, TemplateCache
+
+
+def button(color=(0x50, 0xAF, 0x4C), size=40):
+    image = np.zeros((size, size, 3), dtype=np.uint8)
+    image[:] = color
+    return image
+
+
+def test_flat_edge_variant_falls_back_to_colour():
+    image = button()
+    # Một vệt màu khác độ sáng gần bằng: ảnh màu có biến thiên, Canny không thấy viền
+    image[10:20, 10:20] = (0x4C, 0xAF, 0x50)
+    cached = CachedTemplate("b.png", 0, image)
+    assert cached.is_flat("edge")
+    assert cached.usable_mode("edge") == "color"
+    assert cached.usable_mode("color") == "color"
+
+
+def test_solid_template_is_not_usable():
+    cached = CachedTemplate("b.png", 0, button())
+    assert cached.usable_mode("gray") is None
+    assert cached.usable_mode("mask") is None
+
+
+def test_16bit_png_is_loaded_as_8bit(tmp_path):
+    image = np.zeros((20, 30, 3), dtype=np.uint16)
+    image[:, :, 2] = 0xFF00
+    path = str(tmp_path / "deep.png")
+    cv2.imwrite(path, image)
+    cached = TemplateCache().get(path)
+    assert cached.bgr.dtype == np.uint8
+    assert tuple(cached.bgr[0, 0]) == (0, 0, 0xFF)
+
+
+def test_flat_template_never_matches_region_origin(tmp_path):
+    pytest.importorskip("pyautogui")
+    from image_click import ImageClicker
+    path = str(tmp_path / "flat.png")
+    cv2.imwrite(path, button())
+    screen = np.random.default_rng(0).integers(0, 255, (200, 300, 3), dtype=np.uint8)
+    clicker = ImageClicker(capture=object(), multi_scale=False, track_last_hit=False)
+    for mode in ("color", "gray", "edge"):
+        assert clicker.match_template(screen, path, region=(50, 60, 350, 260), match_mode=mode) is None
+    clicker.shutdown()
+
+
+def test_lazy_variants_count_toward_budget(tmp_path):
+    rng = np.random.default_rng(2)
+    paths = []
+    for name in ("a.png", "b.png"):
+        path = str(tmp_path / name)
+        cv2.imwrite(path, rng.integers(0, 255, (50, 50, 3), dtype=np.uint8))
+        paths.append(path)
+    # Mỗi ảnh mẫu 50x50: 7500 byte màu + 2500 byte xám
+    cache = TemplateCache(max_bytes=25000)
+    a = cache.get(paths[0])
+    b = cache.get(paths[1])
+    assert cache.nbytes == 20000
+    b.variant("edge")
+    b.pyramid(2, "gray")
+    assert b.nbytes > 12500
+    assert cache.nbytes == a.nbytes + b.nbytes
+    assert cache.stats()["entries"] == 2
+    # Ảnh mẫu phóng to gấp đôi làm vượt ngân sách: ảnh mẫu ít dùng nhất (a) bị loại
+    b.variant("color", 2.0)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+    # Ảnh mẫu đã bị loại vẫn dùng được, chỉ không còn tính vào bộ nhớ đệm
+    a.variant("color", 2.0)
+    assert cache.nbytes == b.nbytes
@@ -0,0 +1,44 @@
+from timing import Timeline
+
+
+class FakeClock:
+    """Đồng hồ giả: sleep chỉ tiến đồng hồ, có thể trả về sớm hơn yêu cầu"""
+
+    def __init__(self, shortfall=0.0):
+        self.now = 100.0
+        self.shortfall = shortfall
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += max(seconds - self.shortfall, seconds / 2)
+
+
+def test_wait_keeps_schedule_without_drift():
+    clock = FakeClock()
+    timeline = Timeline(sleep=clock.sleep, clock=clock)
+    for _ in range(5):
+        clock.now += 0.03       # Thời gian làm việc giữa hai lần chờ
+        timeline.wait(0.1, "step")
+    assert abs(clock.now - 100.5) < 1e-9
+    assert all(abs(r.lateness) < 1e-9 for r in timeline.records)
+
+
+def test_wait_sleeps_again_when_sleep_returns_early():
+    clock = FakeClock(shortfall=0.01)
+    timeline = Timeline(sleep=clock.sleep, clock=clock)
+    timeline.wait(0.1)
+    assert clock.now >= 100.1
+    assert len(clock.sleeps) > 1
+
+
+def test_wait_rebases_when_far_behind():
+    clock = FakeClock()
+    timeline = Timeline(sleep=clock.sleep, clock=clock, max_lag=0.5)
+    clock.now += 2.0
+    timeline.wait(0.1)
+    assert clock.sleeps == []
+    assert timeline.records[-1].rebased
@@ -0,0 +1,98 @@
+"""
+timing.py - Lịch thời gian chống trôi cho engine.
+
+Mỗi lần chờ được tính từ mốc đã lên lịch trước đó chứ không từ lúc lần chờ trước
+kết thúc, nên thời gian click/so khớp ảnh và sai số của sleep không cộng dồn qua
+hàng nghìn vòng. Mọi lần chờ đều ghi lại giờ dự kiến và giờ thực tế để thống kê.
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from config import TIMING_MAX_LAG, TIMING_HISTORY
+
+
+@dataclass
+class TimingRecord:
+    label: str
+    planned: float    # Mốc dự kiến (time.monotonic())
+    actual: float     # Thời điểm thực sự tiếp tục
+    rebased: bool     # Trễ quá TIMING_MAX_LAG nên đã lấy lại mốc
+
+    @property
+    def lateness(self):
+        return self.actual - self.planned
+
+
+def summarize_lateness(records):
+    """Thống kê độ trễ so với mốc (ms)"""
+    if not records:
+        return {"count": 0}
+    lateness = np.array([r.lateness for r in records]) * 1000
+    return {
+        "count": len(records),
+        "mean_ms": round(float(lateness.mean()), 3),
+        "p50_ms": round(float(np.percentile(lateness, 50)), 3),
+        "p95_ms": round(float(np.percentile(lateness, 95)), 3),
+        "max_ms": round(float(lateness.max()), 3),
+        "rebased": sum(r.rebased for r in records),
+    }
+
+
+class Timeline:
+    def __init__(self, sleep=time.sleep, clock=time.monotonic,
+                 max_lag=TIMING_MAX_LAG, history=TIMING_HISTORY):
+        # `sleep` có thể ném lỗi để huỷ (vd. ActionEngine.sleep)
+        self.sleep = sleep
+        self.clock = clock
+        self.max_lag = max_lag
+        self.records = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._origin = self._deadline = clock()
+
+    def start(self):
+        """Bắt đầu lịch mới từ thời điểm hiện tại, xoá thống kê cũ"""
+        with self._lock:
+            self.records.clear()
+        self._origin = self._deadline = self.clock()
+
+    def rebase(self):
+        """Lấy mốc hiện tại làm gốc (sau một lần chờ không xác định trước, vd. chờ ảnh)"""
+        self._deadline = self.clock()
+
+    def wait(self, seconds, label=""):
+        """Chờ đến mốc trước + `seconds`; nếu đã trễ quá max_lag thì không chờ và lấy lại mốc"""
+        planned = self._deadline + seconds
+        rebased = self.clock() - planned > self.max_lag
+        if not rebased:
+            # Ngủ (nhả GIL) tới mốc; lặp lại nếu sleep trả về sớm
+            remaining = planned - self.clock()
+            while remaining > 0:
+                self.sleep(remaining)
+                remaining = planned - self.clock()
+        actual = self.clock()
+        self._deadline = actual if rebased else planned
+        with self._lock:
+            self.records.append(TimingRecord(label, planned, actual, rebased))
+
+    @property
+    def drift(self):
+        """Độ lệch hiện tại giữa mốc lịch và đồng hồ (giây, dương = đang chậm)"""
+        return self.clock() - self._deadline
+
+    def stats(self):
+        """Thống kê độ trễ tổng và theo từng nhãn"""
+        with self._lock:
+            records = list(self.records)
+        by_label = {}
+        for record in records:
+            by_label.setdefault(record.label, []).append(record)
+        return {
+            "elapsed_s": round(self.clock() - self._origin, 3),
+            "overall": summarize_lateness(records),
+            "labels": {label: summarize_lateness(items) for label, items in by_label.items()},
+        }
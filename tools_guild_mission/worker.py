@@ -1,46 +1,65 @@
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from engine import RunState
 
 class Worker(QThread):
+    """Chạy ActionEngine của cửa sổ chính trên một QThread và chuyển sự kiện thành signal"""
     finished = pyqtSignal()
     stopped = pyqtSignal()
+    state_changed = pyqtSignal(str)
+    loop_started = pyqtSignal(int, int)
+    interrupted = pyqtSignal(str)       # Ảnh popup vừa được phát hiện
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.actions = []
         self.total_loops = 1
         self.loop_delay = 0
-        self.running = True
         self.parent = parent
 
+    @property
+    def engine(self):
+        return self.parent.engine
+
+    @property
+    def running(self):
+        return self.engine.is_running()
+
+    @running.setter
+    def running(self, value):
+        # Giữ tương thích với code cũ: gán False = yêu cầu dừng
+        if not value:
+            self.stop()
+
+    def start(self, *args):
+        # Xoá cờ dừng trước khi QThread chạy: bấm Dừng ngay sau Bắt đầu không bị mất
+        self.engine.reset_stop()
+        super().start(*args)
+
+    def stop(self):
+        self.engine.stop()
+
+    def on_engine_event(self, event, info):
+        if event == "state":
+            self.state_changed.emit(info["state"].value)
+        elif event == "loop":
+            self.loop_started.emit(info["loop"], info["total"])
+        elif event == "interrupt":
+            self.interrupted.emit(info["step"].template)
+
     def run(self):
+        state = None
         try:
-            for _ in range(self.total_loops):
-                if not self.running:
-                    break
-                # Gom tất cả action image lại
-                image_actions = [a for a in self.actions if a.action_type == "image" and getattr(a, 'enabled', True)]
-                coord_actions = [a for a in self.actions if a.action_type == "coordinate"]
-                # Thực hiện các hành động toạ độ như cũ
-                for action in coord_actions:
-                    if not self.running:
-                        break
-                    self.parent.execute_coordinate_action(action)
-                # Nếu có nhiều ảnh, tìm tất cả cùng lúc
-                if image_actions:
-                    found = False
-                    for action in image_actions:
-                        if not self.running:
-                            break
-                        result = self.parent.image_clicker.find_image(action.x)
-                        if result:
-                            self.parent.execute_image_action(action)
-                            found = True
-                            break
-                    if found:
-                        break
-                if _ < self.total_loops - 1 and self.loop_delay > 0:
-                    self.msleep(int(self.loop_delay * 1000))
+            state = self.engine.run(self.actions, self.total_loops, self.loop_delay, reset_stop=False)
         finally:
             self.finished.emit()
-            if not self.running:
+            if state is RunState.STOPPED:
                 self.stopped.emit()
+
+
+class JobSignals(QObject):
+    """Chuyển sự kiện của WatchJob (chạy trên luồng nền) thành signal cho giao diện"""
+    progress = pyqtSignal(int, str, object)     # job_id, event, info
+
+    def on_job_event(self, job, event, info):
+        self.progress.emit(job.job_id, event, info)
@@ -1,30 +1,29 @@
 # [file name]: image_click.py
 # [file content begin]
 import cv2
-import numpy as np
-import pyautogui
-from PIL import ImageGrab
+
+from screen_capture import create_capture
+from template_cache import TemplateCache
 
 class ImageClicker:
-    def __init__(self, confidence=0.7):
+    def __init__(self, confidence=0.7, template_cache=None, capture=None):
         self.confidence = confidence
+        # Phiên chụp màn hình giữ mở giữa các lần tìm
+        self.capture = capture or create_capture()
+        # Ảnh mẫu được giải mã một lần và giữ trong bộ nhớ
+        self.templates = template_cache or TemplateCache()
     
     def find_image(self, template_path, region=None):
         """Tìm ảnh mẫu trên màn hình với xử lý lỗi đầy đủ"""
         try:
-            # Chụp màn hình và chuyển đổi định dạng
-            if region:
-                screen = np.array(ImageGrab.grab(bbox=region))
-            else:
-                screen = np.array(ImageGrab.grab())
+            # Chụp màn hình (BGRA) qua phiên giữ mở, chỉ chụp vùng cần tìm
+            screen = self.capture.grab(region)
             
             # Chuyển đổi sang định dạng BGR (OpenCV mặc định)
-            screen = cv2.cvtColor(screen, cv2.COLOR_RGB2BGR)
+            screen = cv2.cvtColor(screen, cv2.COLOR_BGRA2BGR)
             
-            # Đọc ảnh mẫu và kiểm tra
-            template = cv2.imread(template_path, cv2.IMREAD_COLOR)
-            if template is None:
-                raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
+            # Lấy ảnh mẫu từ bộ nhớ đệm (chỉ đọc đĩa lần đầu hoặc khi file thay đổi)
+            template = self.templates.get(template_path).bgr
             
             # Kiểm tra kích thước ảnh
             if screen.shape[0] < template.shape[0] or screen.shape[1] < template.shape[1]:
@@ -49,4 +48,8 @@ class ImageClicker:
         except Exception as e:
             print(f"Lỗi tìm ảnh: {str(e)}")
             return None
+
+    def cache_stats(self):
+        """Thống kê hit/miss của bộ nhớ đệm ảnh mẫu"""
+        return self.templates.stats()
 # [file content end]
\ No newline at end of file
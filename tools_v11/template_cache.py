@@ -0,0 +1,106 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from config import TEMPLATE_CACHE_MAX_BYTES
+
+
+class CachedTemplate:
+    """
+    Ảnh mẫu đã giải mã sẵn. Chỉ giữ ảnh BGR 8-bit (IMREAD_COLOR đã bỏ kênh alpha và đưa
+    PNG 16-bit về 8-bit); ảnh không đổi sau khi nạp nên dung lượng được tính một lần.
+    """
+
+    def __init__(self, path, mtime, bgr):
+        self.path = path
+        self.mtime = mtime
+        self.bgr = bgr
+        self.nbytes = bgr.nbytes
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+
+class TemplateCache:
+    """
+    Bộ nhớ đệm ảnh mẫu: mỗi file chỉ đọc/giải mã một lần.
+    Khóa theo đường dẫn + mtime (sửa file thì tự đọc lại), loại bỏ theo LRU
+    khi vượt quá `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=TEMPLATE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, template_path):
+        """Lấy CachedTemplate cho `template_path`, đọc từ đĩa nếu chưa có"""
+        path = os.path.abspath(template_path)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry
+
+        bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+        if bgr is None:
+            raise ValueError(f"Không thể đọc file ảnh mẫu: {template_path}")
+        entry = CachedTemplate(path, mtime, bgr)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = entry
+            self._entries.move_to_end(path)
+            self._evict()
+        return entry
+
+    def _evict(self):
+        # Gọi khi đang giữ self._lock. Giữ lại ít nhất một ảnh mẫu kể cả khi nó lớn hơn ngân sách
+        while len(self._entries) > 1 and self._total_bytes() > self.max_bytes:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _total_bytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def invalidate(self, template_path=None):
+        """Xóa một ảnh mẫu (hoặc toàn bộ nếu không truyền đường dẫn)"""
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(template_path), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
@@ -7,4 +7,10 @@ ASSETS_DIR = BASE_DIR / "assets"
 DEFAULT_DELAY = 1.0  # Đổi thành giây
 DEFAULT_REPEAT = 1
 CLICK_TYPES = ["Click Trái", "Click Phải", "Double Click"]
-SEARCH_REGIONS = ["Toàn màn hình", "Nửa trái", "Nửa phải", "Tùy chỉnh"]
\ No newline at end of file
+SEARCH_REGIONS = ["Toàn màn hình", "Nửa trái", "Nửa phải", "Tùy chỉnh"]
+
+# Bộ nhớ đệm ảnh mẫu (byte)
+TEMPLATE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Backend chụp màn hình: "auto" (mss nếu có, không thì ImageGrab), "mss", "imagegrab"
+CAPTURE_BACKEND = "auto"
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""
+screen_capture.py - Chụp màn hình qua một phiên giữ mở lâu dài.
+
+Backend "mss" giữ kết nối tới màn hình (X11 / GDI / Quartz) giữa các lần chụp
+và trả về ảnh BGRA dạng view NumPy trên bộ đệm của mss (không copy).
+Nếu không cài mss thì dùng PIL.ImageGrab như trước.
+
+Tự kiểm tra trên Linux không có màn hình thật:
+    xvfb-run -s "-screen 0 640x480x24" python screen_capture.py
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+from config import CAPTURE_BACKEND
+
+try:
+    import mss
+except ImportError:  # mss là tuỳ chọn
+    mss = None
+
+
+class ImageGrabCapture:
+    """Backend dự phòng: PIL.ImageGrab, mỗi lần chụp là một phiên mới"""
+
+    name = "imagegrab"
+
+    def grab(self, region=None):
+        from PIL import ImageGrab
+        image = ImageGrab.grab(bbox=region) if region else ImageGrab.grab()
+        return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGRA)
+
+    def close(self):
+        pass
+
+
+class MssCapture:
+    """Backend mss: mỗi luồng giữ một phiên mss riêng, mở một lần và dùng lại"""
+
+    name = "mss"
+
+    def __init__(self):
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = mss.mss()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def grab(self, region=None):
+        session = self._session()
+        if region:
+            x1, y1, x2, y2 = region
+            monitor = {"left": x1, "top": y1, "width": x2 - x1, "height": y2 - y1}
+        else:
+            monitor = session.monitors[1]  # Màn hình chính, giống ImageGrab.grab()
+        shot = session.grab(monitor)
+        # View trực tiếp lên bộ đệm BGRA của mss
+        return np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+        self._local = threading.local()
+
+
+def create_capture(backend=CAPTURE_BACKEND):
+    """
+    Tạo backend chụp màn hình: "mss", "imagegrab" hoặc "auto"
+    (ưu tiên mss, không có thì dùng ImageGrab).
+    """
+    if backend in ("auto", "mss") and mss is not None:
+        try:
+            capture = MssCapture()
+            capture.grab((0, 0, 1, 1))
+            return capture
+        except Exception as e:
+            if backend == "mss":
+                raise
+            print(f"Không dùng được mss, chuyển sang ImageGrab: {str(e)}")
+    elif backend == "mss":
+        raise ValueError("Chưa cài mss (pip install mss)")
+    return ImageGrabCapture()
+
+
+if __name__ == "__main__":
+    # Kiểm tra nhanh: vẽ một ô màu lên màn hình Xvfb rồi chụp lại bằng từng backend
+    import os
+    import subprocess
+    import sys
+
+    if not os.environ.get("DISPLAY"):
+        sys.exit("Cần DISPLAY (chạy qua xvfb-run)")
+
+    # Nền #3366cc: BGR = (0xcc, 0x66, 0x33)
+    subprocess.run(["xsetroot", "-solid", "#3366cc"], check=True)
+    expected = (0xcc, 0x66, 0x33)
+    for name in ("mss", "imagegrab"):
+        try:
+            capture = create_capture(name)
+        except Exception as e:
+            print(f"{name}: bỏ qua ({e})")
+            continue
+        full = capture.grab()
+        part = capture.grab((10, 20, 110, 70))
+        assert full.ndim == 3 and full.shape[2] == 4, full.shape
+        assert part.shape == (50, 100, 4), part.shape
+        assert tuple(full[20, 10, :3]) == expected, tuple(full[20, 10])
+        assert tuple(part[0, 0, :3]) == expected, tuple(part[0, 0])
+        print(f"{capture.name}: toàn màn hình {full.shape[1]}x{full.shape[0]}, "
+              f"pixel (10, 20) BGRA = {tuple(part[0, 0])}")
+        capture.close()